@@ -30,6 +30,8 @@ def upgrade() -> None:
     op.add_column('usuarios', sa.Column('shipping_city', sa.String(length=100), nullable=True))
     op.add_column('usuarios', sa.Column('shipping_country', sa.String(length=100), nullable=True))
     op.add_column('usuarios', sa.Column('shipping_zip_code', sa.String(length=10), nullable=True))
+    # add_column no crea el tipo enum en Postgres; create_table sí lo haría
+    sa.Enum('active', 'pending', 'banned', 'deleted', name='accountstatus').create(op.get_bind(), checkfirst=True)
     op.add_column('usuarios', sa.Column('account_status', sa.Enum('active', 'pending', 'banned', 'deleted', name='accountstatus'), nullable=True))
     op.add_column('usuarios', sa.Column('role', sa.String(length=20), nullable=True))
     op.add_column('usuarios', sa.Column('created_at', sa.DateTime(), nullable=True))
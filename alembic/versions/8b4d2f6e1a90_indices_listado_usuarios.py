@@ -0,0 +1,40 @@
+"""indices para el listado paginado de usuarios
+
+Revision ID: 8b4d2f6e1a90
+Revises: 5e0a7b2c9d41
+Create Date: 2026-10-18 17:41:12.206384
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b4d2f6e1a90'
+down_revision: Union[str, None] = '5e0a7b2c9d41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDICES = {
+    'ix_usuarios_created_at_id': ['created_at', 'id'],
+    'ix_usuarios_account_status_created_at_id': ['account_status', 'created_at', 'id'],
+    'ix_usuarios_role_created_at_id': ['role', 'created_at', 'id'],
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY para no bloquear escrituras en una tabla ya grande
+    with op.get_context().autocommit_block():
+        for nombre, columnas in INDICES.items():
+            op.create_index(nombre, 'usuarios', columnas, unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for nombre in INDICES:
+            op.drop_index(nombre, table_name='usuarios', postgresql_concurrently=True)
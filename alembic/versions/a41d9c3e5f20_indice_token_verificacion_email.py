@@ -0,0 +1,42 @@
+"""indice en usuarios.email_verification_token
+
+Revision ID: a41d9c3e5f20
+Revises: 7c2f4e9a1b3d
+Create Date: 2026-10-18 10:05:47.903112
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41d9c3e5f20'
+down_revision: Union[str, None] = '7c2f4e9a1b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Los tokens pendientes eran hashes bcrypt y ya no validan; caducan solos
+    # (EXPIRATION_HOURS) y el usuario puede pedir un nuevo enlace.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_usuarios_email_verification_token'),
+            'usuarios',
+            ['email_verification_token'],
+            unique=False,
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f('ix_usuarios_email_verification_token'),
+            table_name='usuarios',
+            postgresql_concurrently=True
+        )
@@ -0,0 +1,52 @@
+"""crear tablas otps y failed_login_attempts
+
+Revision ID: e9c4b1d7a302
+Revises: c6e1a9d4b273
+Create Date: 2026-10-18 21:36:08.417552
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9c4b1d7a302'
+down_revision: Union[str, None] = 'c6e1a9d4b273'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Ninguna migración anterior las creaba: las bases existentes las tienen
+    # por `create_all`, así que solo se crean si faltan. Quedan como estaban
+    # antes de f2a7c5e8d310, que cambia el email y añade los índices.
+    existentes = set(sa.inspect(op.get_bind()).get_table_names())
+    if 'otps' not in existentes:
+        op.create_table('otps',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('code', sa.String(length=6), nullable=False),
+        sa.Column('expiration', sa.DateTime(), nullable=False),
+        sa.Column('is_used', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['usuarios.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'failed_login_attempts' not in existentes:
+        op.create_table('failed_login_attempts',
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('attempt_count', sa.Integer(), nullable=True),
+        sa.Column('last_attempt', sa.DateTime(), nullable=True),
+        sa.Column('is_locked', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('email')
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # Sin cambios: en las bases creadas con `create_all` estas tablas no las
+    # creó esta revisión y borrarlas perdería datos. Si se vuelve a subir,
+    # `upgrade` ve que ya existen y no hace nada.
+    pass
@@ -0,0 +1,67 @@
+"""indices para las consultas calientes (otps, usuarios parciales)
+
+Revision ID: f2a7c5e8d310
+Revises: e9c4b1d7a302
+Create Date: 2026-10-18 20:14:51.330972
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c5e8d310'
+down_revision: Union[str, None] = 'e9c4b1d7a302'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Tabla sin uso desde que los bloqueos viven fuera de la base: el cambio
+    # de tipo la reescribe, pero está vacía o casi
+    op.alter_column('failed_login_attempts', 'email',
+               existing_type=sa.String(),
+               type_=sa.String(length=100),
+               existing_nullable=False)
+
+    # CONCURRENTLY para poder aplicarla con la base en servicio
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_otps_user_id'), 'otps', ['user_id'], unique=False, postgresql_concurrently=True)
+        op.create_index(
+            'ix_otps_expiration_no_usados', 'otps', ['expiration'], unique=False,
+            postgresql_where=sa.text('is_used = false'), postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_usuarios_lower_email', 'usuarios', [sa.text('lower(email)')], unique=False,
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_usuarios_activos_role_created_at', 'usuarios', ['role', 'created_at', 'id'], unique=False,
+            postgresql_where=sa.text("account_status = 'active'"), postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_usuarios_pendientes_created_at', 'usuarios', ['created_at'], unique=False,
+            postgresql_where=sa.text("account_status = 'pending' AND is_email_verified = false"),
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for nombre, tabla in (
+            ('ix_usuarios_pendientes_created_at', 'usuarios'),
+            ('ix_usuarios_activos_role_created_at', 'usuarios'),
+            ('ix_usuarios_lower_email', 'usuarios'),
+            ('ix_otps_expiration_no_usados', 'otps'),
+            (op.f('ix_otps_user_id'), 'otps'),
+        ):
+            op.drop_index(nombre, table_name=tabla, postgresql_concurrently=True)
+
+    op.alter_column('failed_login_attempts', 'email',
+               existing_type=sa.String(length=100),
+               type_=sa.String(),
+               existing_nullable=False)
@@ -0,0 +1,77 @@
+"""
+Exportación de usuarios en streaming (CSV o NDJSON) con memoria constante.
+
+La consulta se ejecuta con `yield_per`, que en PostgreSQL abre un cursor del
+lado del servidor: la base entrega las filas por lotes y cada lote se
+serializa y se envía antes de pedir el siguiente. En memoria solo vive un
+lote de tuplas (nunca objetos ORM ni esquemas Pydantic), así que el consumo
+no crece con el número de usuarios.
+"""
+from datetime import date, datetime
+from typing import Iterator
+from sqlalchemy import Select
+from sqlalchemy.orm import Session
+from app.entorno import cargar_entorno
+import enum
+import json
+import csv
+import io
+import os
+
+
+cargar_entorno()
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _valor(valor):
+    if isinstance(valor, enum.Enum):
+        return valor.value
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def _lotes(db: Session, stmt: Select, tamano_lote: int):
+    resultado = db.execute(stmt.execution_options(yield_per=tamano_lote))
+    try:
+        yield from resultado.partitions()
+    finally:
+        resultado.close()
+
+
+def exportar_csv(db: Session, stmt: Select, campos: list[str], tamano_lote: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(campos)
+    for lote in _lotes(db, stmt, tamano_lote):
+        escritor.writerows([_valor(v) for v in fila] for fila in lote)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def exportar_ndjson(db: Session, stmt: Select, campos: list[str], tamano_lote: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    for lote in _lotes(db, stmt, tamano_lote):
+        yield "".join(
+            json.dumps(dict(zip(campos, map(_valor, fila))), ensure_ascii=False) + "\n"
+            for fila in lote
+        )
+
+
+def exportar_usuarios(db: Session, stmt: Select, campos: list[str], formato: str, tamano_lote: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """
+    Generador para `StreamingResponse`. Cierra la sesión al terminar: la
+    dependencia `get_db` ya ha salido cuando empieza a enviarse el cuerpo.
+    """
+    exportar = exportar_csv if formato == "csv" else exportar_ndjson
+    try:
+        yield from exportar(db, stmt, campos, tamano_lote)
+    finally:
+        db.close()
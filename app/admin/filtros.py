@@ -0,0 +1,102 @@
+"""
+Filtros y paginación por cursor (keyset) para los listados del panel de admin.
+
+El listado se ordena por `(created_at, id)` descendente y cada página devuelve
+un cursor opaco con la última clave vista; la siguiente página pide las filas
+estrictamente anteriores a esa clave. Con los índices compuestos que terminan
+en `(created_at, id)` la base salta directamente a la posición del cursor, así
+que la página N cuesta lo mismo que la primera (a diferencia de OFFSET).
+"""
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+from sqlalchemy import Select, select, tuple_
+from app.db.models.models import Usuario
+from app.enums import AccountStatus, Role
+import base64
+import json
+
+
+# Columnas que se pueden pedir con `fields`; las de autenticación no se exponen
+CAMPOS_USUARIO = (
+    "id", "email", "first_name", "last_name", "phone_number", "date_of_birth",
+    "shipping_address", "shipping_city", "shipping_country", "shipping_zip_code",
+    "account_status", "role", "two_factor_enabled", "is_email_verified",
+    "created_at", "updated_at", "last_login"
+)
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+class FiltroUsuarios(BaseModel):
+    account_status: Optional[AccountStatus] = None
+    role: Optional[Role] = None
+    is_email_verified: Optional[bool] = None
+    created_desde: Optional[datetime] = None
+    created_hasta: Optional[datetime] = None
+
+
+def codificar_cursor(created_at: datetime, id: int) -> str:
+    crudo = json.dumps([created_at.isoformat() if created_at else None, id])
+    return base64.urlsafe_b64encode(crudo.encode()).decode().rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple[Optional[datetime], int]:
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return (datetime.fromisoformat(created_at) if created_at else None), int(id)
+    except (ValueError, TypeError) as e:
+        raise CursorInvalido("Cursor inválido") from e
+
+
+def seleccionar_campos(fields: Optional[str]) -> list[str]:
+    """Valida la lista `fields=a,b,c`; sin ella se devuelven todas las columnas públicas"""
+    if not fields:
+        return list(CAMPOS_USUARIO)
+    campos = [campo.strip() for campo in fields.split(",") if campo.strip()]
+    desconocidos = [campo for campo in campos if campo not in CAMPOS_USUARIO]
+    if desconocidos:
+        raise ValueError(f"Campos desconocidos: {desconocidos}. Opciones válidas: {list(CAMPOS_USUARIO)}")
+    return list(dict.fromkeys(campos))
+
+
+def aplicar_filtros(stmt: Select, filtros: FiltroUsuarios) -> Select:
+    if filtros.account_status is not None:
+        stmt = stmt.where(Usuario.account_status == filtros.account_status)
+    if filtros.role is not None:
+        stmt = stmt.where(Usuario.role == filtros.role)
+    if filtros.is_email_verified is not None:
+        stmt = stmt.where(Usuario.is_email_verified == filtros.is_email_verified)
+    if filtros.created_desde is not None:
+        stmt = stmt.where(Usuario.created_at >= filtros.created_desde)
+    if filtros.created_hasta is not None:
+        stmt = stmt.where(Usuario.created_at < filtros.created_hasta)
+    return stmt
+
+
+def consulta_pagina_usuarios(
+    campos: list[str],
+    filtros: FiltroUsuarios,
+    limite: int,
+    cursor: Optional[str] = None
+) -> Select:
+    """
+    Construye el SELECT de una página: solo las columnas pedidas (más la clave
+    del cursor), filtros, posición del cursor y `limite + 1` filas para saber
+    si hay página siguiente sin un COUNT.
+    """
+    columnas = dict.fromkeys([*campos, "created_at", "id"])
+    stmt = aplicar_filtros(select(*(getattr(Usuario, c) for c in columnas)), filtros)
+    if cursor:
+        created_at, id = decodificar_cursor(cursor)
+        stmt = stmt.where(tuple_(Usuario.created_at, Usuario.id) < tuple_(created_at, id))
+    return stmt.order_by(Usuario.created_at.desc(), Usuario.id.desc()).limit(limite + 1)
+
+
+def consulta_exportacion(campos: list[str], filtros: FiltroUsuarios) -> Select:
+    """Mismos filtros que el listado, recorriendo toda la tabla por clave primaria"""
+    stmt = aplicar_filtros(select(*(getattr(Usuario, c) for c in campos)), filtros)
+    return stmt.order_by(Usuario.id)
@@ -0,0 +1,350 @@
+"""
+Importación masiva de clientes desde CSV.
+
+El archivo se procesa en segundo plano por lotes: cada lote se valida con
+`UsuarioCreate`, descarta los emails repetidos (en el archivo o ya
+registrados) antes de pagar bcrypt, hashea las contraseñas en el pool de
+procesos de hashing y entra en una sola transacción con un INSERT de varias
+filas `ON CONFLICT DO NOTHING`, los correos de activación en el outbox y el
+progreso en `usuario_importaciones`. Las filas rechazadas se escriben en un
+CSV de errores (fila, email, error).
+
+El CSV subido lleva contraseñas en claro: vive en `IMPORT_DIR` (permisos
+0700, archivo 0600) solo hasta que termina la importación, y al arrancar se
+marcan como fallidas las importaciones que un reinicio dejó a medias y se
+borran sus archivos.
+"""
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import BinaryIO, Iterable, Iterator, Optional
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from app.entorno import cargar_entorno
+from app.db.config import settings
+from app.db.database import SessionLocal
+from app.db.models.models import Usuario, UsuarioImportacion
+from app.enums import AccountStatus, EmailChannel, ImportStatus, Role
+from app.security.exceptions import HashingSaturatedError
+from app.security.hashing import HASH_WORKERS, hash_password_async
+from app.security.schemas import UsuarioCreate
+from app.services.email_outbox import encolar_emails, outbox_dispatcher
+from app.services.email_service_activation import contenido_email_activacion
+from app.services.hash_activacion_email import crear_token
+import contextvars
+import tempfile
+import asyncio
+import logging
+import csv
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+cargar_entorno()
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+# Hashes en vuelo de una importación; deja sitio en el pool para los logins
+IMPORT_HASH_CONCURRENCY = int(os.getenv("IMPORT_HASH_CONCURRENCY", str(max(1, HASH_WORKERS // 2))))
+IMPORT_DIR = os.getenv("IMPORT_DIR", os.path.join(tempfile.gettempdir(), "erp-importaciones"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(20 * 1024 * 1024)))
+# Con varios workers, una importación `running` más reciente puede ser de otro proceso
+IMPORT_STALE_MINUTES = int(os.getenv("IMPORT_STALE_MINUTES", "60"))
+
+COLUMNAS_IMPORTACION = (
+    "email", "password", "first_name", "last_name", "phone_number", "date_of_birth",
+    "shipping_address", "shipping_city", "shipping_country", "shipping_zip_code"
+)
+COLUMNAS_OBLIGATORIAS = ("email", "password", "first_name", "last_name")
+# Lo que mandan los navegadores y clientes habituales para un .csv
+TIPOS_CSV = {"text/csv", "application/csv", "text/plain", "application/vnd.ms-excel", "application/octet-stream"}
+
+
+class ArchivoDemasiadoGrande(ValueError):
+    pass
+
+
+def _lotes(filas: Iterable, tamano: int) -> Iterator[list]:
+    filas = iter(filas)
+    while lote := list(islice(filas, tamano)):
+        yield lote
+
+
+def _mensaje_validacion(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+
+
+def validar_lote(
+    filas: list[tuple[int, dict]],
+    vistos: set[str]
+) -> tuple[list[tuple[int, UsuarioCreate]], list[tuple[int, str, str]], list[tuple[int, str, str]]]:
+    """
+    Valida un lote de filas `(número, dict del CSV)`. Devuelve los usuarios
+    válidos, las filas inválidas y las repetidas, estas dos como
+    `(número, email, error)`; `vistos` acumula los emails del archivo para
+    detectar repetidos entre lotes.
+    """
+    validos, errores, repetidos = [], [], []
+    for numero, fila in filas:
+        datos = {c: (fila.get(c) or "").strip() or None for c in COLUMNAS_IMPORTACION}
+        try:
+            usuario = UsuarioCreate.model_validate(datos)
+        except ValidationError as e:
+            errores.append((numero, datos["email"] or "", _mensaje_validacion(e)))
+            continue
+        if usuario.email.lower() in vistos:
+            repetidos.append((numero, usuario.email, "email repetido en el archivo"))
+            continue
+        vistos.add(usuario.email.lower())
+        validos.append((numero, usuario))
+    return validos, errores, repetidos
+
+
+def _insert_sin_duplicados(dialecto: str):
+    tabla = Usuario.__table__
+    if dialecto == "postgresql":
+        return postgresql.insert(tabla).on_conflict_do_nothing(index_elements=["email"])
+    if dialecto == "sqlite":
+        return sqlite.insert(tabla).on_conflict_do_nothing(index_elements=["email"])
+    return insert(tabla)
+
+
+class ImportadorUsuarios:
+    def __init__(
+        self,
+        session_factory = SessionLocal,
+        tamano_lote: int = IMPORT_BATCH_SIZE,
+        concurrencia_hash: int = IMPORT_HASH_CONCURRENCY,
+        directorio: str = IMPORT_DIR
+    ):
+        self.session_factory = session_factory
+        self.tamano_lote = tamano_lote
+        self.concurrencia_hash = concurrencia_hash
+        self.directorio = directorio
+        self._tareas: set[asyncio.Task] = set()
+
+    def ruta_archivo(self, importacion_id: int) -> str:
+        return os.path.join(self.directorio, f"{importacion_id}.csv")
+
+    def ruta_errores(self, importacion_id: int) -> str:
+        return os.path.join(self.directorio, f"{importacion_id}-errores.csv")
+
+    def _preparar_directorio(self):
+        os.makedirs(self.directorio, mode=0o700, exist_ok=True)
+        # `mode` no cuenta si el directorio ya existía
+        os.chmod(self.directorio, 0o700)
+
+    def crear(self, filename: str, admin_email: Optional[str]) -> int:
+        """Registra la importación; el CSV se copia después con `guardar_archivo`"""
+        self._preparar_directorio()
+        with self.session_factory() as db:
+            importacion = UsuarioImportacion(
+                filename=filename, status=ImportStatus.running, created_by=admin_email,
+                total_rows=0, created=0, duplicates=0, invalid=0, created_at=datetime.now()
+            )
+            db.add(importacion)
+            db.commit()
+            return importacion.id
+
+    def guardar_archivo(self, importacion_id: int, origen: BinaryIO, maximo: int = IMPORT_MAX_BYTES):
+        """
+        Copia el CSV subido a `ruta_archivo(id)`. Si la copia falla o supera
+        `maximo` bytes, borra lo escrito, marca la importación como fallida y
+        relanza el error.
+        """
+        ruta = self.ruta_archivo(importacion_id)
+        try:
+            with open(os.open(ruta, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "wb") as destino:
+                copiados = 0
+                while bloque := origen.read(1024 * 1024):
+                    copiados += len(bloque)
+                    if copiados > maximo:
+                        raise ArchivoDemasiadoGrande(f"El archivo supera el máximo de {maximo} bytes")
+                    destino.write(bloque)
+        except Exception as e:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+            self._finalizar(importacion_id, ImportStatus.failed, str(e) or type(e).__name__, self.ruta_errores(importacion_id))
+            raise
+
+    def recuperar_interrumpidas(self, antes_de: Optional[datetime] = None) -> int:
+        """
+        Marca como fallidas las importaciones `running` creadas antes de
+        `antes_de` y borra sus CSV. Por defecto todas con un solo worker; con
+        varios, solo las que llevan más de `IMPORT_STALE_MINUTES`.
+        """
+        if antes_de is None:
+            antes_de = datetime.now()
+            if settings.WORKERS > 1:
+                antes_de -= timedelta(minutes=IMPORT_STALE_MINUTES)
+        with self.session_factory() as db:
+            ids = list(db.scalars(
+                update(UsuarioImportacion)
+                .where(UsuarioImportacion.status == ImportStatus.running, UsuarioImportacion.created_at < antes_de)
+                .values(status=ImportStatus.failed, last_error="Importación interrumpida por un reinicio",
+                        finished_at=datetime.now())
+                .returning(UsuarioImportacion.id)
+            ))
+            db.commit()
+        for importacion_id in ids:
+            ruta = self.ruta_archivo(importacion_id)
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        if ids:
+            logger.warning(f"{len(ids)} importaciones interrumpidas marcadas como fallidas: {ids}")
+        return len(ids)
+
+    def lanzar(self, importacion_id: int) -> asyncio.Task:
+        # Contexto vacío: la tarea no hereda los contextvars de la petición
+        # (p. ej. el contador de SQL, que acumularía cada sentencia del import)
+        tarea = asyncio.create_task(self.importar(importacion_id), context=contextvars.Context())
+        self._tareas.add(tarea)
+        tarea.add_done_callback(self._tareas.discard)
+        return tarea
+
+    async def detener(self):
+        for tarea in list(self._tareas):
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+
+    async def importar(self, importacion_id: int):
+        ruta = self.ruta_archivo(importacion_id)
+        ruta_errores = self.ruta_errores(importacion_id)
+        estado, ultimo_error = ImportStatus.finished, None
+        try:
+            with open(ruta, newline="", encoding="utf-8-sig") as archivo, \
+                    open(ruta_errores, "w", newline="", encoding="utf-8") as salida_errores:
+                lector = csv.DictReader(archivo)
+                faltan = [c for c in COLUMNAS_OBLIGATORIAS if c not in (lector.fieldnames or [])]
+                if faltan:
+                    raise ValueError(f"Faltan columnas obligatorias: {faltan}")
+
+                errores_csv = csv.writer(salida_errores)
+                errores_csv.writerow(["fila", "email", "error"])
+                vistos: set[str] = set()
+                # La fila 1 es la cabecera
+                for lote in _lotes(enumerate(lector, start=2), self.tamano_lote):
+                    errores = await self._procesar_lote(importacion_id, lote, vistos)
+                    errores_csv.writerows(errores)
+                    salida_errores.flush()
+        except asyncio.CancelledError:
+            estado, ultimo_error = ImportStatus.failed, "Importación interrumpida"
+            raise
+        except Exception as e:
+            logger.error(f"Importación {importacion_id} fallida: {e}", exc_info=True)
+            estado, ultimo_error = ImportStatus.failed, str(e)
+        finally:
+            await asyncio.to_thread(self._finalizar, importacion_id, estado, ultimo_error, ruta_errores)
+            if os.path.exists(ruta):
+                os.remove(ruta)
+        logger.info(f"Importación {importacion_id} terminada con estado {estado.value}")
+
+    async def _procesar_lote(self, importacion_id: int, lote: list[tuple[int, dict]], vistos: set[str]) -> list:
+        validos, errores, repetidos = validar_lote(lote, vistos)
+        invalidos = len(errores)
+        errores += repetidos
+
+        existentes = await asyncio.to_thread(self._existentes, [u.email for _, u in validos])
+        errores += [(n, u.email, "el usuario ya existe") for n, u in validos if u.email in existentes]
+        validos = [(n, u) for n, u in validos if u.email not in existentes]
+
+        hashes = await self._hashear([u.password for _, u in validos])
+        insertados = await asyncio.to_thread(
+            self._insertar, importacion_id, validos, hashes, len(lote), invalidos
+        )
+        # Lo que el ON CONFLICT descartó lo insertó otro proceso entre medias
+        errores += [(n, u.email, "el usuario ya existe") for n, u in validos if u.email not in insertados]
+        if insertados:
+            outbox_dispatcher.despertar()
+        return sorted(errores)
+
+    def _existentes(self, emails: list[str]) -> set[str]:
+        if not emails:
+            return set()
+        with self.session_factory() as db:
+            return set(db.scalars(select(Usuario.email).where(Usuario.email.in_(emails))))
+
+    async def _hashear(self, passwords: list[str]) -> list[str]:
+        semaforo = asyncio.Semaphore(self.concurrencia_hash)
+
+        async def hashear(password: str) -> str:
+            async with semaforo:
+                while True:
+                    try:
+                        return await hash_password_async(password)
+                    except HashingSaturatedError:
+                        # El pool está lleno de logins: la importación cede el turno
+                        await asyncio.sleep(0.1)
+
+        return await asyncio.gather(*(hashear(p) for p in passwords))
+
+    def _insertar(
+        self,
+        importacion_id: int,
+        validos: list[tuple[int, UsuarioCreate]],
+        hashes: list[str],
+        filas: int,
+        invalidos: int
+    ) -> set[str]:
+        with self.session_factory() as db:
+            insertados = set()
+            correos = {}
+            if validos:
+                ahora = datetime.now()
+                registros = []
+                for (_, usuario), password_hash in zip(validos, hashes):
+                    token, hash_token, expiracion = crear_token()
+                    correos[usuario.email] = contenido_email_activacion(usuario.first_name, token)
+                    registros.append({
+                        "email": usuario.email,
+                        "password_hash": password_hash,
+                        "first_name": usuario.first_name,
+                        "last_name": usuario.last_name,
+                        "date_of_birth": usuario.date_of_birth,
+                        "phone_number": usuario.phone_number,
+                        "shipping_address": usuario.shipping_address,
+                        "shipping_city": usuario.shipping_city,
+                        "shipping_country": usuario.shipping_country,
+                        "shipping_zip_code": usuario.shipping_zip_code,
+                        "account_status": AccountStatus.pending,
+                        "role": Role.CLIENT,
+                        "two_factor_enabled": False,
+                        "is_email_verified": False,
+                        "email_verification_token": hash_token,
+                        "email_verification_expiration": expiracion,
+                        "created_at": ahora,
+                    })
+                stmt = _insert_sin_duplicados(db.get_bind().dialect.name).returning(Usuario.__table__.c.email)
+                insertados = set(db.execute(stmt, registros).scalars())
+                encolar_emails(db, EmailChannel.brevo, [
+                    (email, *correos[email]) for email in correos if email in insertados
+                ])
+
+            db.execute(
+                update(UsuarioImportacion)
+                .where(UsuarioImportacion.id == importacion_id)
+                .values(
+                    total_rows=UsuarioImportacion.total_rows + filas,
+                    created=UsuarioImportacion.created + len(insertados),
+                    duplicates=UsuarioImportacion.duplicates + (filas - invalidos - len(insertados)),
+                    invalid=UsuarioImportacion.invalid + invalidos
+                )
+            )
+            db.commit()
+            return insertados
+
+    def _finalizar(self, importacion_id: int, estado: ImportStatus, ultimo_error: Optional[str], ruta_errores: str):
+        with self.session_factory() as db:
+            db.execute(
+                update(UsuarioImportacion)
+                .where(UsuarioImportacion.id == importacion_id)
+                .values(
+                    status=estado, last_error=ultimo_error, finished_at=datetime.now(),
+                    error_file=ruta_errores if os.path.exists(ruta_errores) else None
+                )
+            )
+            db.commit()
+
+
+importador_usuarios = ImportadorUsuarios()
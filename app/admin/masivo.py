@@ -0,0 +1,91 @@
+"""
+Cambios masivos de estado o rol con sentencias por conjuntos.
+
+En vez de select + commit + refresh por usuario, cada trozo de emails se
+actualiza con un único `UPDATE ... WHERE email IN (...) AND columna IS DISTINCT FROM valor
+RETURNING email`; una consulta de las filas existentes permite distinguir
+los emails sin cambios de los inexistentes. Todo va en una transacción.
+
+El admin que lanza el cambio queda siempre fuera (no puede banearse ni
+quitarse el rol a sí mismo), y un cambio por filtro se rechaza si afecta a
+más de `ADMIN_BULK_MAX` usuarios, el mismo límite que la lista de emails.
+"""
+from app.entorno import cargar_entorno
+from sqlalchemy import func, select, update
+from typing import Optional
+from sqlalchemy.orm import Session, InstrumentedAttribute
+from app.admin.filtros import FiltroUsuarios, aplicar_filtros
+from app.db.models.models import Usuario
+from app.security.principal_cache import invalidar_principal
+import os
+
+
+cargar_entorno()
+
+# Emails por sentencia: cómodo para el límite de parámetros de cualquier driver
+ADMIN_BULK_CHUNK = int(os.getenv("ADMIN_BULK_CHUNK", "1000"))
+ADMIN_BULK_MAX = int(os.getenv("ADMIN_BULK_MAX", "10000"))
+
+
+class SeleccionDemasiadoGrande(ValueError):
+    pass
+
+
+def _update(columna: InstrumentedAttribute, valor, excluir_id: Optional[int]):
+    return (
+        update(Usuario)
+        .where(columna.is_distinct_from(valor), Usuario.id != excluir_id)
+        .values({columna.key: valor})
+        .returning(Usuario.email)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def actualizar_por_emails(
+    db: Session,
+    columna: InstrumentedAttribute,
+    valor,
+    emails: list[str],
+    excluir_id: Optional[int] = None
+) -> dict:
+    """
+    Devuelve el resultado por email: `updated`, `unchanged` o `not_found`.
+    El usuario `excluir_id` cuenta como `unchanged`.
+    """
+    emails = list(dict.fromkeys(emails))
+    actualizados, existentes = set(), set()
+    for inicio in range(0, len(emails), ADMIN_BULK_CHUNK):
+        trozo = emails[inicio:inicio + ADMIN_BULK_CHUNK]
+        actualizados.update(db.scalars(_update(columna, valor, excluir_id).where(Usuario.email.in_(trozo))))
+        existentes.update(db.scalars(select(Usuario.email).where(Usuario.email.in_(trozo))))
+    db.commit()
+    invalidar_principal(*actualizados)
+
+    return {
+        email: "updated" if email in actualizados else "unchanged" if email in existentes else "not_found"
+        for email in emails
+    }
+
+
+def actualizar_por_filtro(
+    db: Session,
+    columna: InstrumentedAttribute,
+    valor,
+    filtros: FiltroUsuarios,
+    excluir_id: Optional[int] = None
+) -> dict:
+    """Aplica el cambio a todos los usuarios que cumplen el filtro del listado de admin"""
+    a_cambiar, sin_cambios = db.execute(
+        aplicar_filtros(select(
+            func.count(Usuario.id).filter(columna.is_distinct_from(valor), Usuario.id != excluir_id),
+            func.count(Usuario.id).filter(columna == valor)
+        ), filtros)
+    ).one()
+    if a_cambiar > ADMIN_BULK_MAX:
+        raise SeleccionDemasiadoGrande(
+            f"El filtro afecta a {a_cambiar} usuarios; el máximo por cambio masivo es {ADMIN_BULK_MAX}"
+        )
+    actualizados = list(db.scalars(aplicar_filtros(_update(columna, valor, excluir_id), filtros)))
+    db.commit()
+    invalidar_principal(*actualizados)
+    return {"updated": actualizados, "unchanged_count": sin_cambios}
@@ -1,14 +1,36 @@
 from sqlalchemy.orm import Session
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, status
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import EmailStr
-from app.enums import Role, AccountStatus
+from app.enums import Role, AccountStatus, EmailStatus
 from app.security.dependencies import require_admin 
-from app.db.models.models import Usuario
-from app.db.database import get_db
-from app.admin.schemas import UsersSchema, UserUpdateRequest, UsuarioStatus
-from app.security.hashing import hash_password, verify_password
+from app.security.jwt import token_cache
+from app.security.principal_cache import Principal, principal_cache, invalidar_principal
+from app.db.models.models import Usuario, EmailOutbox, UsuarioImportacion
+from app.db.database import get_db, estado_pools
+from app.db.sweeper import sweeper
+from app.serializacion import respuesta_json
+from app.admin.schemas import (
+    EstadoMasivo, PaginaUsuarios, ResultadoMasivo, RolMasivo, SeleccionMasiva, UserUpdateRequest, UsuarioStatus
+)
+from app.admin.masivo import SeleccionDemasiadoGrande, actualizar_por_emails, actualizar_por_filtro
+from app.admin.filtros import (
+    CursorInvalido, FiltroUsuarios, codificar_cursor, consulta_exportacion, consulta_pagina_usuarios,
+    seleccionar_campos
+)
+from app.admin.exportacion import FORMATOS, exportar_usuarios
+from app.admin.importacion import IMPORT_MAX_BYTES, TIPOS_CSV, ArchivoDemasiadoGrande, importador_usuarios
+from app.security.hashing import hash_password_async, verify_password_async, hashing_executor
+from app.services.email_outbox import outbox_dispatcher
+from app.services.email_otp import smtp_pool
+from app.services.refresh_token_service import revocar_tokens_usuario
+from app.entorno import cargar_entorno
+from datetime import datetime
+import asyncio
 import logging
+import os
+import anyio
 
 
 router = APIRouter()
@@ -16,23 +38,140 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+cargar_entorno()
+
+ADMIN_PAGE_SIZE = int(os.getenv("ADMIN_PAGE_SIZE", "50"))
+ADMIN_MAX_PAGE_SIZE = int(os.getenv("ADMIN_MAX_PAGE_SIZE", "500"))
+
+
 
 @router.post("/admin/")
-def admin_panel(user: Usuario = Depends(require_admin)): 
+def admin_panel(user: Principal = Depends(require_admin)): 
     return {"message": "Bienvenido, administrador"}
 
 
-@router.post("/admin/lista_usuarios", response_model= List[UsersSchema])
-def lista_usuarios(user: Usuario = Depends(require_admin), db: Session = Depends(get_db)):
-    usuarios = db.query(Usuario).all()
-    return usuarios
+@router.get("/admin/metricas/hashing")
+def metricas_hashing(user: Principal = Depends(require_admin)):
+    return hashing_executor.metricas()
+
+
+@router.get("/admin/metricas/pool")
+def metricas_pool(user: Principal = Depends(require_admin)):
+    return estado_pools()
+
+
+@router.get("/admin/metricas/cache")
+def metricas_cache(user: Principal = Depends(require_admin)):
+    return {
+        "principales": principal_cache.stats(),
+        "tokens": token_cache.stats()
+    }
+
+
+@router.get("/admin/metricas/email")
+async def metricas_email(user: Principal = Depends(require_admin)):
+    return {**await outbox_dispatcher.metricas(), "smtp": smtp_pool.metricas()}
+
+
+@router.get("/admin/metricas/limpieza")
+def metricas_limpieza(user: Principal = Depends(require_admin)):
+    return sweeper.metricas()
+
+
+@router.get("/admin/emails/{mensaje_id}")
+def estado_email(mensaje_id: int, user: Principal = Depends(require_admin), db: Session = Depends(get_db)):
+    mensaje = db.get(EmailOutbox, mensaje_id)
+    if not mensaje:
+        raise HTTPException(status_code=404, detail="Mensaje no encontrado")
+    return {
+        "id": mensaje.id,
+        "recipient": mensaje.recipient,
+        "channel": mensaje.channel.value,
+        "status": mensaje.status.value,
+        "attempts": mensaje.attempts,
+        "next_attempt_at": mensaje.next_attempt_at,
+        "last_error": mensaje.last_error,
+        "created_at": mensaje.created_at,
+        "sent_at": mensaje.sent_at
+    }
+
+
+@router.post("/admin/emails/{mensaje_id}/reintentar")
+def reintentar_email(mensaje_id: int, user: Principal = Depends(require_admin), db: Session = Depends(get_db)):
+    mensaje = db.get(EmailOutbox, mensaje_id)
+    if not mensaje:
+        raise HTTPException(status_code=404, detail="Mensaje no encontrado")
+    if mensaje.status != EmailStatus.dead:
+        raise HTTPException(status_code=409, detail="Solo se pueden reintentar mensajes descartados")
+
+    mensaje.status = EmailStatus.pending
+    mensaje.attempts = 0
+    mensaje.next_attempt_at = datetime.now()
+    db.commit()
+    outbox_dispatcher.despertar()
+    logger.info(f"Correo {mensaje_id} devuelto a la cola por {user.email}")
+    return {"id": mensaje_id, "status": mensaje.status.value}
+
+
+@router.get("/admin/lista_usuarios", response_model=PaginaUsuarios)
+@router.post("/admin/lista_usuarios", response_model=PaginaUsuarios)
+def lista_usuarios(
+    filtros: FiltroUsuarios = Depends(),
+    limit: int = Query(ADMIN_PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Columnas separadas por comas"),
+    user: Principal = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    try:
+        campos = seleccionar_campos(fields)
+        stmt = consulta_pagina_usuarios(campos, filtros, limit, cursor)
+    except CursorInvalido:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    filas = db.execute(stmt).all()
+    siguiente = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        siguiente = codificar_cursor(filas[-1].created_at, filas[-1].id)
+
+    # Las filas ya son tipos simples: se serializan sin revalidar con PaginaUsuarios
+    return respuesta_json({
+        "items": [{campo: getattr(fila, campo) for campo in campos} for fila in filas],
+        "next_cursor": siguiente,
+        "limit": limit
+    })
+
+
+@router.get("/admin/exportar_usuarios")
+def exportar_usuarios_admin(
+    filtros: FiltroUsuarios = Depends(),
+    formato: str = Query("csv", pattern="^(csv|ndjson)$"),
+    fields: Optional[str] = Query(None, description="Columnas separadas por comas"),
+    user: Principal = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    try:
+        campos = seleccionar_campos(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    logger.info(f"Exportación de usuarios en {formato} solicitada por {user.email}")
+    nombre = f"usuarios-{datetime.now():%Y%m%d-%H%M%S}.{formato}"
+    return StreamingResponse(
+        exportar_usuarios(db, consulta_exportacion(campos, filtros), campos, formato),
+        media_type=FORMATOS[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nombre}"'}
+    )
 
 
 @router.put("/admin/elegir_estado/{email}")
 def elegir_estado(
     email: EmailStr,
     datos: UsuarioStatus, 
-    admin: Usuario = Depends(require_admin), 
+    admin: Principal = Depends(require_admin), 
     db: Session = Depends(get_db)
 ):
     try:
@@ -67,6 +206,7 @@ def elegir_estado(
         usuario.account_status = new_status
         db.commit()
         db.refresh(usuario)
+        invalidar_principal(usuario.email)
         
         logger.info(f"Usuario {email} actualizado a estado {new_status} por admin {admin.email}")
 
@@ -86,12 +226,110 @@ def elegir_estado(
         )
 
 
+@router.post("/admin/importar_usuarios", status_code=status.HTTP_202_ACCEPTED)
+async def importar_usuarios(archivo: UploadFile, admin: Principal = Depends(require_admin)):
+    nombre = archivo.filename or "usuarios.csv"
+    if not nombre.lower().endswith(".csv") or (archivo.content_type or "text/csv") not in TIPOS_CSV:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="El archivo debe ser un CSV")
+    if archivo.size is not None and archivo.size > IMPORT_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"El archivo supera el máximo de {IMPORT_MAX_BYTES} bytes"
+        )
+    importacion_id = await asyncio.to_thread(importador_usuarios.crear, nombre, admin.email)
+    try:
+        await asyncio.to_thread(importador_usuarios.guardar_archivo, importacion_id, archivo.file)
+    except ArchivoDemasiadoGrande as e:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=str(e))
+    importador_usuarios.lanzar(importacion_id)
+    logger.info(f"Importación {importacion_id} ({nombre}) iniciada por {admin.email}")
+    return {"id": importacion_id, "status": "running"}
+
+
+@router.get("/admin/importaciones/{importacion_id}")
+def estado_importacion(importacion_id: int, user: Principal = Depends(require_admin), db: Session = Depends(get_db)):
+    importacion = db.get(UsuarioImportacion, importacion_id)
+    if not importacion:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    return {
+        "id": importacion.id,
+        "filename": importacion.filename,
+        "status": importacion.status.value,
+        "total_rows": importacion.total_rows,
+        "created": importacion.created,
+        "duplicates": importacion.duplicates,
+        "invalid": importacion.invalid,
+        "last_error": importacion.last_error,
+        "created_by": importacion.created_by,
+        "created_at": importacion.created_at,
+        "finished_at": importacion.finished_at
+    }
+
+
+@router.get("/admin/importaciones/{importacion_id}/errores")
+def errores_importacion(importacion_id: int, user: Principal = Depends(require_admin), db: Session = Depends(get_db)):
+    importacion = db.get(UsuarioImportacion, importacion_id)
+    if not importacion:
+        raise HTTPException(status_code=404, detail="Importación no encontrada")
+    ruta = importacion.error_file or importador_usuarios.ruta_errores(importacion_id)
+    if not os.path.exists(ruta):
+        raise HTTPException(status_code=404, detail="El archivo de errores no está disponible")
+    return FileResponse(ruta, media_type="text/csv", filename=f"importacion-{importacion_id}-errores.csv")
+
+
+def _cambio_masivo(db: Session, columna, valor, datos: SeleccionMasiva, admin: Principal) -> dict:
+    if datos.filtro is not None:
+        try:
+            resultado = actualizar_por_filtro(db, columna, valor, datos.filtro, excluir_id=admin.id)
+        except SeleccionDemasiadoGrande as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        return {
+            "updated": len(resultado["updated"]),
+            "unchanged": resultado["unchanged_count"],
+            "updated_emails": resultado["updated"]
+        }
+
+    resultados = actualizar_por_emails(db, columna, valor, datos.emails, excluir_id=admin.id)
+    conteo = {"updated": 0, "unchanged": 0, "not_found": 0}
+    for estado in resultados.values():
+        conteo[estado] += 1
+    return {**conteo, "results": resultados}
+
+
+@router.post("/admin/elegir_estado_masivo", response_model=ResultadoMasivo, response_model_exclude_none=True)
+def elegir_estado_masivo(
+    datos: EstadoMasivo,
+    admin: Principal = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    resultado = _cambio_masivo(db, Usuario.account_status, datos.new_status, datos, admin)
+    logger.info(
+        f"Admin {admin.email} cambió a {datos.new_status.value} el estado de {resultado['updated']} usuarios "
+        f"({resultado['unchanged']} sin cambios, {resultado.get('not_found', 0)} no encontrados)"
+    )
+    return resultado
+
+
+@router.post("/admin/elegir_rol_masivo", response_model=ResultadoMasivo, response_model_exclude_none=True)
+def elegir_rol_masivo(
+    datos: RolMasivo,
+    admin: Principal = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    resultado = _cambio_masivo(db, Usuario.role, datos.role, datos, admin)
+    logger.info(
+        f"Admin {admin.email} asignó el rol {datos.role.value} a {resultado['updated']} usuarios "
+        f"({resultado['unchanged']} sin cambios, {resultado.get('not_found', 0)} no encontrados)"
+    )
+    return resultado
+
+
 @router.put("/admin/actualizar_usuario/{email}")
 def actualizar_usuario(
     email: EmailStr,
     datos: UserUpdateRequest,
     db: Session = Depends(get_db),
-    admin: Usuario = Depends(require_admin)
+    admin: Principal = Depends(require_admin)
 ):
     usuario = db.query(Usuario).filter(Usuario.email == email).first() 
     logger.info(f"Iniciando proceso de actualización para usuario con correo electrónico: {email}")   
@@ -116,9 +354,11 @@ def actualizar_usuario(
         cambios = True
 
     if datos.password:
-        if not verify_password(datos.password, usuario.password_hash): 
+        # La ruta corre en el threadpool; bcrypt se delega al pool del bucle
+        if not anyio.from_thread.run(verify_password_async, datos.password, usuario.password_hash): 
             logger.info("Contraseña cambiada con éxito.") 
-            usuario.password_hash = hash_password(datos.password)  
+            usuario.password_hash = anyio.from_thread.run(hash_password_async, datos.password)  
+            revocar_tokens_usuario(db, usuario.id)
             cambios = True
 
     if datos.role:
@@ -141,6 +381,7 @@ def actualizar_usuario(
 
     db.commit()
     db.refresh(usuario)
+    invalidar_principal(email, usuario.email)
 
     return {
         "message": "Usuario actualizado correctamente",
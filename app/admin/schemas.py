@@ -1,13 +1,15 @@
-from pydantic import BaseModel, ConfigDict, EmailStr
-from typing import Optional
-from app.security.utils import PasswordStr
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, model_validator
+from typing import Any, Optional
+from app.security.utils import PasswordStr, EmailSalida
 from app.enums import AccountStatus, Role
+from app.admin.filtros import FiltroUsuarios
+from app.admin.masivo import ADMIN_BULK_MAX
 from datetime import date
 
 
 class UsersSchema(BaseModel):
     id: int
-    email: EmailStr
+    email: EmailSalida
     first_name: str
     last_name: str
     phone_number: Optional[str] = None
@@ -24,6 +26,12 @@ class UsersSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class PaginaUsuarios(BaseModel):
+    items: list[dict[str, Any]]
+    next_cursor: Optional[str] = None
+    limit: int
+
+
 class UserUpdateRequest(BaseModel):
     email: Optional[EmailStr] = None
     two_factor_enabled: Optional[bool] = None
@@ -36,4 +44,35 @@ class UserUpdateRequest(BaseModel):
 class UsuarioStatus(BaseModel):
     new_status: Optional[AccountStatus] 
 
-    model_config = ConfigDict(from_attributes=True) 
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True) 
+
+
+class SeleccionMasiva(BaseModel):
+    """Usuarios afectados por un cambio masivo: una lista de emails o un filtro del listado"""
+    emails: Optional[list[EmailStr]] = Field(None, min_length=1, max_length=ADMIN_BULK_MAX)
+    filtro: Optional[FiltroUsuarios] = None
+
+    @model_validator(mode="after")
+    def una_seleccion(self):
+        if (self.emails is None) == (self.filtro is None):
+            raise ValueError("Indica 'emails' o 'filtro', pero no ambos")
+        # Un filtro vacío seleccionaría a todos los usuarios
+        if self.filtro is not None and not self.filtro.model_dump(exclude_none=True):
+            raise ValueError("El filtro necesita al menos un criterio")
+        return self
+
+
+class EstadoMasivo(SeleccionMasiva):
+    new_status: AccountStatus
+
+
+class RolMasivo(SeleccionMasiva):
+    role: Role
+
+
+class ResultadoMasivo(BaseModel):
+    updated: int
+    unchanged: int
+    not_found: int = 0
+    results: Optional[dict[str, str]] = None
+    updated_emails: Optional[list[str]] = None
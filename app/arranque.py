@@ -0,0 +1,138 @@
+"""
+Tiempos de arranque del worker.
+
+Desactivado por defecto. Con `STARTUP_PROFILE=true`,
+`perfil_arranque.instalar()` (lo primero que ejecuta `main.py`) sustituye
+`__import__` por una versión que cronometra cada módulo que se carga por
+primera vez, hasta que `fin_importaciones()` la retira. El lifespan mide sus
+pasos con `fase(nombre)` y al terminar `informe()` escribe en el log el
+total, cada fase y las importaciones más lentas hechas desde el código de la
+aplicación (la de `sib_api_v3_sdk` desde `app.services...`, por ejemplo).
+
+    STARTUP_PROFILE=true       # activa la medición
+    STARTUP_PROFILE_TOP=15     # importaciones que aparecen en el informe
+"""
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Optional
+from app.entorno import cargar_entorno
+import threading
+import builtins
+import logging
+import time
+import sys
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+cargar_entorno()
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "false").lower() == "true"
+STARTUP_PROFILE_TOP = int(os.getenv("STARTUP_PROFILE_TOP", "15"))
+
+PAQUETES_PROPIOS = ("__main__", "main", "app")
+
+
+@dataclass
+class Importacion:
+    modulo: str
+    desde: str
+    segundos: float
+
+
+def _es_propio(modulo: str) -> bool:
+    return modulo.split(".")[0] in PAQUETES_PROPIOS
+
+
+class PerfilArranque:
+    def __init__(self, activo: bool = STARTUP_PROFILE, top: int = STARTUP_PROFILE_TOP):
+        self.activo = activo
+        self.top = top
+        self.importaciones: list[Importacion] = []
+        self.fases: list[tuple[str, float]] = []
+        self._inicio: Optional[float] = None
+        self._import_original = None
+        self._pila = threading.local()
+        self._informado = False
+
+    def instalar(self):
+        if not self.activo or self._import_original is not None:
+            return
+        self._inicio = time.perf_counter()
+        self._import_original = builtins.__import__
+        builtins.__import__ = self._importar
+
+    def _importar(self, name, globals=None, locals=None, fromlist=(), level=0):
+        # Solo cuentan las importaciones absolutas de módulos aún no cargados;
+        # las demás se resuelven con un diccionario y no cuestan nada
+        if level:
+            return self._import_original(name, globals, locals, fromlist, level)
+        if name in sys.modules:
+            # `from paquete import submodulo` carga el submódulo sin volver a
+            # pasar por __import__
+            nuevos = [
+                f"{name}.{x}" for x in (fromlist or ()) if x != "*" and f"{name}.{x}" not in sys.modules
+            ] if hasattr(sys.modules[name], "__path__") else []
+            if not nuevos:
+                return self._import_original(name, globals, locals, fromlist, level)
+        else:
+            nuevos = [name]
+
+        pila = self._pila.__dict__.setdefault("modulos", [])
+        desde = pila[-1] if pila else ((globals or {}).get("__name__") or "?")
+        pila.append(nuevos[0])
+        inicio = time.perf_counter()
+        try:
+            return self._import_original(name, globals, locals, fromlist, level)
+        finally:
+            pila.pop()
+            # Los nombres del fromlist que no eran submódulos no se cuentan
+            cargados = [modulo for modulo in nuevos if modulo in sys.modules]
+            if cargados:
+                self.importaciones.append(Importacion(cargados[0], desde, time.perf_counter() - inicio))
+
+    def fin_importaciones(self):
+        if self._import_original is None:
+            return
+        builtins.__import__ = self._import_original
+        self._import_original = None
+        self.fases.append(("importaciones", time.perf_counter() - self._inicio))
+
+    @contextmanager
+    def fase(self, nombre: str):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.activo and not self._informado:
+                self.fases.append((nombre, time.perf_counter() - inicio))
+
+    def mas_lentas(self) -> list[Importacion]:
+        """
+        Importaciones hechas directamente desde el código propio, de más a
+        menos lenta: es lo que se puede retrasar o quitar. El tiempo de cada
+        una incluye el de los módulos que importa a su vez.
+        """
+        directas = [i for i in self.importaciones if _es_propio(i.desde) or _es_propio(i.modulo)]
+        return sorted(directas, key=lambda i: i.segundos, reverse=True)[:self.top]
+
+    def informe(self) -> Optional[str]:
+        """Solo el primer arranque del proceso; los siguientes lifespans (tests) no cuentan"""
+        if not self.activo or self._inicio is None or self._informado:
+            return None
+        self._informado = True
+        total = time.perf_counter() - self._inicio
+        lineas = [f"Arranque del worker en {total * 1000:.0f} ms"]
+        lineas += [f"  fase {nombre:<28} {segundos * 1000:8.1f} ms" for nombre, segundos in self.fases]
+        lineas.append("  importaciones más lentas desde la aplicación:")
+        lineas += [
+            f"    {i.segundos * 1000:8.1f} ms  {i.modulo}  (desde {i.desde})" for i in self.mas_lentas()
+        ]
+        texto = "\n".join(lineas)
+        logger.info(texto)
+        return texto
+
+
+perfil_arranque = PerfilArranque()
@@ -0,0 +1,96 @@
+from collections import deque
+from typing import Optional
+from sqlalchemy import insert
+from app.db.database import SessionLocal
+import asyncio
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+
+class EscritorPorLotes:
+    """
+    Acumula filas en memoria y las inserta por lotes desde una tarea de fondo.
+
+    Pensado para registros de auditoría: `agregar` no toca la base, así que
+    puede llamarse en el camino caliente de una petición. Si la cola supera
+    `max_pendientes` se descartan las filas más antiguas en lugar de crecer
+    sin límite; las filas pendientes se vuelcan al parar la aplicación.
+    """
+
+    def __init__(
+        self,
+        modelo,
+        session_factory = SessionLocal,
+        tamano_lote: int = 500,
+        intervalo: float = 2.0,
+        max_pendientes: int = 50_000
+    ):
+        self.modelo = modelo
+        self.session_factory = session_factory
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self._pendientes = deque(maxlen=max_pendientes)
+        self._tarea: Optional[asyncio.Task] = None
+        self._evento: Optional[asyncio.Event] = None
+        self._escritas = 0
+        self._descartadas = 0
+        self._fallidas = 0
+
+    def agregar(self, **fila):
+        if len(self._pendientes) == self._pendientes.maxlen:
+            self._descartadas += 1
+        self._pendientes.append(fila)
+        if self._evento is not None and len(self._pendientes) >= self.tamano_lote:
+            self._evento.set()
+
+    async def start(self):
+        if self._tarea is None:
+            self._evento = asyncio.Event()
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def stop(self):
+        tarea, self._tarea = self._tarea, None
+        if tarea is not None:
+            tarea.cancel()
+            await asyncio.gather(tarea, return_exceptions=True)
+        self._evento = None
+        await self.vaciar()
+
+    async def _bucle(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._evento.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._evento.clear()
+            await self.vaciar()
+
+    async def vaciar(self) -> int:
+        """Inserta todo lo pendiente en lotes de `tamano_lote`; devuelve las filas escritas"""
+        escritas = 0
+        while self._pendientes:
+            lote = [self._pendientes.popleft() for _ in range(min(self.tamano_lote, len(self._pendientes)))]
+            try:
+                await asyncio.to_thread(self._insertar, lote)
+            except Exception as e:
+                self._fallidas += len(lote)
+                logger.error(f"No se pudo escribir un lote de {len(lote)} filas en {self.modelo.__tablename__}: {e}")
+                break
+            escritas += len(lote)
+        self._escritas += escritas
+        return escritas
+
+    def _insertar(self, lote: list[dict]):
+        with self.session_factory() as db:
+            db.execute(insert(self.modelo), lote)
+            db.commit()
+
+    def metricas(self) -> dict:
+        return {
+            "pendientes": len(self._pendientes),
+            "escritas": self._escritas,
+            "descartadas": self._descartadas,
+            "fallidas": self._fallidas,
+        }
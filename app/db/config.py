@@ -4,13 +4,58 @@ import sys
 from pydantic import ConfigDict
 
 
-class BaseSettingsConfig(BaseSettings):
+def async_url(url: str) -> str:
+    """Traduce una URL sincrónica al driver async equivalente"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+class PoolSettings(BaseSettings):
+    """Pool de conexiones; los totales se reparten entre los workers de uvicorn"""
+    WORKERS: int = 1
+    DB_POOL_SIZE: int = 20
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_LOG_INTERVAL: int = 60
+
+    def pool_options(self, url: str, fraccion: float = 1.0) -> dict:
+        """
+        Argumentos de pool para `create_engine` en este worker.
+
+        `fraccion` es la parte del presupuesto del worker que recibe el motor
+        (sync y async se lo reparten cuando ambos atienden rutas).
+        """
+        opciones = {"pool_pre_ping": self.DB_POOL_PRE_PING}
+        if url.startswith("sqlite"):
+            return opciones
+
+        workers = max(1, self.WORKERS)
+        opciones.update(
+            pool_size = max(1, int(self.DB_POOL_SIZE * fraccion) // workers),
+            max_overflow = int(self.DB_MAX_OVERFLOW * fraccion) // workers,
+            pool_timeout = self.DB_POOL_TIMEOUT,
+            pool_recycle = self.DB_POOL_RECYCLE,
+        )
+        return opciones
+
+
+class BaseSettingsConfig(PoolSettings):
     model_config = ConfigDict(env_file = ".env", extra="ignore")
     
 
-class TestSettingsConfig(BaseSettings):
+class TestSettingsConfig(PoolSettings):
     model_config = ConfigDict(env_file = ".env.test", extra="ignore")
     DATABASE_URL: str
+    ASYNC_DB_ROUTES: str = ""
+
+    @property
+    def ASYNC_DATABASE_URL(self):
+        return async_url(self.DATABASE_URL)
     
 
 class ProdSettings(BaseSettingsConfig):
@@ -20,11 +65,16 @@ class ProdSettings(BaseSettingsConfig):
     POSTGRES_SERVER: str
     POSTGRES_PORT: int
     SECRET_KEY: str
+    ASYNC_DB_ROUTES: str = ""
 
     @property
     def DATABASE_URL(self):        
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
 
+    @property
+    def ASYNC_DATABASE_URL(self):
+        return async_url(self.DATABASE_URL)
+
     model_config = ConfigDict(from_attributes=True)
 
 
@@ -35,4 +85,4 @@ def get_settings():
     return ProdSettings()
 
 
-settings = get_settings()
\ No newline at end of file
+settings = get_settings()
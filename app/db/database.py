@@ -1,16 +1,61 @@
 from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from app.db.config import settings
+from app.db.pool_metrics import PoolTelemetry, pool_instrumentado, resumen_pools
+from app.db.query_counter import instrumentar_motor
+import inspect as pyinspect
+import asyncio
 import logging
 
 
 Base = declarative_base()
 logger = logging.getLogger(__name__)
 
-engine = create_engine(settings.DATABASE_URL)
+# Rutas migradas a la sesión async, p. ej. ASYNC_DB_ROUTES="login,verify_otp"
+ASYNC_DB_ROUTES = {ruta.strip() for ruta in settings.ASYNC_DB_ROUTES.split(",") if ruta.strip()}
+
+
+def _opciones_motor(url: str, base_pool, telemetria: PoolTelemetry, fraccion: float) -> dict:
+    opciones = settings.pool_options(url, fraccion = fraccion)
+    if "pool_size" in opciones:
+        opciones["poolclass"] = pool_instrumentado(base_pool, telemetria)
+    return opciones
+
+
+sync_pool_telemetry = PoolTelemetry("sync")
+async_pool_telemetry = PoolTelemetry("async")
+
+# Sin rutas async el motor async se queda con una conexión y el sync con todo el presupuesto
+FRACCION_ASYNC = 0.5 if ASYNC_DB_ROUTES else 0.0
+
+engine = create_engine(
+    settings.DATABASE_URL,
+    **_opciones_motor(settings.DATABASE_URL, QueuePool, sync_pool_telemetry, 1 - FRACCION_ASYNC)
+)
 SessionLocal = sessionmaker(autocommit = False, autoflush = False, bind = engine)
 
+async_engine = create_async_engine(
+    settings.ASYNC_DATABASE_URL,
+    **_opciones_motor(settings.ASYNC_DATABASE_URL, AsyncAdaptedQueuePool, async_pool_telemetry, FRACCION_ASYNC)
+)
+AsyncSessionLocal = async_sessionmaker(bind = async_engine, autoflush = False, expire_on_commit = False)
+
+instrumentar_motor()
+
+
+def motores_db() -> dict:
+    return {
+        "sync": (engine.pool, sync_pool_telemetry),
+        "async": (async_engine.sync_engine.pool, async_pool_telemetry),
+    }
+
+
+def estado_pools() -> dict:
+    return resumen_pools(motores_db())
+
 
 def check_tables_exist():
     """Verificación sincrónica de existencia de tablas"""
@@ -27,4 +72,46 @@ def get_db():
         db.rollback() 
         raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except SQLAlchemyError as e:
+            logger.error(f"Database error: {e}")
+            await db.rollback()
+            raise
+
+
+def usa_db_async(ruta: str) -> bool:
+    return ruta in ASYNC_DB_ROUTES
+
+
+def get_db_para(ruta: str):
+    """Devuelve la dependencia de sesión (sync o async) configurada para la ruta"""
+    return get_async_db if usa_db_async(ruta) else get_db
+
+
+async def resolver(resultado):
+    """
+    Espera el resultado si viene de una AsyncSession.
+
+    Permite que una misma ruta funcione con Session o AsyncSession:
+    `await resolver(db.commit())`, `await resolver(db.execute(stmt))`.
+    """
+    if pyinspect.isawaitable(resultado):
+        return await resultado
+    return resultado
+
+
+async def en_sesion(db, funcion, *args):
+    """
+    Ejecuta `funcion(session, *args)`, escrita para la sesión sync, sin
+    bloquear el bucle: con AsyncSession mediante `run_sync` (la E/S sigue
+    siendo async) y con Session en un hilo, como una ruta `def`.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(funcion, *args)
+    return await asyncio.to_thread(funcion, db, *args)
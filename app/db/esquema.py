@@ -0,0 +1,70 @@
+"""
+Comprobación barata del esquema al arrancar.
+
+En lugar de inspeccionar las tablas, se compara la revisión guardada en
+`alembic_version` con la cabeza de las migraciones. La cabeza se obtiene
+leyendo `revision` y `down_revision` de los archivos de `alembic/versions`
+sin importar alembic (importarlo cuesta más que la propia comprobación).
+"""
+from typing import Optional
+from sqlalchemy import Column, Engine, MetaData, String, Table, select
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from app.entorno import cargar_entorno
+import ast
+import os
+import re
+
+
+cargar_entorno()
+
+ALEMBIC_VERSIONS_DIR = os.getenv("ALEMBIC_VERSIONS_DIR", "alembic/versions")
+
+# Misma definición que la tabla que crea alembic
+alembic_version = Table(
+    "alembic_version",
+    MetaData(),
+    Column("version_num", String(32), primary_key=True)
+)
+
+_ASIGNACION = re.compile(r"^(revision|down_revision)\s*(?::[^=]+)?=\s*(.+?)\s*$", re.MULTILINE)
+
+
+def revisiones_codigo(directorio: str = ALEMBIC_VERSIONS_DIR) -> set[str]:
+    """Cabeza(s) de las migraciones: revisiones de las que no parte ninguna otra"""
+    revisiones, anteriores = set(), set()
+    for nombre in os.listdir(directorio):
+        if not nombre.endswith(".py"):
+            continue
+        with open(os.path.join(directorio, nombre), encoding="utf-8") as archivo:
+            valores = dict(_ASIGNACION.findall(archivo.read()))
+        if "revision" not in valores:
+            continue
+        revisiones.add(ast.literal_eval(valores["revision"]))
+        anterior = ast.literal_eval(valores.get("down_revision", "None"))
+        if isinstance(anterior, str):
+            anteriores.add(anterior)
+        elif anterior:
+            anteriores.update(anterior)
+    return revisiones - anteriores
+
+
+def revisiones_base(engine: Engine) -> Optional[set[str]]:
+    """Revisiones aplicadas en la base, o None si nunca se migró con alembic"""
+    try:
+        with engine.connect() as conn:
+            return set(conn.scalars(select(alembic_version.c.version_num)))
+    except (OperationalError, ProgrammingError):
+        return None
+
+
+def marcar_revision(engine: Engine, revisiones: set[str]):
+    """Equivalente a `alembic stamp head` tras crear las tablas con `create_all`"""
+    with engine.begin() as conn:
+        alembic_version.create(conn, checkfirst=True)
+        conn.execute(alembic_version.delete())
+        if revisiones:
+            conn.execute(alembic_version.insert(), [{"version_num": r} for r in sorted(revisiones)])
+
+
+def borrar_revision(engine: Engine):
+    alembic_version.drop(engine, checkfirst=True)
@@ -0,0 +1,184 @@
+"""
+Asesor de índices: pasa por EXPLAIN las consultas calientes de la aplicación
+y avisa de las que recorren una tabla entera.
+
+En PostgreSQL se ejecuta con `enable_seqscan = off`: en tablas pequeñas el
+planificador prefiere un Seq Scan aunque exista índice, así que un Seq Scan
+que sobrevive a esa penalización significa que no hay índice utilizable. En
+SQLite se usa `EXPLAIN QUERY PLAN` y se buscan los pasos `SCAN <tabla>` sin
+índice.
+
+    python -m app.db.index_advisor                 # base configurada en DATABASE_URL / .env
+    python -m app.db.index_advisor --url sqlite:///erp.db
+
+Sale con código 1 si alguna consulta hace un recorrido secuencial, para
+poder usarlo en CI contra una base con las migraciones aplicadas.
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable
+from sqlalchemy import Engine, create_engine, delete, func, select, update
+from sqlalchemy.sql import Executable
+from app.db.models.models import (
+    OTP, EmailOutbox, LoginAttemptAudit, RefreshToken, Usuario, UsuarioImportacion
+)
+from app.enums import AccountStatus, EmailStatus, Role
+import argparse
+import json
+import sys
+
+
+@dataclass
+class ConsultaCaliente:
+    nombre: str
+    construir: Callable[[], Executable]
+
+
+@dataclass
+class Diagnostico:
+    consulta: str
+    recorridos: list[str]
+    plan: str
+
+    @property
+    def correcto(self) -> bool:
+        return not self.recorridos
+
+
+AHORA = datetime(2026, 1, 1)
+
+# Formas de las consultas de las rutas y tareas de fondo, con valores de ejemplo
+CONSULTAS: list[ConsultaCaliente] = [
+    ConsultaCaliente("login / principal por email", lambda: select(Usuario).where(Usuario.email == "a@example.com")),
+    ConsultaCaliente(
+        "activación por token",
+        lambda: select(Usuario).where(Usuario.email_verification_token == "digest")
+    ),
+    ConsultaCaliente(
+        "OTP en base: consumir",
+        lambda: select(OTP).join(Usuario, Usuario.id == OTP.user_id).where(func.lower(Usuario.email) == "a@example.com")
+    ),
+    ConsultaCaliente("OTP en base: sustituir", lambda: delete(OTP).where(OTP.user_id == 1)),
+    ConsultaCaliente(
+        "OTP caducados sin usar",
+        lambda: delete(OTP).where(OTP.is_used == False, OTP.expiration < AHORA)
+    ),
+    ConsultaCaliente(
+        "listado de admin",
+        lambda: select(Usuario.id).order_by(Usuario.created_at.desc(), Usuario.id.desc()).limit(51)
+    ),
+    ConsultaCaliente(
+        "listado de admin por estado",
+        lambda: select(Usuario.id)
+        .where(Usuario.account_status == AccountStatus.banned)
+        .order_by(Usuario.created_at.desc(), Usuario.id.desc()).limit(51)
+    ),
+    ConsultaCaliente(
+        "personal activo por rol",
+        lambda: select(Usuario.id)
+        .where(Usuario.account_status == AccountStatus.active, Usuario.role == Role.SALES_MANAGER)
+        .order_by(Usuario.created_at.desc(), Usuario.id.desc()).limit(51)
+    ),
+    ConsultaCaliente(
+        "altas pendientes de verificar",
+        lambda: select(Usuario.id).where(
+            Usuario.account_status == AccountStatus.pending,
+            Usuario.is_email_verified == False,
+            Usuario.created_at < AHORA
+        )
+    ),
+    ConsultaCaliente(
+        "cambio masivo por emails",
+        lambda: update(Usuario)
+        .where(Usuario.email.in_(["a@example.com", "b@example.com"]))
+        .values(account_status=AccountStatus.banned)
+    ),
+    ConsultaCaliente(
+        "refresh token por digest",
+        lambda: select(RefreshToken).where(RefreshToken.token_digest == "digest")
+    ),
+    ConsultaCaliente(
+        "revocar familia de refresh tokens",
+        lambda: update(RefreshToken).where(RefreshToken.family_id == "familia").values(revoked_at=AHORA)
+    ),
+    ConsultaCaliente(
+        "outbox: reclamar pendientes",
+        lambda: select(EmailOutbox.id)
+        .where(EmailOutbox.status == EmailStatus.pending, EmailOutbox.next_attempt_at <= AHORA)
+        .order_by(EmailOutbox.next_attempt_at).limit(10)
+    ),
+    ConsultaCaliente(
+        "auditoría de login por email",
+        lambda: select(LoginAttemptAudit)
+        .where(LoginAttemptAudit.email == "a@example.com")
+        .order_by(LoginAttemptAudit.created_at.desc()).limit(20)
+    ),
+    ConsultaCaliente("progreso de importación", lambda: select(UsuarioImportacion).where(UsuarioImportacion.id == 1)),
+]
+
+
+def _sql(engine: Engine, consulta: Executable) -> str:
+    # Con los valores en línea el plan es el de la sentencia tal cual, sin
+    # depender de cómo cada driver pasa los parámetros a EXPLAIN
+    return str(consulta.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+
+
+def _recorridos_postgres(nodo: dict) -> list[str]:
+    recorridos = []
+    if nodo.get("Node Type") == "Seq Scan":
+        recorridos.append(nodo.get("Relation Name", "?"))
+    for hijo in nodo.get("Plans", []):
+        recorridos += _recorridos_postgres(hijo)
+    return recorridos
+
+
+def explicar(engine: Engine, consulta: ConsultaCaliente) -> Diagnostico:
+    sql = _sql(engine, consulta.construir())
+    # La transacción se deshace al salir: EXPLAIN no ejecuta, pero así
+    # tampoco persiste el SET de la sesión
+    with engine.connect() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+            plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}").scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return Diagnostico(consulta.nombre, _recorridos_postgres(plan[0]["Plan"]), json.dumps(plan, indent=2))
+
+        filas = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()
+        pasos = [fila[-1] for fila in filas]
+        recorridos = [
+            paso.split()[1] for paso in pasos
+            if paso.startswith("SCAN ") and " INDEX " not in paso and "CONSTANT ROW" not in paso
+        ]
+        return Diagnostico(consulta.nombre, recorridos, "\n".join(pasos))
+
+
+def revisar(engine: Engine, consultas: list[ConsultaCaliente] = CONSULTAS) -> list[Diagnostico]:
+    return [explicar(engine, consulta) for consulta in consultas]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="URL de la base a revisar (por defecto la de la aplicación)")
+    parser.add_argument("--plan", action="store_true", help="muestra el plan de todas las consultas")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        engine = create_engine(args.url)
+    else:
+        from app.db.database import engine
+
+    diagnosticos = revisar(engine)
+    for diagnostico in diagnosticos:
+        marca = "ok  " if diagnostico.correcto else "SCAN"
+        detalle = "" if diagnostico.correcto else f"  recorrido secuencial en {', '.join(diagnostico.recorridos)}"
+        print(f"[{marca}] {diagnostico.consulta}{detalle}")
+        if args.plan or not diagnostico.correcto:
+            print("       " + diagnostico.plan.replace("\n", "\n       "))
+
+    malos = sum(not d.correcto for d in diagnosticos)
+    print(f"\n{len(diagnosticos) - malos}/{len(diagnosticos)} consultas calientes usan índice")
+    return 1 if malos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
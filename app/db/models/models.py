@@ -1,8 +1,8 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Enum, ForeignKey, Date
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Enum, ForeignKey, Date, Text, Index, text
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
-from app.enums import AccountStatus, Role
+from app.enums import AccountStatus, Role, EmailStatus, EmailChannel, ImportStatus
 
 
 
@@ -26,26 +26,59 @@ class Usuario(Base):
     last_login = Column(DateTime, nullable = True)
     two_factor_enabled = Column(Boolean, default = False)
     is_email_verified = Column(Boolean, default = False)
-    email_verification_token = Column(String(100), nullable = True) 
+    email_verification_token = Column(String(100), nullable = True, index = True) 
     email_verification_expiration = Column(DateTime, nullable = True)
 
     otps = relationship("OTP", back_populates="user", cascade="all, delete-orphan")
+    refresh_tokens = relationship("RefreshToken", back_populates="user", cascade="all, delete-orphan")
+
+    # Paginación por cursor del listado de admin: orden (created_at, id) y
+    # filtros de igualdad delante
+    __table_args__ = (
+        Index("ix_usuarios_created_at_id", "created_at", "id"),
+        Index("ix_usuarios_account_status_created_at_id", "account_status", "created_at", "id"),
+        Index("ix_usuarios_role_created_at_id", "role", "created_at", "id"),
+        # Parciales: personal activo por rol y altas pendientes de verificar
+        Index(
+            "ix_usuarios_activos_role_created_at", "role", "created_at", "id",
+            postgresql_where=text("account_status = 'active'"),
+            sqlite_where=text("account_status = 'active'")
+        ),
+        Index(
+            "ix_usuarios_pendientes_created_at", "created_at",
+            postgresql_where=text("account_status = 'pending' AND is_email_verified = false"),
+            sqlite_where=text("account_status = 'pending' AND is_email_verified = 0")
+        ),
+    )
 
     def __repr__(self):
         return f"<Usuario(email={self.email}, account_status={self.account_status})>"
 
 
+# Búsquedas de email sin distinguir mayúsculas (almacén de OTP en base)
+Index("ix_usuarios_lower_email", func.lower(Usuario.email))
+
+
 
 class OTP(Base):
     __tablename__ = "otps"
     
     id = Column(Integer, primary_key=True)
-    user_id = Column(Integer, ForeignKey("usuarios.id"))
+    user_id = Column(Integer, ForeignKey("usuarios.id"), index=True)
     code = Column(String(6), nullable=False)
     expiration = Column(DateTime, nullable=False)
     is_used = Column(Boolean, default=False, nullable=False)
 
     user = relationship("Usuario", back_populates="otps")
+
+    __table_args__ = (
+        # Limpieza de códigos caducados: solo interesan los no usados
+        Index(
+            "ix_otps_expiration_no_usados", "expiration",
+            postgresql_where=text("is_used = false"),
+            sqlite_where=text("is_used = 0")
+        ),
+    )
     
     def __init__(self, user_id: int, code: str, expiration: DateTime, is_used: bool = False):
         self.user_id = user_id
@@ -58,7 +91,79 @@ class OTP(Base):
 class FailedLoginAttempt(Base):
     __tablename__ = "failed_login_attempts"
     
-    email = Column(String, primary_key=True)
+    email = Column(String(100), primary_key=True)
     attempt_count = Column(Integer, default=1)
     last_attempt = Column(DateTime, default=func.now())
-    is_locked = Column(Boolean, default=False)
\ No newline at end of file
+    is_locked = Column(Boolean, default=False)
+
+
+
+class LoginAttemptAudit(Base):
+    __tablename__ = "login_attempt_audit"
+
+    id = Column(Integer, primary_key=True)
+    email = Column(String(100), nullable=False)
+    ip = Column(String(45), nullable=True)
+    success = Column(Boolean, nullable=False)
+    locked = Column(Boolean, default=False, nullable=False)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+
+    __table_args__ = (
+        Index("ix_login_attempt_audit_email_created_at", "email", "created_at"),
+    )
+
+
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("usuarios.id", ondelete="CASCADE"), nullable=False, index=True)
+    token_digest = Column(String(64), unique=True, nullable=False)
+    family_id = Column(String(32), nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False)
+    used_at = Column(DateTime, nullable=True)
+    revoked_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+
+    user = relationship("Usuario", back_populates="refresh_tokens")
+
+
+
+class EmailOutbox(Base):
+    __tablename__ = "email_outbox"
+
+    id = Column(Integer, primary_key=True)
+    channel = Column(Enum(EmailChannel), nullable=False)
+    recipient = Column(String(100), nullable=False)
+    subject = Column(String(255), nullable=False)
+    body = Column(Text, nullable=False)
+    status = Column(Enum(EmailStatus), default=EmailStatus.pending, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=func.now(), nullable=False)
+    locked_until = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_email_outbox_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+
+
+class UsuarioImportacion(Base):
+    __tablename__ = "usuario_importaciones"
+
+    id = Column(Integer, primary_key=True)
+    filename = Column(String(255), nullable=False)
+    status = Column(Enum(ImportStatus), default=ImportStatus.running, nullable=False)
+    total_rows = Column(Integer, default=0, nullable=False)
+    created = Column(Integer, default=0, nullable=False)
+    duplicates = Column(Integer, default=0, nullable=False)
+    invalid = Column(Integer, default=0, nullable=False)
+    error_file = Column(String(255), nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_by = Column(String(100), nullable=True)
+    created_at = Column(DateTime, default=func.now())
+    finished_at = Column(DateTime, nullable=True)
@@ -0,0 +1,115 @@
+from sqlalchemy import exc
+from bisect import bisect_left
+import threading
+import asyncio
+import logging
+import time
+import os
+
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (ms) de los buckets del histograma de espera
+BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class PoolTelemetry:
+    """Histograma de espera al pedir una conexión al pool de un motor"""
+
+    def __init__(self, nombre: str):
+        self.nombre = nombre
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(BUCKETS_MS) + 1)
+        self._checkouts = 0
+        self._timeouts = 0
+        self._espera_total = 0.0
+        self._espera_max = 0.0
+
+    def registrar_espera(self, segundos: float):
+        ms = segundos * 1000
+        with self._lock:
+            self._buckets[bisect_left(BUCKETS_MS, ms)] += 1
+            self._checkouts += 1
+            self._espera_total += ms
+            self._espera_max = max(self._espera_max, ms)
+
+    def registrar_timeout(self):
+        with self._lock:
+            self._timeouts += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            histograma = {f"<={limite}ms": n for limite, n in zip(BUCKETS_MS, self._buckets)}
+            histograma[f">{BUCKETS_MS[-1]}ms"] = self._buckets[-1]
+            datos = {
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "espera_media_ms": round(self._espera_total / self._checkouts, 2) if self._checkouts else 0.0,
+                "espera_max_ms": round(self._espera_max, 2),
+                "histograma_espera": histograma,
+            }
+        datos.update(
+            pool = pool.__class__.__name__,
+            tamano = _llamar(pool, "size"),
+            checked_out = _llamar(pool, "checkedout"),
+            checked_in = _llamar(pool, "checkedin"),
+            overflow = _llamar(pool, "overflow"),
+        )
+        return datos
+
+
+def _llamar(pool, metodo: str):
+    fn = getattr(pool, metodo, None)
+    return fn() if callable(fn) else None
+
+
+def pool_instrumentado(base, telemetria: PoolTelemetry):
+    """
+    Subclase de `base` que mide la espera de cada checkout.
+
+    `recreate()` usa `self.__class__`, así que la medición sobrevive a
+    `engine.dispose()`.
+    """
+    class PoolInstrumentado(base):
+        def connect(self):
+            inicio = time.perf_counter()
+            try:
+                return super().connect()
+            except exc.TimeoutError:
+                telemetria.registrar_timeout()
+                raise
+            finally:
+                telemetria.registrar_espera(time.perf_counter() - inicio)
+
+    PoolInstrumentado.__name__ = base.__name__
+    return PoolInstrumentado
+
+
+def resumen_pools(motores: dict) -> dict:
+    """Estado de los pools de este worker; `motores` es {nombre: (pool, telemetria)}"""
+    return {
+        "pid": os.getpid(),
+        **{nombre: telemetria.snapshot(pool) for nombre, (pool, telemetria) in motores.items()},
+    }
+
+
+def log_resumen_pools(motores: dict):
+    resumen = resumen_pools(motores)
+    for nombre, (pool, telemetria) in motores.items():
+        datos = resumen[nombre]
+        logger.info(
+            f"Pool {nombre} [pid {resumen['pid']}]: checked_out={datos['checked_out']} "
+            f"overflow={datos['overflow']} tamano={datos['tamano']} checkouts={datos['checkouts']} "
+            f"timeouts={datos['timeouts']} espera_media={datos['espera_media_ms']}ms "
+            f"espera_max={datos['espera_max_ms']}ms"
+        )
+
+
+async def log_pools_periodicamente(obtener_motores, intervalo: int):
+    """Emite una línea de log por pool cada `intervalo` segundos"""
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            log_resumen_pools(obtener_motores())
+        except Exception as e:
+            logger.error(f"No se pudo registrar el estado de los pools: {e}")
@@ -0,0 +1,155 @@
+"""
+Contador de sentencias SQL por petición.
+
+Los eventos `before/after_cursor_execute` de los motores acumulan en un
+`ContextVar` cuántas sentencias se ejecutaron, cuántas filas devolvieron o
+afectaron y cuánto tiempo pasaron en la base. El middleware abre un contador
+por petición; con `SQL_DEBUG_HEADERS` lo devuelve en cabeceras `X-SQL-*` y
+registra un aviso cuando la petición supera el presupuesto o repite una
+sentencia idéntica (mismo SQL y mismos parámetros), síntoma típico de N+1.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.entorno import cargar_entorno
+import logging
+import time
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+cargar_entorno()
+
+SQL_DEBUG_HEADERS = os.getenv("SQL_DEBUG_HEADERS", str(os.getenv("ENV") == "development")).lower() == "true"
+SQL_QUERY_BUDGET = int(os.getenv("SQL_QUERY_BUDGET", "10"))
+SQL_TIME_BUDGET_MS = float(os.getenv("SQL_TIME_BUDGET_MS", "250"))
+
+
+@dataclass
+class EstadisticasSQL:
+    sentencias: int = 0
+    filas: int = 0
+    tiempo_ms: float = 0.0
+    _huellas: Counter = field(default_factory=Counter, repr=False)
+
+    def registrar(self, sentencia: str, parametros, filas: int, segundos: float):
+        self.sentencias += 1
+        self.filas += max(filas, 0)
+        self.tiempo_ms += segundos * 1000
+        self._huellas[(sentencia, repr(parametros))] += 1
+
+    @property
+    def repetidas(self) -> list[tuple[str, int]]:
+        """Sentencias idénticas ejecutadas más de una vez, con cuántas veces"""
+        return [(sentencia, n) for (sentencia, _), n in self._huellas.items() if n > 1]
+
+
+_actual: ContextVar[Optional[EstadisticasSQL]] = ContextVar("estadisticas_sql", default=None)
+_observadores: list[Callable[[str, EstadisticasSQL], None]] = []
+
+
+def instrumentar_motor(engine = Engine):
+    """
+    Engancha el contador a un motor. Por defecto a la clase `Engine`, que
+    cubre todos los motores del proceso (también los de los tests y el
+    `sync_engine` de los asíncronos).
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if _actual.get() is not None:
+            conn.info.setdefault("_inicio_sql", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        estadisticas = _actual.get()
+        inicios = conn.info.get("_inicio_sql")
+        if estadisticas is None or not inicios:
+            return
+        segundos = time.perf_counter() - inicios.pop()
+        estadisticas.registrar(statement, parameters, cursor.rowcount, segundos)
+
+
+@contextmanager
+def contar_sentencias():
+    """Abre un contador para el contexto actual (y las tareas/hilos que herede)"""
+    estadisticas = EstadisticasSQL()
+    token = _actual.set(estadisticas)
+    try:
+        yield estadisticas
+    finally:
+        _actual.reset(token)
+
+
+class SQLCounterMiddleware:
+    """Middleware ASGI que cuenta el SQL de cada petición HTTP"""
+
+    def __init__(
+        self,
+        app,
+        cabeceras: bool = SQL_DEBUG_HEADERS,
+        presupuesto: int = SQL_QUERY_BUDGET,
+        presupuesto_ms: float = SQL_TIME_BUDGET_MS
+    ):
+        self.app = app
+        self.cabeceras = cabeceras
+        self.presupuesto = presupuesto
+        self.presupuesto_ms = presupuesto_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with contar_sentencias() as estadisticas:
+            async def enviar(mensaje):
+                if mensaje["type"] == "http.response.start" and self.cabeceras:
+                    mensaje.setdefault("headers", [])
+                    mensaje["headers"] = list(mensaje["headers"]) + [
+                        (b"x-sql-queries", str(estadisticas.sentencias).encode()),
+                        (b"x-sql-rows", str(estadisticas.filas).encode()),
+                        (b"x-sql-time-ms", f"{estadisticas.tiempo_ms:.2f}".encode()),
+                        (b"x-sql-repeated", str(len(estadisticas.repetidas)).encode()),
+                    ]
+                await send(mensaje)
+
+            try:
+                await self.app(scope, receive, enviar)
+            finally:
+                self._revisar(f"{scope['method']} {scope['path']}", estadisticas)
+
+    def _revisar(self, ruta: str, estadisticas: EstadisticasSQL):
+        if estadisticas.sentencias > self.presupuesto or estadisticas.tiempo_ms > self.presupuesto_ms:
+            logger.warning(
+                f"{ruta} superó el presupuesto SQL: {estadisticas.sentencias} sentencias, "
+                f"{estadisticas.filas} filas, {estadisticas.tiempo_ms:.1f} ms"
+            )
+        for sentencia, veces in estadisticas.repetidas:
+            logger.warning(f"{ruta} repitió {veces} veces la misma sentencia: {' '.join(sentencia.split())[:200]}")
+        for observador in list(_observadores):
+            observador(ruta, estadisticas)
+
+
+@contextmanager
+def assert_max_queries(maximo: int):
+    """
+    Para tests: falla si alguna petición atendida dentro del bloque ejecuta
+    más de `maximo` sentencias SQL. Funciona con `TestClient`, que atiende las
+    peticiones en otro hilo.
+    """
+    capturadas: list[tuple[str, EstadisticasSQL]] = []
+    observador = lambda ruta, estadisticas: capturadas.append((ruta, estadisticas))
+    _observadores.append(observador)
+    try:
+        yield capturadas
+    finally:
+        _observadores.remove(observador)
+
+    excedidas = [(ruta, e.sentencias) for ruta, e in capturadas if e.sentencias > maximo]
+    assert not excedidas, f"Peticiones por encima de {maximo} sentencias SQL: {excedidas}"
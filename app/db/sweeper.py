@@ -0,0 +1,220 @@
+"""
+Limpieza periódica de filas caducadas.
+
+Una tarea de fondo borra cada `SWEEPER_INTERVAL` segundos los OTP caducados
+o usados, los intentos de login antiguos, la auditoría de login fuera de
+retención, los correos del outbox ya enviados o descartados y los usuarios
+`pending` que no activaron la cuenta. Cada tabla se borra en lotes de `SWEEPER_BATCH_SIZE` filas, cada uno en su propia
+transacción corta, con una pausa entre lotes para no acaparar la base. En
+PostgreSQL un advisory lock garantiza que solo un worker limpia a la vez.
+"""
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+from sqlalchemy import Engine, and_, delete, select, text
+from sqlalchemy.sql.elements import ColumnElement
+from app.entorno import cargar_entorno
+from app.db.database import engine as engine_por_defecto
+from app.db.models.models import OTP, EmailOutbox, FailedLoginAttempt, LoginAttemptAudit, RefreshToken, Usuario
+from app.enums import AccountStatus, EmailStatus
+from app.security.lockout import LOGIN_ATTEMPT_WINDOW
+import asyncio
+import logging
+import time
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+cargar_entorno()
+
+SWEEPER_ENABLED = os.getenv("SWEEPER_ENABLED", "true").lower() == "true"
+SWEEPER_INTERVAL = float(os.getenv("SWEEPER_INTERVAL", "3600"))
+SWEEPER_INITIAL_DELAY = float(os.getenv("SWEEPER_INITIAL_DELAY", "60"))
+SWEEPER_BATCH_SIZE = int(os.getenv("SWEEPER_BATCH_SIZE", "1000"))
+SWEEPER_PAUSE = float(os.getenv("SWEEPER_PAUSE", "0.2"))
+# Clave del pg_try_advisory_lock compartida por todos los workers
+SWEEPER_LOCK_KEY = int(os.getenv("SWEEPER_LOCK_KEY", "7241001"))
+LOGIN_AUDIT_RETENTION_DAYS = int(os.getenv("LOGIN_AUDIT_RETENTION_DAYS", "90"))
+# Días que se conservan en el outbox los correos enviados o descartados
+EMAIL_OUTBOX_RETENTION_DAYS = int(os.getenv("EMAIL_OUTBOX_RETENTION_DAYS", "7"))
+# Días que se conserva un alta sin activar después de caducar su enlace
+PENDING_USER_GRACE_DAYS = int(os.getenv("PENDING_USER_GRACE_DAYS", "14"))
+
+
+@dataclass
+class Limpieza:
+    nombre: str
+    modelo: type
+    condicion: Callable[[datetime], ColumnElement]
+    # Columnas que apuntan a las filas borradas y se borran antes que ellas
+    dependientes: list = field(default_factory=list)
+
+
+def _usuarios_pendientes(ahora: datetime) -> ColumnElement:
+    limite = ahora - timedelta(days=PENDING_USER_GRACE_DAYS)
+    return and_(
+        Usuario.account_status == AccountStatus.pending,
+        Usuario.is_email_verified == False,
+        # created_at acota con el índice parcial; la expiración es el criterio real
+        Usuario.created_at < limite,
+        Usuario.email_verification_expiration < limite
+    )
+
+
+LIMPIEZAS = [
+    Limpieza("otps_caducados", OTP, lambda ahora: and_(OTP.is_used == False, OTP.expiration < ahora)),
+    Limpieza("otps_usados", OTP, lambda ahora: OTP.is_used == True),
+    Limpieza(
+        "intentos_login",
+        FailedLoginAttempt,
+        lambda ahora: FailedLoginAttempt.last_attempt < ahora - timedelta(seconds=LOGIN_ATTEMPT_WINDOW)
+    ),
+    Limpieza(
+        "auditoria_login",
+        LoginAttemptAudit,
+        lambda ahora: LoginAttemptAudit.created_at < ahora - timedelta(days=LOGIN_AUDIT_RETENTION_DAYS)
+    ),
+    Limpieza(
+        "outbox_terminados",
+        EmailOutbox,
+        lambda ahora: and_(
+            EmailOutbox.status.in_((EmailStatus.sent, EmailStatus.dead)),
+            EmailOutbox.created_at < ahora - timedelta(days=EMAIL_OUTBOX_RETENTION_DAYS)
+        )
+    ),
+    Limpieza("usuarios_pendientes", Usuario, _usuarios_pendientes, dependientes=[OTP.user_id, RefreshToken.user_id]),
+]
+
+
+class ExpirySweeper:
+    def __init__(
+        self,
+        engine: Engine = engine_por_defecto,
+        limpiezas: list[Limpieza] = LIMPIEZAS,
+        intervalo: float = SWEEPER_INTERVAL,
+        tamano_lote: int = SWEEPER_BATCH_SIZE,
+        pausa: float = SWEEPER_PAUSE,
+        retraso_inicial: float = SWEEPER_INITIAL_DELAY
+    ):
+        self.engine = engine
+        self.limpiezas = limpiezas
+        self.intervalo = intervalo
+        self.tamano_lote = tamano_lote
+        self.pausa = pausa
+        self.retraso_inicial = retraso_inicial
+        self._tarea: Optional[asyncio.Task] = None
+        self._ultima: Optional[dict] = None
+        self._totales = {limpieza.nombre: 0 for limpieza in limpiezas}
+        self._ejecuciones = 0
+        self._omitidas = 0
+
+    async def start(self):
+        if self._tarea is None:
+            self._tarea = asyncio.create_task(self._bucle())
+
+    async def stop(self):
+        tarea, self._tarea = self._tarea, None
+        if tarea is not None:
+            tarea.cancel()
+            await asyncio.gather(tarea, return_exceptions=True)
+
+    async def _bucle(self):
+        await asyncio.sleep(self.retraso_inicial)
+        while True:
+            try:
+                await self.ejecutar()
+            except Exception as e:
+                logger.error(f"Error en la limpieza periódica: {e}", exc_info=True)
+            await asyncio.sleep(self.intervalo)
+
+    async def ejecutar(self) -> Optional[dict]:
+        """
+        Una pasada completa. Devuelve las filas borradas por limpieza y la
+        duración, o None si otro worker tiene el lock.
+        """
+        conexion, adquirido = await asyncio.to_thread(self._bloquear)
+        if not adquirido:
+            self._omitidas += 1
+            logger.info("Limpieza omitida: otro worker tiene el lock")
+            return None
+
+        inicio = time.perf_counter()
+        ahora = datetime.now()
+        borradas = {}
+        try:
+            for limpieza in self.limpiezas:
+                borradas[limpieza.nombre] = 0
+                while True:
+                    n = await asyncio.to_thread(self._borrar_lote, limpieza, ahora)
+                    borradas[limpieza.nombre] += n
+                    if n < self.tamano_lote:
+                        break
+                    await asyncio.sleep(self.pausa)
+        finally:
+            if conexion is not None:
+                await asyncio.to_thread(self._liberar, conexion)
+
+        duracion = time.perf_counter() - inicio
+        for nombre, n in borradas.items():
+            self._totales[nombre] += n
+        self._ejecuciones += 1
+        self._ultima = {"inicio": ahora, "duracion_s": round(duracion, 3), "borradas": borradas}
+        logger.info(
+            f"Limpieza completada en {duracion:.2f} s: "
+            + ", ".join(f"{nombre}={n}" for nombre, n in borradas.items())
+        )
+        return self._ultima
+
+    def _bloquear(self):
+        """Conexión que retiene el advisory lock (None fuera de PostgreSQL) y si se obtuvo"""
+        if self.engine.dialect.name != "postgresql":
+            return None, True
+        conexion = self.engine.connect()
+        try:
+            adquirido = conexion.execute(text("SELECT pg_try_advisory_lock(:clave)"), {"clave": SWEEPER_LOCK_KEY}).scalar()
+            conexion.commit()
+        except Exception:
+            conexion.close()
+            raise
+        if not adquirido:
+            conexion.close()
+            return None, False
+        return conexion, True
+
+    def _liberar(self, conexion):
+        # El lock es de sesión: hay que soltarlo antes de devolver la conexión al pool
+        try:
+            conexion.execute(text("SELECT pg_advisory_unlock(:clave)"), {"clave": SWEEPER_LOCK_KEY})
+            conexion.commit()
+        finally:
+            conexion.close()
+
+    def _borrar_lote(self, limpieza: Limpieza, ahora: datetime) -> int:
+        clave = limpieza.modelo.__mapper__.primary_key[0]
+        with self.engine.begin() as conn:
+            ids = conn.scalars(
+                select(clave)
+                .where(limpieza.condicion(ahora))
+                .limit(self.tamano_lote)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not ids:
+                return 0
+            for columna in limpieza.dependientes:
+                conn.execute(delete(columna.table).where(columna.in_(ids)))
+            conn.execute(delete(limpieza.modelo.__table__).where(clave.in_(ids)))
+            return len(ids)
+
+    def metricas(self) -> dict:
+        return {
+            "activo": self._tarea is not None,
+            "ejecuciones": self._ejecuciones,
+            "omitidas": self._omitidas,
+            "ultima": self._ultima,
+            "borradas_total": dict(self._totales),
+        }
+
+
+sweeper = ExpirySweeper()
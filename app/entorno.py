@@ -0,0 +1,14 @@
+"""
+Carga única del `.env`.
+
+Cada módulo que lee configuración con `os.getenv` al importarse llama antes a
+`cargar_entorno()`; solo la primera llamada busca y lee el archivo, las demás
+no hacen nada.
+"""
+from functools import lru_cache
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=None)
+def cargar_entorno() -> bool:
+    return load_dotenv()
@@ -11,4 +11,21 @@ class Role(enum.Enum):
     ADMIN = "ADMIN"
     CLIENT = "CLIENTE"
     STOCK_MANAGER = "GESTOR_STOCK"
-    SALES_MANAGER = "GESTOR_VENTAS"
\ No newline at end of file
+    SALES_MANAGER = "GESTOR_VENTAS"
+
+class EmailStatus(enum.Enum):
+    pending = "pending"
+    sending = "sending"
+    sent = "sent"
+    dead = "dead"
+
+
+class EmailChannel(enum.Enum):
+    brevo = "brevo"
+    smtp = "smtp"
+
+
+class ImportStatus(enum.Enum):
+    running = "running"
+    finished = "finished"
+    failed = "failed"
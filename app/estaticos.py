@@ -0,0 +1,236 @@
+"""
+Archivos estáticos con huella de contenido y precomprimidos.
+
+El paso de build copia `STATIC_DIR` a `STATIC_BUILD_DIR` añadiendo a cada
+archivo una copia con el hash de su contenido en el nombre
+(`css/styles.3f2a1b9c0d4e.css`), sus variantes `.gz` y `.br` (esta solo si
+está instalado `brotli`) cuando comprimen, y un `manifest.json` que traduce
+la ruta lógica a la versionada:
+
+    python -m app.estaticos
+
+Las plantillas piden las URLs con `static_url('css/styles.css')`. Si hay
+manifiesto la aplicación sirve el directorio de build: los nombres
+versionados van con `Cache-Control: immutable` porque un cambio de contenido
+cambia la URL, el resto se revalida con su ETag, y la variante comprimida se
+elige según `Accept-Encoding`. Sin build se sirve `STATIC_DIR` tal cual.
+"""
+from typing import Optional
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+from starlette.staticfiles import NotModifiedResponse
+from starlette.datastructures import Headers
+from starlette.types import Scope
+from app.entorno import cargar_entorno
+import mimetypes
+import argparse
+import hashlib
+import gzip
+import json
+import os
+import anyio
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+cargar_entorno()
+
+STATIC_URL = "/static/"
+STATIC_DIR = os.getenv("STATIC_DIR", "frontend/static")
+STATIC_BUILD_DIR = os.getenv("STATIC_BUILD_DIR", "frontend/static_build")
+# Caché de los archivos sin huella: se revalidan con el ETag en cada uso
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "0"))
+FAVICON_MAX_AGE = int(os.getenv("FAVICON_MAX_AGE", "604800"))
+MANIFEST_NAME = "manifest.json"
+
+CABECERA_INMUTABLE = "public, max-age=31536000, immutable"
+COMPRIMIBLES = {".css", ".js", ".mjs", ".map", ".svg", ".json", ".txt", ".xml", ".html", ".ico"}
+# Orden de preferencia y sufijo de cada variante precomprimida
+VARIANTES = (("br", ".br"), ("gzip", ".gz"))
+
+
+def huella(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()[:12]
+
+
+def nombre_versionado(ruta: str, digest: str) -> str:
+    base, extension = os.path.splitext(ruta)
+    return f"{base}.{digest}{extension}"
+
+
+def _comprimir(contenido: bytes) -> dict[str, bytes]:
+    variantes = {".gz": gzip.compress(contenido, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variantes[".br"] = brotli.compress(contenido, quality=11)
+    # Una variante que no ahorra bytes solo añade trabajo al servidor
+    return {sufijo: datos for sufijo, datos in variantes.items() if len(datos) < len(contenido)}
+
+
+def _escribir(ruta: str, contenido: bytes):
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, "wb") as archivo:
+        archivo.write(contenido)
+
+
+def construir(origen: str = STATIC_DIR, destino: str = STATIC_BUILD_DIR) -> dict[str, str]:
+    """
+    Genera el directorio de build y devuelve el manifiesto. Las versiones
+    anteriores no se borran, así las páginas ya servidas con URLs viejas
+    siguen funcionando durante un despliegue.
+    """
+    if os.path.abspath(origen) == os.path.abspath(destino):
+        raise ValueError("El directorio de build no puede ser el de origen")
+
+    manifiesto = {}
+    for raiz, _, archivos in os.walk(origen):
+        for nombre in sorted(archivos):
+            completa = os.path.join(raiz, nombre)
+            ruta = os.path.relpath(completa, origen).replace(os.sep, "/")
+            with open(completa, "rb") as archivo:
+                contenido = archivo.read()
+
+            versionada = nombre_versionado(ruta, huella(contenido))
+            manifiesto[ruta] = versionada
+            variantes = _comprimir(contenido) if os.path.splitext(ruta)[1].lower() in COMPRIMIBLES else {}
+            for salida in (ruta, versionada):
+                _escribir(os.path.join(destino, salida), contenido)
+                for sufijo, datos in variantes.items():
+                    _escribir(os.path.join(destino, salida + sufijo), datos)
+
+    _escribir(
+        os.path.join(destino, MANIFEST_NAME),
+        json.dumps(dict(sorted(manifiesto.items())), indent=2).encode("utf-8")
+    )
+    return manifiesto
+
+
+def cargar_manifiesto(directorio: str = STATIC_BUILD_DIR) -> dict[str, str]:
+    ruta = os.path.join(directorio, MANIFEST_NAME)
+    if not os.path.exists(ruta):
+        return {}
+    with open(ruta, encoding="utf-8") as archivo:
+        return json.load(archivo)
+
+
+manifiesto = cargar_manifiesto()
+STATIC_ROOT = STATIC_BUILD_DIR if manifiesto else STATIC_DIR
+
+
+def static_url(ruta: str) -> str:
+    """URL pública de un estático; la versionada si el build la conoce"""
+    return STATIC_URL + manifiesto.get(ruta, ruta)
+
+
+def _codificaciones_aceptadas(valor: str) -> set[str]:
+    aceptadas = set()
+    for parte in valor.split(","):
+        nombre, _, parametros = parte.strip().partition(";")
+        calidad = parametros.strip()
+        if calidad.startswith("q="):
+            try:
+                if float(calidad[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if nombre:
+            aceptadas.add(nombre.strip().lower())
+    return aceptadas
+
+
+class StaticFilesCacheados(StaticFiles):
+    def __init__(self, *args, manifiesto: Optional[dict[str, str]] = None, max_age: int = STATIC_MAX_AGE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.versionados = set((manifiesto or {}).values())
+        self.max_age = max_age
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        comprimible = os.path.splitext(path)[1].lower() in COMPRIMIBLES
+        response = None
+        if comprimible and scope["method"] in ("GET", "HEAD"):
+            response = await self._variante_comprimida(path, scope)
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if path.replace(os.sep, "/") in self.versionados:
+            response.headers["Cache-Control"] = CABECERA_INMUTABLE
+        else:
+            response.headers["Cache-Control"] = f"public, max-age={self.max_age}, must-revalidate"
+        if comprimible:
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+    async def _variante_comprimida(self, path: str, scope: Scope) -> Optional[Response]:
+        aceptadas = _codificaciones_aceptadas(Headers(scope=scope).get("accept-encoding", ""))
+        for codificacion, sufijo in VARIANTES:
+            if codificacion not in aceptadas:
+                continue
+            full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + sufijo)
+            if stat_result is None:
+                continue
+            # Cada variante tiene su propio ETag (tamaño distinto), así que un
+            # 304 nunca mezcla el cuerpo de una codificación con otra
+            response = FileResponse(
+                full_path,
+                stat_result=stat_result,
+                media_type=mimetypes.guess_type(path)[0] or "application/octet-stream",
+                headers={"Content-Encoding": codificacion}
+            )
+            if self.is_not_modified(response.headers, Headers(scope=scope)):
+                return NotModifiedResponse(response.headers)
+            return response
+        return None
+
+
+class ArchivoEnMemoria:
+    """
+    Un archivo pequeño y muy pedido (el favicon) servido desde memoria, con
+    ETag del contenido y su versión gzip calculada una sola vez.
+    """
+
+    def __init__(self, ruta: str, max_age: int = FAVICON_MAX_AGE):
+        self.ruta = ruta
+        self.max_age = max_age
+        self._cargado = None
+
+    def _cargar(self):
+        if self._cargado is None:
+            with open(self.ruta, "rb") as archivo:
+                contenido = archivo.read()
+            self._cargado = (
+                contenido,
+                _comprimir(contenido).get(".gz"),
+                f'"{huella(contenido)}"',
+                mimetypes.guess_type(self.ruta)[0] or "application/octet-stream"
+            )
+        return self._cargado
+
+    def responder(self, request: Request) -> Response:
+        contenido, comprimido, etag, media_type = self._cargar()
+        headers = {"Cache-Control": f"public, max-age={self.max_age}", "ETag": etag, "Vary": "Accept-Encoding"}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        if comprimido is not None and "gzip" in _codificaciones_aceptadas(request.headers.get("accept-encoding", "")):
+            return Response(comprimido, media_type=media_type, headers={**headers, "Content-Encoding": "gzip"})
+        return Response(contenido, media_type=media_type, headers=headers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--origen", default=STATIC_DIR)
+    parser.add_argument("--destino", default=STATIC_BUILD_DIR)
+    args = parser.parse_args(argv)
+
+    generado = construir(args.origen, args.destino)
+    for ruta, versionada in generado.items():
+        print(f"{ruta} -> {versionada}")
+    if brotli is None:
+        print("brotli no está instalado: solo se generan variantes .gz")
+    print(f"\n{len(generado)} archivos en {args.destino}")
+
+
+if __name__ == "__main__":
+    main()
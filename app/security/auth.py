@@ -1,26 +1,35 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Request, Form
 from fastapi.responses import JSONResponse, Response, HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from pydantic import EmailStr, ValidationError
 from datetime import datetime, timedelta
+from typing import Optional
 from sqlalchemy.orm import Session
-from app.db.database import get_db
-from app.db.models.models import Usuario, FailedLoginAttempt
-from app.security.hashing import verify_password, hash_password
-from app.security.schemas import UsuarioCreate, UsuarioOut
+from app.db.database import en_sesion, get_db, get_db_para, resolver
+from app.db.models.models import Usuario
+from app.security.hashing import verify_password_async, hash_password_async
+from app.security.exceptions import HashingSaturatedError
+from app.security.schemas import UsuarioCreate, UsuarioOut, RefreshTokenRequest
 from app.security.dependencies import OAuth2EmailRequestForm
-from app.security.jwt import create_access_token, verify_access_token
-from app.services.email_service_activation import enviar_email_activacion
-from app.services.hash_activacion_email import crear_token, verificar_token
-from app.services.otp_service import OTPService
-from app.services.email_otp import enviar_email_otp
+from app.security.jwt import create_access_token, verify_access_token, obtener_jwks
+from app.security.keyring import JWKS_MAX_AGE
+from app.security.limiter import limiter
+from app.security.lockout import lockout_tracker
+from app.services.email_outbox import encolar_email, outbox_dispatcher
+from app.services.hash_activacion_email import crear_token, buscar_usuario_por_token_activacion
+from app.services.otp_store import otp_store
+from app.services.usuario_service import buscar_usuario_por_email
+from app.services.refresh_token_service import emitir_refresh_token, revocar_tokens_usuario, rotar_refresh_token
+from app.services.email_otp import contenido_email_otp
+from app.services.email_service_activation import contenido_email_activacion
 from app.services.schemas import OTPRequest
-from app.enums import AccountStatus, Role
-from slowapi import Limiter
+from app.templating import obtener_templates, pagina_estatica
+from app.enums import AccountStatus, Role, EmailChannel
 from slowapi.util import get_remote_address
-from dotenv import load_dotenv
+from app.entorno import cargar_entorno
 import logging
+import math
 import os
+import anyio
 
 
 logging.basicConfig(level=logging.INFO)
@@ -29,7 +38,6 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-templates = Jinja2Templates(directory="frontend/templates")
 
 
 def get_limiter(request: Request):
@@ -38,21 +46,30 @@ def get_limiter(request: Request):
     raise RuntimeError("Limiter no ha sido inicializado correctamente")
 
 
-limiter = Limiter(key_func=get_remote_address)
-
-load_dotenv()
+cargar_entorno()
 
 PORT = os.getenv("PORT")
 FRONTEND_URL = os.getenv("FRONTEND_URL").rstrip("/")
 
+@router.get("/.well-known/jwks.json")
+def jwks(request: Request):
+    """Claves públicas para que otros servicios del ERP verifiquen tokens localmente"""
+    cuerpo, etag = obtener_jwks()
+    headers = {"Cache-Control": f"public, max-age={JWKS_MAX_AGE}", "ETag": etag}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=cuerpo, media_type="application/json", headers=headers)
+
+
+
 @router.get("/registro/", response_class=HTMLResponse)
 def show_register_page(request: Request):
-    return templates.TemplateResponse("/auth/registro.html", {"request": request})
+    return pagina_estatica("auth/registro.html")
 
 
 
 @router.post("/registro/")
-async def register(request: Request, db: Session = Depends(get_db)):
+async def register(request: Request, db: Session = Depends(get_db_para("register"))):
     # Obtener datos del formulario
     form_data = await request.form()
     form_dict = dict(form_data)
@@ -90,7 +107,7 @@ async def register(request: Request, db: Session = Depends(get_db)):
 
     # Continuar con el proceso de registro
     logger.info(f"Intento de registro para el usuario: {user.email}")
-    db_user = db.query(Usuario).filter(Usuario.email == user.email).first()
+    db_user = await buscar_usuario_por_email(db, user.email)
     if db_user:
         logger.warning(f"Registro fallido: el usuario {user.email} ya existe")
         raise HTTPException(
@@ -98,8 +115,8 @@ async def register(request: Request, db: Session = Depends(get_db)):
             detail = "El usuario ya existe"
         )
     
-    hashed_password = hash_password(user.password)
-    token, hash_token, expiracion = crear_token(user.email)    
+    hashed_password = await hash_password_async(user.password)
+    token, hash_token, expiracion = crear_token()    
 
     new_user = Usuario( 
         email = user.email, 
@@ -117,34 +134,19 @@ async def register(request: Request, db: Session = Depends(get_db)):
         is_email_verified = False
     )
 
-    try:
-        nombre = user.first_name
-        asunto = f"{nombre}, activa tu cuenta en CodePyHub"
-        cuerpo = f"""
-        <h1>¡Bienvenido {nombre}!</h1>
-        <p>Haz clic en el siguiente enlace para activar tu cuenta:</p>
-        <a href="{FRONTEND_URL}/activar/?email={user.email}&token={token}">Activar cuenta</a>
-        """
-
-        enviar_email_activacion(email = user.email, asunto = asunto, cuerpo = cuerpo)
-
-    except Exception as e:
-        logger.error(f"No se pudo enviar el email a {user.email}: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="No se pudo enviar el email de verificación. Intente nuevamente."
-        )
-    
+    asunto, cuerpo = contenido_email_activacion(user.first_name, token)
     
     try:
         db.add(new_user)
-        db.commit()
-        db.refresh(new_user)
+        encolar_email(db, EmailChannel.brevo, user.email, asunto, cuerpo)
+        await resolver(db.commit())
+        await resolver(db.refresh(new_user))
+        outbox_dispatcher.despertar()
         logger.info(f"Usuario {new_user.email} registrado exitosamente.")
         return RedirectResponse(url="/", status_code=303)
 
     except Exception as e:
-        db.rollback()
+        await resolver(db.rollback())
         logger.error(f"Error al guardar el usuario {user.email} en la base: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -154,128 +156,102 @@ async def register(request: Request, db: Session = Depends(get_db)):
 
 
 @router.get("/activar/", response_class=HTMLResponse)
-def mostrar_form_activacion(request: Request, email: str, token: str):
-    logger.info(f"Generando formulario de activación para el email: {email}")    
-    response = templates.TemplateResponse("/auth/activar.html", {"request": request})
+def mostrar_form_activacion(request: Request, token: str):
+    logger.info("Generando formulario de activación")    
+    response = obtener_templates().TemplateResponse("auth/activar.html", {"request": request})
     response.set_cookie(
         key="activation_data",
-        value=f"{email}:{token}",
+        value=token,
         secure=False,
         samesite="Lax",
         max_age=600 
     )
     
-    logger.info(f"Cookie de activación establecida para el email: {email}")
+    logger.info("Cookie de activación establecida")
     return response
 
 
 
 
-@router.post("/activate/")
-def activate_email(request: Request, response: Response, db: Session = Depends(get_db)):
-    activation_data = request.cookies.get("activation_data")
-    
-    if not activation_data:
-        return RedirectResponse(url="/registro", status_code=303)
-    
+def _activar_cuenta(db: Session, token: str) -> Optional[str]:
+    """Activa la cuenta pendiente dueña del token; devuelve su email o None"""
     try:
-        email, token = activation_data.split(":", 1)
+        usuario = buscar_usuario_por_token_activacion(db, token)
     except ValueError:
-        return RedirectResponse(url="/registro", status_code=303)
-    
-    if not email or not token:
-        return RedirectResponse(url="/registro", status_code=303)
+        return None
+
+    if usuario.account_status != AccountStatus.pending:
+        return None
+    usuario.is_email_verified = True
+    usuario.email_verification_token = None
+    usuario.email_verification_expiration = None 
+    usuario.account_status = AccountStatus.active  
+    db.commit()
+    return usuario.email
+
+
+@router.post("/activate/")
+async def activate_email(request: Request, db: Session = Depends(get_db_para("activate_email"))):
+    token = request.cookies.get("activation_data")
     
-    usuario = db.query(Usuario).filter(Usuario.email == email).first()
-    if not usuario:
+    if not token:
         return RedirectResponse(url="/registro", status_code=303)
 
-    try:
-        verificar_token(token, usuario)
-    except ValueError:
+    # Con la sesión sync la consulta va a un hilo: el bucle no se bloquea
+    email = await en_sesion(db, _activar_cuenta, token)
+    if email is None:
         return RedirectResponse(url="/registro", status_code=303)
-    
-    if usuario.account_status == AccountStatus.pending:
-        usuario.is_email_verified = True
-        usuario.email_verification_token = None
-        usuario.email_verification_expiration = None 
-        usuario.account_status = AccountStatus.active  
-        db.commit()
-        db.refresh(usuario)
 
-        response.delete_cookie("activation_data")
-        return RedirectResponse(url="/login", status_code=303)
-            
-    return RedirectResponse(url="/registro", status_code=303)
+    logger.info(f"Cuenta activada para el usuario {email}")
+    response = RedirectResponse(url="/login", status_code=303)
+    response.delete_cookie("activation_data")
+    return response
 
     
 
 @router.get("/login", response_class=HTMLResponse)
 def mostrar_login(request: Request, cuenta_activada: bool = False):
-    return templates.TemplateResponse("/auth/login.html", {
-        "request": request,
-        "cuenta_activada": cuenta_activada
-    }) 
+    return pagina_estatica("auth/login.html", cuenta_activada=cuenta_activada)
 
 
 
 @router.post("/login/")
-async def login(form_data: OAuth2EmailRequestForm = Depends(), db: Session = Depends(get_db)):    
+async def login(
+    request: Request,
+    form_data: OAuth2EmailRequestForm = Depends(), 
+    db: Session = Depends(get_db_para("login"))
+    ):    
     logger.info(f"Intento de login para el usuario: {form_data.email}")
-    user = db.query(Usuario).filter(Usuario.email == form_data.username).first()
+    ip = get_remote_address(request)
+    restante = await lockout_tracker.bloqueado(form_data.email, ip)
+    if restante:
+        logger.warning(f"Cuenta {form_data.email} bloqueada temporalmente para {ip}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Demasiados intentos fallidos. Espere 15 minutos.",
+            headers={"Retry-After": str(math.ceil(restante))}
+        )
+
+    user = await buscar_usuario_por_email(db, form_data.username)
     generic_error = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciales incorrectas",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    if not user:
-        logger.warning(f"Intento de login con usuario inexistente: {form_data.email}")
-        raise generic_error
-
-    failed_attempt = db.query(FailedLoginAttempt).filter(
-        FailedLoginAttempt.email == form_data.email
-    ).first()
     
-    if failed_attempt and failed_attempt.is_locked:
-        tiempo_bloqueo = datetime.now() - failed_attempt.last_attempt
-        if tiempo_bloqueo < timedelta(minutes=15):
-            logger.warning(f"Cuenta {form_data.email} bloqueada temporalmente")
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Demasiados intentos fallidos. Espere 15 minutos."
-            )
-        else:
-            # Eliminar registro si ya pasó el bloqueo
-            db.delete(failed_attempt)
-            db.commit()   
-    
-    if not user or not verify_password(form_data.password, user.password_hash):
-        logger.warning(f"Inicio de sesión fallido para {form_data.email}")
-        if failed_attempt:
-            failed_attempt.attempt_count += 1
-            failed_attempt.last_attempt = datetime.now()
-            if failed_attempt.attempt_count >= 5:
-                failed_attempt.is_locked = True
+    if not user or not await verify_password_async(form_data.password, user.password_hash):
+        if not user:
+            logger.warning(f"Intento de login con usuario inexistente: {form_data.email}")
         else:
-            failed_attempt = FailedLoginAttempt(
-                email=form_data.email,
-                attempt_count=1,
-                last_attempt=datetime.now()
-            )
-            db.add(failed_attempt)
-        
-        db.commit()
-        
-        # Verificar si se superó el límite
-        if failed_attempt.attempt_count >= 5:
-            logger.warning(f"Bloqueando cuenta: {form_data.email}")
+            logger.warning(f"Inicio de sesión fallido para {form_data.email}")
+
+        if await lockout_tracker.registrar_fallo(form_data.email, ip):
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Demasiados intentos fallidos. Cuenta bloqueada por 15 minutos."
+                detail="Demasiados intentos fallidos. Cuenta bloqueada por 15 minutos.",
+                headers={"Retry-After": str(lockout_tracker.bloqueo)}
             )
-        
-        else:
-            raise generic_error
+        raise generic_error
     
     if user.account_status is None or user.account_status != AccountStatus.active:
         current_status = user.account_status.name if user.account_status else "None"
@@ -286,38 +262,24 @@ async def login(form_data: OAuth2EmailRequestForm = Depends(), db: Session = Dep
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    failed_attempt = db.query(FailedLoginAttempt).filter(
-            FailedLoginAttempt.email == form_data.username
-        ).first()
-        
-    if failed_attempt:
-        db.delete(failed_attempt)
-        db.commit() 
+    await lockout_tracker.registrar_exito(form_data.email, ip)
 
     if user.two_factor_enabled or user.role == Role.ADMIN:    
-        otp_service = OTPService(db) 
-        otp_code, expiration, user_id = otp_service.create_otp_code(user.email)
         try:
-            await enviar_email_otp(user.email, otp_code)
-        except RuntimeError as e:
-            logger.error(f"Error al enviar OTP a {user.email}: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                detail="No se pudo enviar el código OTP. Intente nuevamente más tarde."
-            )
-
-        try:
-            otp_service.save_otp(user_id, otp_code, expiration)
+            otp_code = await otp_store.emitir(user.email)
         except Exception as e:
-            logger.error(f"No se pudo guardar el OTP en la base: {str(e)}")
+            logger.error(f"No se pudo guardar el OTP: {str(e)}")
             raise HTTPException(
         status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
         detail="Error interno guardando el código OTP"
         )
 
+        asunto, cuerpo = contenido_email_otp(otp_code)
+        encolar_email(db, EmailChannel.smtp, user.email, asunto, cuerpo)
         user.last_login = datetime.now()
-        db.commit()
-        db.refresh(user)  
+        await resolver(db.commit())
+        await resolver(db.refresh(user))  
+        outbox_dispatcher.despertar()
 
         logger.info(f"OTP enviado para el usuario {form_data.email}")    
         return {"detail": "OTP enviado a tu correo. Ingresa el código para completar el login."}
@@ -327,10 +289,11 @@ async def login(form_data: OAuth2EmailRequestForm = Depends(), db: Session = Dep
         otp_verified = True, 
         role = Role(user.role) 
     )
+    refresh_token = await emitir_refresh_token(db, user.id)
     logger.info(f"Login exitoso para el usuario {user.email}.") 
     logger.info(f" Para su seguridad, recuerde activar su doble factor de autenticacion")     
     return JSONResponse(
-    content={"access_token": access_token, "token_type": "bearer"},
+    content={"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"},
     status_code=200
     )
     
@@ -341,11 +304,10 @@ async def login(form_data: OAuth2EmailRequestForm = Depends(), db: Session = Dep
 async def verify_otp(
     request: Request,
     otp_data: OTPRequest, 
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db_para("verify_otp"))
     ):
     logger.info(f"Verificando OTP para el usuario: {otp_data.email}")
-    otp_service = OTPService(db)
-    is_valid = otp_service.verify_otp(otp_data.email, otp_data.otp_code)
+    is_valid = await otp_store.consumir(otp_data.email, otp_data.otp_code)
     
     if not is_valid:
         logger.warning(f"OTP incorrecto o expirado para el usuario {otp_data.email}")
@@ -354,7 +316,7 @@ async def verify_otp(
             detail="OTP incorrecto o expirado.",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = db.query(Usuario).filter(Usuario.email == otp_data.email).first()
+    user = await buscar_usuario_por_email(db, otp_data.email)
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
@@ -363,14 +325,32 @@ async def verify_otp(
     otp_verified = True,
     role = Role(user.role)
     )    
+    refresh_token = await emitir_refresh_token(db, user.id)
     logger.info(f"Login exitoso para el usuario {otp_data.email}.")    
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
+
+
+
+@router.post("/token/refresh")
+async def refresh_access_token(
+    datos: RefreshTokenRequest,
+    db: Session = Depends(get_db_para("refresh_access_token"))
+    ):
+    """Renueva la sesión con un refresh token sin pasar otra vez por el login"""
+    user, refresh_token = await rotar_refresh_token(db, datos.refresh_token)
+    access_token = create_access_token(
+        email = user.email,
+        otp_verified = True,
+        role = Role(user.role)
+    )
+    logger.info(f"Sesión renovada para el usuario {user.email}.")
+    return {"access_token": access_token, "refresh_token": refresh_token, "token_type": "bearer"}
 
 
 
 @router.get("/recuperar_acceso/", response_class=HTMLResponse)
 async def recuperar_acceso_get(request: Request):
-    return templates.TemplateResponse("auth/recuperar_acceso.html", {"request": request})
+    return obtener_templates().TemplateResponse("auth/recuperar_acceso.html", {"request": request})
 
 
 
@@ -401,17 +381,11 @@ async def recuperar_acceso(email: EmailStr = Form(...), db: Session = Depends(ge
     </a>
     """
 
-    try:
-        enviar_email_activacion(user.email, asunto, cuerpo)
-        logger.info(f"Email de recuperación enviado a: {user.email}")
-        return RedirectResponse(url="/", status_code=303)
-
-    except Exception as e:
-        logger.error(f"No se pudo enviar el email a {user.email}: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="No se pudo enviar el correo. Intenta más tarde."
-        )
+    encolar_email(db, EmailChannel.brevo, user.email, asunto, cuerpo)
+    db.commit()
+    outbox_dispatcher.despertar()
+    logger.info(f"Email de recuperación encolado para: {user.email}")
+    return RedirectResponse(url="/", status_code=303)
 
 
 
@@ -425,7 +399,7 @@ def mostrar_formulario_cambio(token: str, request: Request):
             logger.warning("Token inválido")
             raise HTTPException(status_code=403, detail="Token inválido")
         logger.info("Token válido, mostrando formulario")
-        return templates.TemplateResponse("auth/reset_password_form.html", {
+        return obtener_templates().TemplateResponse("auth/reset_password_form.html", {
             "request": request,
             "token": token
         })
@@ -472,12 +446,17 @@ def cambiar_password(
                 detail="Usuario no encontrado"
                 )
 
-        user.password_hash = hash_password(new_password)
+        # La ruta corre en el threadpool; el hash se delega al pool del bucle
+        user.password_hash = anyio.from_thread.run(hash_password_async, new_password)
+        # Las sesiones abiertas con la contraseña anterior dejan de renovarse
+        revocar_tokens_usuario(db, user.id)
         db.commit()
 
         logger.info(f"Contraseña actualizada para: {user.email}")
         return RedirectResponse(url="/login", status_code=303)
     
+    except HashingSaturatedError:
+        raise
         
     except Exception as e:
         logger.error(f"Token inválido o expirado: {str(e)}")
@@ -1,7 +1,7 @@
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi import Form, Depends, HTTPException, status, Request
 from typing import Optional
-from app.db.models.models import Usuario
+from app.security.principal_cache import Principal
 from app.security.jwt import get_current_user
 from app.enums import Role
 import logging
@@ -38,7 +38,7 @@ class OAuth2EmailRequestForm(OAuth2PasswordRequestForm):
         self.username = value
 
 
-def require_admin(user: Usuario = Depends(get_current_user)):
+def require_admin(user: Principal = Depends(get_current_user)):
     """Verifica si el usuario es administrador"""
     if user.role != Role.ADMIN:
         logger.warning(f"El usuario {user.email} intentó acceder a un recurso restringido sin ser administrador.")
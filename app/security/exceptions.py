@@ -6,4 +6,13 @@ class TokenValidationError(HTTPException):
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=detail,
             headers={"WWW-Authenticate": "Bearer"}        
-        )
\ No newline at end of file
+        )
+
+
+class HashingSaturatedError(HTTPException):
+    def __init__(self, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado. Intente nuevamente en unos segundos.",
+            headers={"Retry-After": str(retry_after)}
+        )
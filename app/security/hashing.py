@@ -1,4 +1,30 @@
 import bcrypt
+import asyncio
+import hashlib
+import hmac
+import threading
+import logging
+import time
+import os
+from collections import deque
+from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from app.entorno import cargar_entorno
+from app.security.exceptions import HashingSaturatedError
+
+
+cargar_entorno()
+
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", "32"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "2"))
+TOKEN_HMAC_KEY = (os.getenv("TOKEN_HMAC_KEY") or os.getenv("SECRET_KEY") or "").encode("utf-8")
+if not TOKEN_HMAC_KEY:
+    # Sin clave el HMAC sería un hash sin secreto: mejor no arrancar
+    raise RuntimeError("Configura TOKEN_HMAC_KEY (o SECRET_KEY) para firmar los digests de tokens")
+
+
+logger = logging.getLogger(__name__)
 
 
 def hash_password(password: str) -> str:
@@ -8,4 +34,131 @@ def hash_password(password: str) -> str:
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
\ No newline at end of file
+    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+def keyed_digest(token: str, proposito: str) -> str:
+    """
+    HMAC-SHA256 de un token aleatorio de alta entropía.
+
+    Para tokens generados con `secrets` bcrypt no aporta nada: un digest con
+    clave basta y permite buscar la fila por índice. `proposito` separa los
+    espacios de tokens (refresh, activación, ...).
+    """
+    return hmac.new(TOKEN_HMAC_KEY, f"{proposito}:{token}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _hash_password_medido(password: str) -> tuple[str, float]:
+    inicio = time.time()
+    return hash_password(password), inicio
+
+
+def _verify_password_medido(plain_password: str, hashed_password: str) -> tuple[bool, float]:
+    inicio = time.time()
+    return verify_password(plain_password, hashed_password), inicio
+
+
+class HashingExecutor:
+    """
+    Ejecuta bcrypt en un pool de procesos para no bloquear el event loop.
+
+    La cola es acotada: si ya hay `workers + queue_size` operaciones en curso
+    se rechaza la petición con 503 y Retry-After en lugar de acumular latencia.
+    """
+
+    def __init__(self, workers: int, queue_size: int, retry_after: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._pool = None
+        self._lock = threading.Lock()
+        self._en_curso = 0
+        self._completadas = 0
+        self._rechazadas = 0
+        self._esperas = deque(maxlen=1000)
+
+    @property
+    def capacidad(self) -> int:
+        return self.workers + self.queue_size
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                logger.info(f"Iniciando pool de hashing con {self.workers} procesos")
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _reservar(self):
+        with self._lock:
+            if self._en_curso >= self.capacidad:
+                self._rechazadas += 1
+                logger.warning(f"Pool de hashing saturado ({self._en_curso} operaciones en curso)")
+                raise HashingSaturatedError(self.retry_after)
+            self._en_curso += 1
+
+    def _liberar(self, espera: Optional[float] = None):
+        with self._lock:
+            self._en_curso -= 1
+            if espera is not None:
+                self._completadas += 1
+                self._esperas.append(espera)
+
+    async def _ejecutar(self, fn, *args):
+        self._reservar()
+        espera = None
+        enviado = time.time()
+        try:
+            loop = asyncio.get_running_loop()
+            resultado, inicio = await loop.run_in_executor(self._get_pool(), fn, *args)
+            espera = max(0.0, inicio - enviado)
+            return resultado
+        finally:
+            self._liberar(espera)
+
+    async def hash_password(self, password: str) -> str:
+        return await self._ejecutar(_hash_password_medido, password)
+
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._ejecutar(_verify_password_medido, plain_password, hashed_password)
+
+    def metricas(self) -> dict:
+        """Profundidad de cola y tiempos de espera de las operaciones recientes"""
+        with self._lock:
+            esperas = sorted(self._esperas)
+            en_curso = self._en_curso
+            completadas = self._completadas
+            rechazadas = self._rechazadas
+
+        def percentil(p: float) -> float:
+            if not esperas:
+                return 0.0
+            return round(esperas[min(len(esperas) - 1, int(len(esperas) * p))] * 1000, 2)
+
+        return {
+            "workers": self.workers,
+            "capacidad": self.capacidad,
+            "en_curso": en_curso,
+            "profundidad_cola": max(0, en_curso - self.workers),
+            "completadas": completadas,
+            "rechazadas": rechazadas,
+            "espera_p50_ms": percentil(0.50),
+            "espera_p95_ms": percentil(0.95),
+            "espera_max_ms": percentil(1.0),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+hashing_executor = HashingExecutor(HASH_WORKERS, HASH_QUEUE_SIZE, HASH_RETRY_AFTER)
+
+
+async def hash_password_async(password: str) -> str:
+    return await hashing_executor.hash_password(password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await hashing_executor.verify_password(plain_password, hashed_password)
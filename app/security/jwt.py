@@ -1,15 +1,22 @@
 from datetime import datetime, timedelta, timezone
 from jose import jwt, JWTError, ExpiredSignatureError, JWTError
 from jose.exceptions import JWTClaimsError
-from dotenv import load_dotenv
+from app.entorno import cargar_entorno
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException, status
 from app.enums import Role
 from app.db.models.models import Usuario, AccountStatus
-from app.db.database import get_db
+from app.db.database import get_db, get_async_db, usa_db_async
+from app.services.usuario_service import get_usuario_por_email, get_usuario_por_email_async
 from app.security.exceptions import TokenValidationError
+from app.security.principal_cache import Principal, principal_cache
+from app.security.cache import TTLCache
+from app.security.keyring import crear_keyring
 from typing import Optional, Dict, Any
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+import hashlib
+import time
 import os
 import logging
 
@@ -21,11 +28,23 @@ logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(
     tokenUrl = "/auth/login", scheme_name = "bearerAuth")
 
-load_dotenv()
+cargar_entorno()
 
 SECRET_KEY = os.getenv("SECRET_KEY")  
 ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES")) 
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "20000"))
+
+
+# Claims ya verificados, indexados por el digest del token y válidos hasta su `exp`
+token_cache = TTLCache(TOKEN_CACHE_SIZE, ACCESS_TOKEN_EXPIRE_MINUTES * 60)
+
+# Con ALGORITHM RS*/ES* se firma con el anillo de claves (kid) en lugar de SECRET_KEY
+keyring = crear_keyring(ALGORITHM)
+if keyring is not None:
+    keyring.al_recargar(token_cache.clear)
+
+JWKS_VACIO = b'{"keys":[]}'
 
 
 def create_access_token(
@@ -63,21 +82,60 @@ def create_access_token(
     if extra_data:
         to_encode.update(extra_data)
 
+    if keyring is not None:
+        clave = keyring.clave_activa()
+        return jwt.encode(to_encode, clave.privada, algorithm=clave.algoritmo, headers={"kid": clave.kid})
+
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
 
+def _decodificar(token: str) -> Dict[str, Any]:
+    if keyring is None:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+    kid = jwt.get_unverified_header(token).get("kid")
+    clave = keyring.clave(kid)
+    if clave is None:
+        raise JWTError(f"kid desconocido: {kid}")
+    return jwt.decode(token, clave.publica, algorithms=[clave.algoritmo])
+
+
+
+def obtener_jwks() -> tuple[bytes, str]:
+    """Claves públicas vigentes en formato JWKS y su ETag"""
+    if keyring is None:
+        return JWKS_VACIO, '"vacio"'
+    return keyring.jwks()
+
+
+
+def _clave_token(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
 def verify_access_token(token: str) -> Dict[str, Any]:
     """
     Verifica y decodifica un token de acceso JWT.
+
+    Los claims de un token ya verificado se cachean hasta su `exp`, así que
+    las presentaciones repetidas se resuelven con un hash y una búsqueda.
     """
+    clave = _clave_token(token)
+    payload = token_cache.get(clave)
+    if payload is not None:
+        return dict(payload)
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = _decodificar(token)
         email: str = payload.get("sub")
         if not email:
             logger.warning("El token no contiene un email válido")
             raise TokenValidationError("Token sin email válido")
-        return payload
+        exp = payload.get("exp")
+        if exp is not None:
+            token_cache.set(clave, payload, ttl=exp - time.time())
+        return dict(payload)
 
     except ExpiredSignatureError:
         logger.error("El token ha expirado")
@@ -93,6 +151,14 @@ def verify_access_token(token: str) -> Dict[str, Any]:
 
 
 
+def _cachear_principal(email: str, user: Optional[Usuario]) -> Optional[Principal]:
+    if user is None:
+        return None
+    principal = Principal.desde_usuario(user)
+    principal_cache.set(email, principal)
+    return principal
+
+
 def get_current_user(
     db: Session = Depends(get_db), 
     token: str = Depends(oauth2_scheme)
@@ -105,7 +171,7 @@ def get_current_user(
         token: JWT recibido
     
     Returns:
-        Usuario: Modelo de usuario autenticado
+        Principal: Datos de autorización del usuario autenticado (cacheados por email)
     
     Raises:
         TokenValidationError: Si no se puede validar el usuario
@@ -117,15 +183,17 @@ def get_current_user(
         if not email:
             raise TokenValidationError("Email no encontrado en el token")
         
-        user = db.query(Usuario).filter(Usuario.email == email).first()
+        principal = principal_cache.get(email)
+        if principal is None:
+            principal = _cachear_principal(email, get_usuario_por_email(db, email))
         
-        if not user:
+        if not principal:
             raise TokenValidationError("Usuario no encontrado")
             
-        if user.account_status != AccountStatus.active:
+        if principal.account_status != AccountStatus.active:
             raise TokenValidationError("Cuenta inactiva")
             
-        return user
+        return principal
         
     except HTTPException as e:
         raise e
@@ -134,11 +202,8 @@ def get_current_user(
     
 
 
-def get_current_verified_user(
-        token: str = Depends(oauth2_scheme),
-        db: Session = Depends(get_db)
-    ) -> Usuario:
-
+def _email_verificado(token: str) -> str:
+    """Valida el token y exige que el usuario haya superado el OTP"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -146,12 +211,12 @@ def get_current_verified_user(
     )
     
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = verify_access_token(token)
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
         
-    except JWTError:
+    except TokenValidationError:
         raise credentials_exception
     
 
@@ -160,10 +225,16 @@ def get_current_verified_user(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="OTP verification required"
         )
-    
-    user = db.query(Usuario).filter(Usuario.email == email).first()
+    return email
+
+
+def _validar_usuario_verificado(user: Optional[Principal]) -> Principal:
     if user is None:
-        raise credentials_exception
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
 
     if not user.account_status:
         raise HTTPException(
@@ -171,4 +242,31 @@ def get_current_verified_user(
             detail="Account inactive"
         )
 
-    return user
\ No newline at end of file
+    return user
+
+
+def get_current_verified_user(
+        token: str = Depends(oauth2_scheme),
+        db: Session = Depends(get_db)
+    ) -> Principal:
+    email = _email_verificado(token)
+    principal = principal_cache.get(email)
+    if principal is None:
+        principal = _cachear_principal(email, get_usuario_por_email(db, email))
+    return _validar_usuario_verificado(principal)
+
+
+async def get_current_verified_user_async(
+        token: str = Depends(oauth2_scheme),
+        db: AsyncSession = Depends(get_async_db)
+    ) -> Principal:
+    email = _email_verificado(token)
+    principal = principal_cache.get(email)
+    if principal is None:
+        principal = _cachear_principal(email, await get_usuario_por_email_async(db, email))
+    return _validar_usuario_verificado(principal)
+
+
+def get_current_verified_user_para(ruta: str):
+    """Dependencia de usuario verificado que comparte sesión con `get_db_para(ruta)`"""
+    return get_current_verified_user_async if usa_db_async(ruta) else get_current_verified_user
@@ -0,0 +1,209 @@
+"""
+Anillo de claves asimétricas (RS*/ES*) para firmar y verificar JWT por `kid`.
+
+Las claves viven en JWT_KEYS_DIR:
+    <kid>.pem      clave privada: firma (si es la activa) y verifica
+    <kid>.pub.pem  clave pública: solo verifica (clave retirada)
+    activo         opcional, contiene el kid con el que se firma
+
+Rotación sin cortes:
+    1. Agregar <nuevo>.pem. Se publica en el JWKS y se acepta, pero se sigue
+       firmando con la clave anterior.
+    2. Pasado el max-age del JWKS, escribir <nuevo> en `activo`.
+    3. Pasado ACCESS_TOKEN_EXPIRE_MINUTES, retirar la clave vieja (borrarla o
+       dejar solo su <viejo>.pub.pem).
+Cada worker detecta los cambios del directorio por sí mismo, sin reiniciar.
+"""
+from dataclasses import dataclass
+from typing import Callable, Optional
+from jose import jwk
+from jose.backends.base import Key
+from app.entorno import cargar_entorno
+import hashlib
+import json
+import threading
+import logging
+import time
+import sys
+import os
+
+
+cargar_entorno()
+
+JWT_KEYS_DIR = os.getenv("JWT_KEYS_DIR")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
+JWT_KEYS_RELOAD_INTERVAL = int(os.getenv("JWT_KEYS_RELOAD_INTERVAL", "30"))
+# Revisiones adelantadas por un kid desconocido: como mucho una por intervalo
+JWT_KEYS_FORCED_RELOAD_INTERVAL = float(os.getenv("JWT_KEYS_FORCED_RELOAD_INTERVAL", "1"))
+JWKS_MAX_AGE = int(os.getenv("JWKS_MAX_AGE", "300"))
+
+ARCHIVO_ACTIVO = "activo"
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ClaveFirma:
+    kid: str
+    algoritmo: str
+    publica: Key
+    privada: Optional[Key] = None
+
+
+class KeyRing:
+    def __init__(self, directorio: str, algoritmo: str, kid_activo: Optional[str] = None,
+                 intervalo_recarga: int = JWT_KEYS_RELOAD_INTERVAL,
+                 intervalo_forzado: float = JWT_KEYS_FORCED_RELOAD_INTERVAL):
+        self.directorio = directorio
+        self.algoritmo = algoritmo
+        self.kid_configurado = kid_activo
+        self.intervalo_recarga = intervalo_recarga
+        self.intervalo_forzado = min(intervalo_forzado, intervalo_recarga)
+        self._lock = threading.Lock()
+        self._claves: dict[str, ClaveFirma] = {}
+        self._activa: Optional[ClaveFirma] = None
+        self._jwks = b'{"keys":[]}'
+        self._etag = ""
+        self._firma_directorio = None
+        self._ultima_revision = 0.0
+        self._al_recargar: list[Callable[[], None]] = []
+        self.cargar()
+
+    def al_recargar(self, callback: Callable[[], None]):
+        """Registra una función a ejecutar cuando cambia el conjunto de claves"""
+        self._al_recargar.append(callback)
+
+    def _estado_directorio(self):
+        archivos = sorted(os.listdir(self.directorio))
+        return tuple((nombre, os.stat(os.path.join(self.directorio, nombre)).st_mtime_ns) for nombre in archivos)
+
+    def cargar(self):
+        claves: dict[str, ClaveFirma] = {}
+        estado = self._estado_directorio()
+        for nombre, _ in estado:
+            ruta = os.path.join(self.directorio, nombre)
+            if nombre.endswith(".pub.pem"):
+                kid, privada = nombre[:-len(".pub.pem")], False
+            elif nombre.endswith(".pem"):
+                kid, privada = nombre[:-len(".pem")], True
+            else:
+                continue
+            if kid in claves and claves[kid].privada is not None:
+                continue
+            with open(ruta) as f:
+                clave = jwk.construct(f.read(), self.algoritmo)
+            claves[kid] = ClaveFirma(
+                kid = kid,
+                algoritmo = self.algoritmo,
+                publica = clave.public_key() if privada else clave,
+                privada = clave if privada else None,
+            )
+
+        kid_activo = self._leer_kid_activo() or self.kid_configurado
+        if not kid_activo:
+            firmantes = sorted(kid for kid, clave in claves.items() if clave.privada is not None)
+            kid_activo = firmantes[-1] if firmantes else None
+        activa = claves.get(kid_activo)
+        if activa is None or activa.privada is None:
+            raise RuntimeError(f"No hay clave privada para el kid activo '{kid_activo}' en {self.directorio}")
+
+        jwks = []
+        for clave in claves.values():
+            publica = clave.publica.to_dict()
+            publica.update(kid=clave.kid, use="sig", alg=clave.algoritmo)
+            jwks.append(publica)
+        cuerpo = json.dumps({"keys": jwks}, separators=(",", ":")).encode()
+
+        with self._lock:
+            cambiaron = set(claves) != set(self._claves)
+            self._claves = claves
+            self._activa = activa
+            self._jwks = cuerpo
+            self._etag = '"' + hashlib.sha256(cuerpo).hexdigest()[:32] + '"'
+            self._firma_directorio = estado
+            self._ultima_revision = time.monotonic()
+
+        logger.info(f"Anillo de claves JWT cargado: {sorted(claves)} (firma con '{activa.kid}')")
+        if cambiaron:
+            for callback in self._al_recargar:
+                callback()
+
+    def _leer_kid_activo(self) -> Optional[str]:
+        ruta = os.path.join(self.directorio, ARCHIVO_ACTIVO)
+        if not os.path.exists(ruta):
+            return None
+        with open(ruta) as f:
+            return f.read().strip() or None
+
+    def recargar_si_cambio(self, forzar: bool = False):
+        ahora = time.monotonic()
+        # Forzar solo adelanta la revisión: tokens con kids inventados no
+        # pueden provocar un listdir + stat del directorio en cada petición
+        espera = self.intervalo_forzado if forzar else self.intervalo_recarga
+        if ahora - self._ultima_revision < espera:
+            return
+        self._ultima_revision = ahora
+        try:
+            if self._estado_directorio() != self._firma_directorio:
+                self.cargar()
+        except Exception as e:
+            logger.error(f"No se pudo recargar el anillo de claves JWT, se mantienen las anteriores: {e}")
+
+    def clave_activa(self) -> ClaveFirma:
+        self.recargar_si_cambio()
+        return self._activa
+
+    def clave(self, kid: Optional[str]) -> Optional[ClaveFirma]:
+        """Búsqueda O(1) por kid; un kid desconocido adelanta la revisión del directorio"""
+        self.recargar_si_cambio()
+        clave = self._claves.get(kid)
+        if clave is None and kid:
+            self.recargar_si_cambio(forzar=True)
+            clave = self._claves.get(kid)
+        return clave
+
+    def jwks(self) -> tuple[bytes, str]:
+        self.recargar_si_cambio()
+        return self._jwks, self._etag
+
+
+def es_algoritmo_asimetrico(algoritmo: Optional[str]) -> bool:
+    return bool(algoritmo) and algoritmo[:2] in ("RS", "ES", "PS")
+
+
+def crear_keyring(algoritmo: Optional[str]) -> Optional[KeyRing]:
+    """Anillo de claves si ALGORITHM es asimétrico; None mantiene el modo SECRET_KEY"""
+    if not es_algoritmo_asimetrico(algoritmo):
+        return None
+    if not JWT_KEYS_DIR:
+        raise RuntimeError(f"ALGORITHM={algoritmo} requiere JWT_KEYS_DIR con las claves de firma")
+    return KeyRing(JWT_KEYS_DIR, algoritmo, JWT_ACTIVE_KID)
+
+
+def generar_clave(directorio: str, kid: str, algoritmo: str) -> str:
+    """Genera una clave privada PEM para el algoritmo indicado"""
+    if algoritmo.startswith("ES"):
+        import ecdsa
+        curvas = {"ES256": ecdsa.NIST256p, "ES384": ecdsa.NIST384p, "ES512": ecdsa.NIST521p}
+        pem = ecdsa.SigningKey.generate(curve=curvas[algoritmo]).to_pem().decode()
+    else:
+        import rsa
+        _, privada = rsa.newkeys(2048)
+        pem = privada.save_pkcs1().decode()
+
+    os.makedirs(directorio, exist_ok=True)
+    ruta = os.path.join(directorio, f"{kid}.pem")
+    with open(ruta, "x") as f:
+        f.write(pem)
+    os.chmod(ruta, 0o600)
+    return ruta
+
+
+if __name__ == "__main__":
+    # python -m app.security.keyring <kid> [ALGORITMO]
+    if len(sys.argv) < 2:
+        print("Uso: python -m app.security.keyring <kid> [RS256|ES256]")
+        sys.exit(1)
+    algoritmo = sys.argv[2] if len(sys.argv) > 2 else (os.getenv("ALGORITHM") or "RS256")
+    print(generar_clave(JWT_KEYS_DIR or "keys", sys.argv[1], algoritmo))
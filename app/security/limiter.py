@@ -1,8 +1,31 @@
-from slowapi import Limiter
+from slowapi import Limiter, _rate_limit_exceeded_handler
+from slowapi.errors import RateLimitExceeded
 from slowapi.util import get_remote_address
 from fastapi import FastAPI
+from app.entorno import cargar_entorno
+import app.security.rate_limit  # registra shm:// y la estrategia token-bucket
+import os
+
+
+cargar_entorno()
+
+# memory:// cuenta por proceso; con WORKERS>1 usar shm://<nombre> (un host) o redis://
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+# fixed-window, sliding-window-counter, moving-window o token-bucket
+RATE_LIMIT_STRATEGY = os.getenv("RATE_LIMIT_STRATEGY", "sliding-window-counter")
+
+
+# Única instancia del proceso: la usan los decoradores de las rutas y la app
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy=RATE_LIMIT_STRATEGY,
+    in_memory_fallback_enabled=RATE_LIMIT_STORAGE_URI.startswith("redis")
+)
+
 
 def create_limiter(app: FastAPI):
-    limiter = Limiter(key_func=get_remote_address)
+    app.state.limiter = limiter
     app.limiter = limiter
-    return limiter
\ No newline at end of file
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+    return limiter
@@ -0,0 +1,184 @@
+"""
+Bloqueo temporal tras intentos de login fallidos, fuera de la base principal.
+
+Los contadores viven en un almacén con expiración (memoria del proceso o
+Redis): uno por email + IP y otro por email, y basta con que cualquiera de
+los dos llegue a su límite para bloquear. Así un atacante que cambia de IP
+sigue topando con el límite del email, y el de email + IP frena antes a
+quien insiste desde una sola dirección. Cada fallo es una operación O(1) sin
+transacciones y el bloqueo caduca solo por TTL. Los intentos se auditan en
+`login_attempt_audit` en lotes y en segundo plano.
+"""
+from datetime import datetime
+from typing import Optional
+from app.entorno import cargar_entorno
+from app.db.batch_writer import EscritorPorLotes
+from app.db.config import settings
+from app.db.models.models import LoginAttemptAudit
+from app.security.cache import TTLCache
+import threading
+import logging
+import time
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+cargar_entorno()
+
+LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", "5"))
+# Fallos por email sumando todas las IPs; más alto que el de una sola IP para
+# que cualquiera no pueda bloquear una cuenta ajena con pocos intentos
+LOGIN_MAX_ATTEMPTS_EMAIL = int(os.getenv("LOGIN_MAX_ATTEMPTS_EMAIL", str(LOGIN_MAX_ATTEMPTS * 4)))
+LOGIN_ATTEMPT_WINDOW = int(os.getenv("LOGIN_ATTEMPT_WINDOW", "900"))
+LOGIN_LOCKOUT_SECONDS = int(os.getenv("LOGIN_LOCKOUT_SECONDS", "900"))
+# memory:// cuenta por proceso; redis://host:puerto/db lo comparte entre nodos
+LOCKOUT_STORAGE_URI = os.getenv("LOCKOUT_STORAGE_URI", "memory://")
+
+
+class MemoryLockoutStore:
+    def __init__(self, max_claves: int = 100_000):
+        self._intentos = TTLCache(max_claves, LOGIN_ATTEMPT_WINDOW)
+        self._bloqueos = TTLCache(max_claves, LOGIN_LOCKOUT_SECONDS)
+        self._lock = threading.Lock()
+
+    async def bloqueado(self, clave: str) -> float:
+        hasta = self._bloqueos.get(clave)
+        return max(0.0, hasta - time.monotonic()) if hasta else 0.0
+
+    async def registrar_fallo(self, clave: str, maximo: int, ventana: int, bloqueo: int) -> tuple[int, bool]:
+        ahora = time.monotonic()
+        with self._lock:
+            intentos, expira = self._intentos.get(clave) or (0, ahora + ventana)
+            intentos += 1
+            if intentos >= maximo:
+                self._intentos.invalidate(clave)
+                self._bloqueos.set(clave, ahora + bloqueo, ttl=bloqueo)
+                return intentos, True
+            # La ventana cuenta desde el primer fallo, no desde el último
+            self._intentos.set(clave, (intentos, expira), ttl=expira - ahora)
+        return intentos, False
+
+    async def limpiar(self, clave: str):
+        self._intentos.invalidate(clave)
+
+
+# Incrementa, fija la ventana en el primer fallo y bloquea al llegar al máximo
+# en una sola ida y vuelta
+LUA_REGISTRAR_FALLO = """
+local intentos = redis.call("INCR", KEYS[1])
+if intentos == 1 then
+    redis.call("EXPIRE", KEYS[1], ARGV[2])
+end
+if intentos >= tonumber(ARGV[1]) then
+    redis.call("SET", KEYS[2], intentos, "EX", ARGV[3])
+    redis.call("DEL", KEYS[1])
+    return {intentos, 1}
+end
+return {intentos, 0}
+"""
+
+
+class RedisLockoutStore:
+    def __init__(self, cliente, prefijo: str = "lockout"):
+        self.cliente = cliente
+        self.prefijo = prefijo
+        self._script = cliente.register_script(LUA_REGISTRAR_FALLO)
+
+    @classmethod
+    def desde_url(cls, url: str):
+        from redis.asyncio import Redis
+        return cls(Redis.from_url(url))
+
+    async def bloqueado(self, clave: str) -> float:
+        restante = await self.cliente.pttl(f"{self.prefijo}:bloqueo:{clave}")
+        return restante / 1000 if restante > 0 else 0.0
+
+    async def registrar_fallo(self, clave: str, maximo: int, ventana: int, bloqueo: int) -> tuple[int, bool]:
+        intentos, bloqueado = await self._script(
+            keys=[f"{self.prefijo}:intentos:{clave}", f"{self.prefijo}:bloqueo:{clave}"],
+            args=[maximo, ventana, bloqueo]
+        )
+        return int(intentos), bool(bloqueado)
+
+    async def limpiar(self, clave: str):
+        await self.cliente.delete(f"{self.prefijo}:intentos:{clave}")
+
+
+class LockoutTracker:
+    def __init__(
+        self,
+        store,
+        maximo: int = LOGIN_MAX_ATTEMPTS,
+        maximo_email: int = LOGIN_MAX_ATTEMPTS_EMAIL,
+        ventana: int = LOGIN_ATTEMPT_WINDOW,
+        bloqueo: int = LOGIN_LOCKOUT_SECONDS,
+        auditoria: Optional[EscritorPorLotes] = None
+    ):
+        self.store = store
+        self.maximo = maximo
+        self.maximo_email = maximo_email
+        self.ventana = ventana
+        self.bloqueo = bloqueo
+        self.auditoria = auditoria
+
+    @staticmethod
+    def _clave_email(email: str) -> str:
+        return email.strip().lower()
+
+    @classmethod
+    def _clave(cls, email: str, ip: str) -> str:
+        return f"{cls._clave_email(email)}|{ip}"
+
+    async def bloqueado(self, email: str, ip: str) -> float:
+        """Segundos que le quedan al bloqueo de este email, desde esta IP o desde todas (0 si no lo hay)"""
+        return max(
+            await self.store.bloqueado(self._clave(email, ip)),
+            await self.store.bloqueado(self._clave_email(email))
+        )
+
+    async def registrar_fallo(self, email: str, ip: str) -> bool:
+        """Cuenta un fallo y devuelve True si con él queda bloqueado"""
+        intentos, bloqueado_ip = await self.store.registrar_fallo(
+            self._clave(email, ip), self.maximo, self.ventana, self.bloqueo
+        )
+        intentos_email, bloqueado_email = await self.store.registrar_fallo(
+            self._clave_email(email), self.maximo_email, self.ventana, self.bloqueo
+        )
+        if bloqueado_ip:
+            logger.warning(f"Bloqueando {email} desde {ip} tras {intentos} intentos fallidos")
+        if bloqueado_email:
+            logger.warning(f"Bloqueando {email} desde cualquier IP tras {intentos_email} intentos fallidos")
+        bloqueado = bloqueado_ip or bloqueado_email
+        self._auditar(email, ip, exito=False, bloqueado=bloqueado)
+        return bloqueado
+
+    async def registrar_exito(self, email: str, ip: str):
+        # El contador por email no se reinicia: un acierto desde una IP no
+        # borra los fallos que vienen de otras
+        await self.store.limpiar(self._clave(email, ip))
+        self._auditar(email, ip, exito=True, bloqueado=False)
+
+    def _auditar(self, email: str, ip: str, exito: bool, bloqueado: bool):
+        if self.auditoria is not None:
+            self.auditoria.agregar(
+                email=email, ip=ip, success=exito, locked=bloqueado, created_at=datetime.now()
+            )
+
+
+def crear_store(uri: str):
+    if uri.startswith(("redis://", "rediss://", "unix://")):
+        return RedisLockoutStore.desde_url(uri)
+    if uri.startswith("memory://"):
+        if settings.WORKERS > 1:
+            logger.warning(
+                f"LOCKOUT_STORAGE_URI=memory:// con WORKERS={settings.WORKERS}: cada worker cuenta sus "
+                "propios fallos y el límite real se multiplica; configura redis:// para compartirlos"
+            )
+        return MemoryLockoutStore()
+    raise ValueError(f"LOCKOUT_STORAGE_URI no soportado: {uri}")
+
+
+auditoria_login = EscritorPorLotes(LoginAttemptAudit)
+lockout_tracker = LockoutTracker(crear_store(LOCKOUT_STORAGE_URI), auditoria=auditoria_login)
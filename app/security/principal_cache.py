@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+from typing import Optional
+from app.entorno import cargar_entorno
+from app.enums import AccountStatus, Role
+from app.security.cache import TTLCache
+import logging
+import os
+
+
+cargar_entorno()
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "30"))
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Datos mínimos del usuario autenticado para decidir autorización"""
+    id: int
+    email: str
+    role: Optional[Role]
+    account_status: Optional[AccountStatus]
+    two_factor_enabled: bool
+
+    @classmethod
+    def desde_usuario(cls, usuario) -> "Principal":
+        return cls(
+            id = usuario.id,
+            email = usuario.email,
+            role = usuario.role,
+            account_status = usuario.account_status,
+            two_factor_enabled = bool(usuario.two_factor_enabled),
+        )
+
+
+principal_cache = TTLCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+
+def invalidar_principal(*emails: Optional[str]):
+    """Descarta el principal cacheado tras cambiar estado, rol o datos del usuario"""
+    for email in emails:
+        if email:
+            principal_cache.invalidate(email)
+            logger.debug(f"Principal invalidado para {email}")
@@ -0,0 +1,327 @@
+"""
+Backends y estrategias adicionales para el limitador de `limits`/slowapi.
+
+- `shm://<nombre>`: contadores en una tabla hash sobre memoria compartida
+  (`/dev/shm`), protegida con `flock`; la comparten todos los workers de un
+  mismo host.
+- `token-bucket`: estrategia de cubo de tokens, registrada en `STRATEGIES`.
+  Funciona con `shm://`, `memory://` y `redis://` (un único script Lua por
+  decisión).
+
+Importar este módulo registra ambos en `limits`.
+"""
+from contextlib import contextmanager
+from math import floor, inf
+from typing import Optional
+from urllib.parse import urlparse
+from limits.storage import Storage, MemoryStorage, RedisStorage
+from limits.storage.base import SlidingWindowCounterSupport
+from limits.strategies import RateLimiter, RateLimitItem, WindowStats, STRATEGIES
+from app.security.cache import TTLCache
+import threading
+import tempfile
+import hashlib
+import struct
+import fcntl
+import mmap
+import time
+import os
+
+
+RATE_LIMIT_SHM_SLOTS = int(os.getenv("RATE_LIMIT_SHM_SLOTS", "65536"))
+
+# Cada entrada: hash de la clave, tres valores según el uso y el instante de expiración
+SLOT = struct.Struct("<Qdddd")
+SLOT_VACIO = bytes(SLOT.size)
+# Posiciones consultadas por clave; acota el coste de cada decisión
+SONDEOS = 16
+
+
+def _hash(clave: str) -> int:
+    return int.from_bytes(hashlib.blake2b(clave.encode("utf-8"), digest_size=8).digest(), "little") or 1
+
+
+class SharedMemoryStorage(Storage, SlidingWindowCounterSupport):
+    """
+    Storage de `limits` sobre un fichero mapeado en `/dev/shm`.
+
+    Cada clave ocupa una entrada de tamaño fijo localizada por sondeo lineal
+    (como mucho `SONDEOS` posiciones), así que cada decisión es O(1) y no
+    necesita ningún servicio externo. Si la tabla se llena se desaloja la
+    entrada que antes expira.
+    """
+
+    STORAGE_SCHEME = ["shm"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, slots: Optional[int] = None, **options):
+        nombre = urlparse(uri).netloc or "erp-rate-limit"
+        base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+        self.ruta = os.path.join(base, nombre)
+        self.slots = int(slots or RATE_LIMIT_SHM_SLOTS)
+        self._lock = threading.Lock()
+        self._pid: Optional[int] = None
+        self._fd: Optional[int] = None
+        self._mapa: Optional[mmap.mmap] = None
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+
+    @property
+    def base_exceptions(self):
+        return OSError
+
+    def _abrir(self) -> mmap.mmap:
+        # Tras un fork el mapa del padre no sirve: cada proceso abre el suyo
+        if self._pid != os.getpid():
+            fd = os.open(self.ruta, os.O_RDWR | os.O_CREAT, 0o600)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                tamano = max(os.fstat(fd).st_size, self.slots * SLOT.size)
+                if os.fstat(fd).st_size < tamano:
+                    os.ftruncate(fd, tamano)
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            self.slots = tamano // SLOT.size
+            self._fd, self._mapa, self._pid = fd, mmap.mmap(fd, tamano), os.getpid()
+        return self._mapa
+
+    @contextmanager
+    def _bloqueado(self):
+        # flock no excluye a hilos que comparten descriptor, de ahí el Lock
+        with self._lock:
+            mapa = self._abrir()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield mapa
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _buscar(self, mapa: mmap.mmap, clave: str, ahora: float) -> tuple[int, int, Optional[tuple]]:
+        """Devuelve (hash, posición, valores) con valores None si la clave no existe o expiró"""
+        h = _hash(clave)
+        libre, victima, victima_expira = None, None, inf
+        for i in range(SONDEOS):
+            posicion = (h + i) % self.slots
+            hash_slot, a, b, c, expira = SLOT.unpack_from(mapa, posicion * SLOT.size)
+            if hash_slot == h:
+                return h, posicion, ((a, b, c) if expira > ahora else None)
+            if hash_slot == 0 or expira <= ahora:
+                if libre is None:
+                    libre = posicion
+            elif expira < victima_expira:
+                victima, victima_expira = posicion, expira
+        return h, (libre if libre is not None else victima), None
+
+    def _escribir(self, mapa: mmap.mmap, posicion: int, h: int, a: float, b: float, c: float, expira: float):
+        SLOT.pack_into(mapa, posicion * SLOT.size, h, a, b, c, expira)
+
+    def incr(self, key: str, expiry: int, elastic_expiry: bool = False, amount: int = 1) -> int:
+        ahora = time.time()
+        with self._bloqueado() as mapa:
+            h, posicion, valores = self._buscar(mapa, key, ahora)
+            if valores is None:
+                contador, expira = amount, ahora + expiry
+            else:
+                contador = valores[0] + amount
+                expira = ahora + expiry if elastic_expiry else valores[1]
+            self._escribir(mapa, posicion, h, contador, expira, 0, expira)
+        return int(contador)
+
+    def get(self, key: str) -> int:
+        with self._bloqueado() as mapa:
+            _, _, valores = self._buscar(mapa, key, time.time())
+        return int(valores[0]) if valores else 0
+
+    def get_expiry(self, key: str) -> float:
+        ahora = time.time()
+        with self._bloqueado() as mapa:
+            _, _, valores = self._buscar(mapa, key, ahora)
+        return valores[1] if valores else ahora
+
+    def check(self) -> bool:
+        try:
+            with self._bloqueado():
+                return True
+        except OSError:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self._bloqueado() as mapa:
+            ocupados = sum(
+                1 for posicion in range(self.slots)
+                if SLOT.unpack_from(mapa, posicion * SLOT.size)[0]
+            )
+            mapa[:] = bytes(len(mapa))
+        return ocupados
+
+    def clear(self, key: str) -> None:
+        with self._bloqueado() as mapa:
+            h, posicion, _ = self._buscar(mapa, key, time.time())
+            if SLOT.unpack_from(mapa, posicion * SLOT.size)[0] == h:
+                mapa[posicion * SLOT.size:(posicion + 1) * SLOT.size] = SLOT_VACIO
+
+    # Ventana deslizante: (contador anterior, contador actual, índice de ventana)
+
+    @staticmethod
+    def _ventanas(valores: Optional[tuple], ventana: int) -> tuple[float, float]:
+        if valores is None:
+            return 0, 0
+        anterior, actual, indice = valores
+        if indice == ventana:
+            return anterior, actual
+        if indice == ventana - 1:
+            return actual, 0
+        return 0, 0
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        ahora = time.time()
+        ventana = int(ahora // expiry)
+        with self._bloqueado() as mapa:
+            h, posicion, valores = self._buscar(mapa, key, ahora)
+            anterior, actual = self._ventanas(valores, ventana)
+            peso_anterior = (expiry - ahora % expiry) / expiry
+            if floor(anterior * peso_anterior + actual) + amount > limit:
+                return False
+            self._escribir(mapa, posicion, h, anterior, actual + amount, ventana, (ventana + 2) * expiry)
+        return True
+
+    def get_sliding_window(self, key: str, expiry: int) -> tuple[int, float, int, float]:
+        ahora = time.time()
+        with self._bloqueado() as mapa:
+            _, _, valores = self._buscar(mapa, key, ahora)
+        anterior, actual = self._ventanas(valores, int(ahora // expiry))
+        restante = expiry - ahora % expiry
+        return int(anterior), (restante if anterior else 0.0), int(actual), restante + expiry
+
+    # Cubo de tokens: (tokens, última recarga)
+
+    def acquire_token_bucket(
+        self, key: str, capacidad: float, tasa: float, coste: int, consumir: bool
+    ) -> tuple[bool, float, float]:
+        ahora = time.time()
+        with self._bloqueado() as mapa:
+            h, posicion, valores = self._buscar(mapa, key, ahora)
+            tokens = _recargar(valores, capacidad, tasa, ahora)
+            permitido = tokens >= coste
+            if permitido and consumir:
+                tokens -= coste
+                self._escribir(mapa, posicion, h, tokens, ahora, 0, ahora + capacidad / tasa)
+        return permitido, tokens, ahora
+
+
+def _recargar(valores: Optional[tuple], capacidad: float, tasa: float, ahora: float) -> float:
+    if valores is None:
+        return capacidad
+    tokens, ultima = valores[0], valores[1]
+    return min(capacidad, tokens + max(0.0, ahora - ultima) * tasa)
+
+
+class _TokenBucketMemoria:
+    """Cubos de tokens locales al proceso para `memory://`"""
+
+    def __init__(self):
+        self._cubos = TTLCache(max_size=100_000, ttl=86400)
+        self._lock = threading.Lock()
+
+    def acquire_token_bucket(self, key, capacidad, tasa, coste, consumir):
+        ahora = time.time()
+        with self._lock:
+            tokens = _recargar(self._cubos.get(key), capacidad, tasa, ahora)
+            permitido = tokens >= coste
+            if permitido and consumir:
+                tokens -= coste
+                self._cubos.set(key, (tokens, ahora), ttl=capacidad / tasa)
+        return permitido, tokens, ahora
+
+    def clear(self, key):
+        self._cubos.invalidate(key)
+
+
+# Recarga, decide y consume en una sola ida y vuelta; usa el reloj de Redis
+# para que todos los workers compartan la misma noción de tiempo
+LUA_TOKEN_BUCKET = """
+local capacidad = tonumber(ARGV[1])
+local tasa = tonumber(ARGV[2])
+local coste = tonumber(ARGV[3])
+local consumir = ARGV[4] == "1"
+local reloj = redis.call("TIME")
+local ahora = tonumber(reloj[1]) + tonumber(reloj[2]) / 1000000
+local datos = redis.call("HMGET", KEYS[1], "tokens", "ts")
+local tokens = tonumber(datos[1])
+if tokens == nil then
+    tokens = capacidad
+else
+    tokens = math.min(capacidad, tokens + math.max(0, ahora - tonumber(datos[2])) * tasa)
+end
+local permitido = 0
+if tokens >= coste then
+    permitido = 1
+    if consumir then
+        tokens = tokens - coste
+        redis.call("HSET", KEYS[1], "tokens", tostring(tokens), "ts", tostring(ahora))
+        redis.call("PEXPIRE", KEYS[1], math.ceil(capacidad / tasa * 1000))
+    end
+end
+return {permitido, tostring(tokens), tostring(ahora)}
+"""
+
+
+class _TokenBucketRedis:
+    def __init__(self, storage: RedisStorage):
+        self.storage = storage
+        self._script = storage.get_connection().register_script(LUA_TOKEN_BUCKET)
+
+    def acquire_token_bucket(self, key, capacidad, tasa, coste, consumir):
+        permitido, tokens, ahora = self._script(
+            [self.storage.prefixed_key(f"tb:{key}")],
+            [capacidad, tasa, coste, 1 if consumir else 0]
+        )
+        return bool(permitido), float(tokens), float(ahora)
+
+    def clear(self, key):
+        self.storage.get_connection().delete(self.storage.prefixed_key(f"tb:{key}"))
+
+
+class TokenBucketRateLimiter(RateLimiter):
+    """
+    Cubo de tokens: "5/minute" permite ráfagas de hasta 5 peticiones y
+    recupera un token cada 12 segundos.
+    """
+
+    def __init__(self, storage):
+        super().__init__(storage)
+        if hasattr(storage, "acquire_token_bucket"):
+            self._cubos = storage
+        elif isinstance(storage, RedisStorage):
+            self._cubos = _TokenBucketRedis(storage)
+        elif isinstance(storage, MemoryStorage):
+            self._cubos = _TokenBucketMemoria()
+        else:
+            raise NotImplementedError(
+                f"TokenBucketRateLimiter no está implementado para {storage.__class__}"
+            )
+
+    def _decidir(self, item: RateLimitItem, identificadores, coste: int, consumir: bool):
+        tasa = item.amount / item.get_expiry()
+        return self._cubos.acquire_token_bucket(
+            item.key_for(*identificadores), item.amount, tasa, coste, consumir
+        )
+
+    def hit(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return self._decidir(item, identifiers, cost, True)[0]
+
+    def test(self, item: RateLimitItem, *identifiers: str, cost: int = 1) -> bool:
+        return self._decidir(item, identifiers, cost, False)[0]
+
+    def get_window_stats(self, item: RateLimitItem, *identifiers: str) -> WindowStats:
+        _, tokens, ahora = self._decidir(item, identifiers, 0, False)
+        tasa = item.amount / item.get_expiry()
+        # Sin tokens se informa de cuándo habrá uno; si no, de cuándo estará lleno
+        espera = (1 - tokens) / tasa if tokens < 1 else (item.amount - tokens) / tasa
+        return WindowStats(ahora + espera, floor(tokens))
+
+    def clear(self, item: RateLimitItem, *identifiers: str) -> None:
+        self._cubos.clear(item.key_for(*identifiers))
+
+
+STRATEGIES["token-bucket"] = TokenBucketRateLimiter
@@ -3,7 +3,7 @@ from fastapi import Form
 from typing import Optional
 from app.enums import AccountStatus, Role
 from datetime import datetime, date
-from app.security.utils import PasswordStr
+from app.security.utils import PasswordStr, EmailSalida
 
 
 class Usuario(BaseModel):
@@ -41,7 +41,7 @@ class UsuarioLogin(BaseModel):
 
 class UsuarioOut(BaseModel):
     id: int
-    email: EmailStr
+    email: EmailSalida
     first_name: str
     last_name: str
     phone_number: Optional[str] = None
@@ -78,3 +78,7 @@ class ActivacionRequest(BaseModel):
     email: EmailStr = Form(...)   
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
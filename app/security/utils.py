@@ -23,4 +23,8 @@ PasswordStr = Annotated[
         description="Contraseña segura con requisitos complejos"
     ),
     BeforeValidator(validar_contraseña_fuerte)
-]
\ No newline at end of file
+]
+
+# Para esquemas de salida: el email ya se validó al entrar y volver a pasarlo
+# por email-validator cuesta más que serializar el resto de la fila
+EmailSalida = Annotated[str, Field(json_schema_extra={"format": "email"})]
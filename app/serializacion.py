@@ -0,0 +1,30 @@
+"""
+Camino rápido para serializar respuestas JSON.
+
+Devolver un `Response` ya serializado evita el recorrido por defecto de
+FastAPI (validar con `response_model`, volcar a dicts de Python y pasar por
+`json.dumps`): los modelos se validan con un `TypeAdapter` construido una
+sola vez y pydantic-core escribe los bytes directamente. El `response_model`
+de la ruta se mantiene para la documentación de OpenAPI.
+"""
+from typing import Any
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import TypeAdapter
+from app.security.schemas import UsuarioOut
+
+
+usuario_out = TypeAdapter(UsuarioOut)
+
+
+def respuesta_modelo(adaptador: TypeAdapter, valor: Any, status_code: int = 200) -> Response:
+    """Valida `valor` (también objetos ORM) con `adaptador` y lo devuelve serializado"""
+    modelo = adaptador.validate_python(valor, from_attributes=True)
+    return Response(adaptador.dump_json(modelo), status_code=status_code, media_type="application/json")
+
+
+def respuesta_json(contenido: Any, status_code: int = 200) -> ORJSONResponse:
+    """
+    Para datos que ya son tipos simples (dicts de filas, fechas, enums):
+    orjson los serializa sin pasar por pydantic.
+    """
+    return ORJSONResponse(contenido, status_code=status_code)
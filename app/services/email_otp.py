@@ -1,12 +1,12 @@
-import smtplib
-from dotenv import load_dotenv
+from app.entorno import cargar_entorno
 import os
 from email.mime.multipart import MIMEMultipart  
 from email.mime.text import MIMEText
+from app.services.smtp_pool import SMTPPool
 import logging
 
 
-load_dotenv()
+cargar_entorno()
 
 
 logging.basicConfig(level=logging.INFO)
@@ -18,37 +18,62 @@ SMTP_PORT = int(os.getenv("SMTP_PORT"))
 SMTP_USER = os.getenv("SMTP_USER")
 SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
 PORT = os.getenv("PORT")
+# Con SMTP_USE_TLS se conecta directamente por TLS (puerto 465); SMTP_START_TLS
+# negocia STARTTLS sobre una conexión en claro (puerto 587)
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+SMTP_START_TLS = os.getenv("SMTP_START_TLS", "false").lower() == "true"
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_POOL_IDLE = float(os.getenv("SMTP_POOL_IDLE", "60"))
 
 
-async def enviar_email_otp(email: str, otp_code: str):
-    logger.info(f"Preparando correo con OTP para {email}")
+smtp_pool = SMTPPool(
+    SMTP_SERVER,
+    SMTP_PORT,
+    SMTP_USER,
+    SMTP_PASSWORD,
+    use_tls = SMTP_USE_TLS,
+    start_tls = SMTP_START_TLS,
+    tamano = SMTP_POOL_SIZE,
+    idle = SMTP_POOL_IDLE
+)
 
-    try:
-        mensaje = MIMEMultipart()
-        mensaje["From"] = SMTP_USER
-        mensaje["To"] = email
-        mensaje["Subject"] = "Tu código de verificación"
-        
-        cuerpo = f"""
+
+def contenido_email_otp(otp_code: str) -> tuple[str, str]:
+    """Asunto y cuerpo HTML del correo con el código OTP"""
+    cuerpo = f"""
         <h1>¡Tu código de verificación OTP!</h1>
         <p>Tu código OTP es: <strong>{otp_code}</strong></p>
         <p>Este código es válido por 10 minutos.</p>
         """
+    return "Tu código de verificación", cuerpo
+
 
-        mensaje.attach(MIMEText(cuerpo, "html"))
+def construir_mensaje(email: str, asunto: str, cuerpo: str) -> MIMEMultipart:
+    mensaje = MIMEMultipart()
+    mensaje["From"] = SMTP_USER
+    mensaje["To"] = email
+    mensaje["Subject"] = asunto
+    mensaje.attach(MIMEText(cuerpo, "html"))
+    return mensaje
 
-        logger.info("Conectando con el servidor SMTP...")
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, timeout=10) as server:
-            logger.info("Conectando con el servidor SMTP...")
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            logger.info("Autenticación SMTP exitosa.")
 
-            server.sendmail(SMTP_USER, email, mensaje.as_string())
-            logger.info(f"Correo de OTP enviado a {email}")
+async def enviar_email_smtp(email: str, asunto: str, cuerpo: str):
+    """Envía por una conexión del pool, ya autenticada si hay alguna libre"""
+    import aiosmtplib
 
-    except smtplib.SMTPException as e:
+    try:
+        await smtp_pool.enviar(construir_mensaje(email, asunto, cuerpo))
+        logger.info(f"Correo enviado a {email}")
+
+    except aiosmtplib.SMTPException as e:
         logger.error(f"Error enviando correo a {email}: {e}")
-        raise RuntimeError(f"No se pudo enviar el email OTP a {email}") from e
+        raise RuntimeError(f"No se pudo enviar el email a {email}") from e
     except Exception as e:
         logger.error(f"Error inesperado enviando correo a {email}: {e}")
-        raise RuntimeError(f"Fallo inesperado al enviar el email OTP a {email}") from e
\ No newline at end of file
+        raise RuntimeError(f"Fallo inesperado al enviar el email a {email}") from e
+
+
+async def enviar_email_otp(email: str, otp_code: str):
+    logger.info(f"Preparando correo con OTP para {email}")
+    asunto, cuerpo = contenido_email_otp(otp_code)
+    await enviar_email_smtp(email, asunto, cuerpo)
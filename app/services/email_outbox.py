@@ -0,0 +1,329 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from collections import deque
+from typing import Callable, Optional
+from sqlalchemy import select, update, insert, func, or_, and_
+from app.entorno import cargar_entorno
+from app.db.database import SessionLocal
+from app.db.models.models import EmailOutbox
+from app.enums import EmailStatus, EmailChannel
+from app.services.email_otp import enviar_email_smtp
+from app.services.email_service_activation import enviar_email_activacion_async
+import threading
+import asyncio
+import logging
+import random
+import os
+
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+cargar_entorno()
+
+EMAIL_WORKERS = int(os.getenv("EMAIL_WORKERS", "2"))
+EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", "10"))
+EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", "5"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+EMAIL_BACKOFF_BASE = float(os.getenv("EMAIL_BACKOFF_BASE", "10"))
+EMAIL_BACKOFF_MAX = float(os.getenv("EMAIL_BACKOFF_MAX", "900"))
+# Un mensaje reclamado por un proceso que muere vuelve a la cola pasado este plazo
+EMAIL_LOCK_SECONDS = int(os.getenv("EMAIL_LOCK_SECONDS", "120"))
+
+# El cuerpo lleva OTPs y enlaces con tokens: deja de guardarse en cuanto el
+# mensaje ya no se va a enviar (`sent` o `dead`)
+CUERPO_BORRADO = ""
+
+
+def encolar_email(db, canal: EmailChannel, destinatario: str, asunto: str, cuerpo: str) -> EmailOutbox:
+    """
+    Añade un correo al outbox dentro de la sesión del llamador.
+
+    No hace commit: el correo se persiste (o se descarta) junto con el resto de
+    la transacción, así nunca se envía un email de un registro que no existe.
+    """
+    ahora = datetime.now()
+    mensaje = EmailOutbox(
+        channel = canal,
+        recipient = destinatario,
+        subject = asunto,
+        body = cuerpo,
+        status = EmailStatus.pending,
+        attempts = 0,
+        next_attempt_at = ahora,
+        created_at = ahora
+    )
+    db.add(mensaje)
+    return mensaje
+
+
+def encolar_emails(db, canal: EmailChannel, mensajes: list[tuple[str, str, str]]):
+    """
+    Versión por lotes de `encolar_email` para `(destinatario, asunto, cuerpo)`:
+    un INSERT de varias filas en la transacción del llamador, sin objetos ORM.
+    """
+    if not mensajes:
+        return
+    ahora = datetime.now()
+    db.execute(insert(EmailOutbox.__table__), [
+        {
+            "channel": canal,
+            "recipient": destinatario,
+            "subject": asunto,
+            "body": cuerpo,
+            "status": EmailStatus.pending,
+            "attempts": 0,
+            "next_attempt_at": ahora,
+            "created_at": ahora
+        }
+        for destinatario, asunto, cuerpo in mensajes
+    ])
+
+
+def calcular_backoff(intentos: int) -> float:
+    """Espera exponencial con jitter (±20%) antes del siguiente intento"""
+    espera = min(EMAIL_BACKOFF_BASE * 2 ** (intentos - 1), EMAIL_BACKOFF_MAX)
+    return espera * random.uniform(0.8, 1.2)
+
+
+@dataclass(frozen=True)
+class MensajeReclamado:
+    id: int
+    channel: EmailChannel
+    recipient: str
+    subject: str
+    body: str
+    attempts: int
+    created_at: datetime
+
+
+class OutboxDispatcher:
+    """
+    Pool de workers asyncio que entregan los correos del outbox.
+
+    Cada worker reclama un lote (`pending` vencidos o `sending` con el bloqueo
+    caducado), lo marca como `sending` y entrega los mensajes; los enviadores
+    síncronos corren en hilos para no bloquear el event loop. Los fallos se
+    reprograman con backoff exponencial y, agotados los intentos, el mensaje
+    queda en `dead`.
+    """
+
+    def __init__(
+        self,
+        session_factory = SessionLocal,
+        workers: int = EMAIL_WORKERS,
+        tamano_lote: int = EMAIL_BATCH_SIZE,
+        intervalo: float = EMAIL_POLL_INTERVAL,
+        max_intentos: int = EMAIL_MAX_ATTEMPTS,
+        enviadores: Optional[dict[EmailChannel, Callable]] = None
+    ):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.tamano_lote = tamano_lote
+        self.intervalo = intervalo
+        self.max_intentos = max_intentos
+        self.enviadores = enviadores or {
+            EmailChannel.brevo: enviar_email_activacion_async,
+            EmailChannel.smtp: enviar_email_smtp,
+        }
+        self._tareas: list[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._evento: Optional[asyncio.Event] = None
+        self._lock = threading.Lock()
+        self._latencias = deque(maxlen=1000)
+        self._enviados = 0
+        self._reintentos = 0
+        self._descartados = 0
+
+    async def start(self):
+        if self._tareas or self.workers <= 0:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._evento = asyncio.Event()
+        self._tareas = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        logger.info(f"Outbox de correos iniciado con {self.workers} workers")
+
+    async def stop(self):
+        tareas, self._tareas = self._tareas, []
+        for tarea in tareas:
+            tarea.cancel()
+        await asyncio.gather(*tareas, return_exceptions=True)
+        self._loop = None
+        self._evento = None
+
+    def despertar(self):
+        """Avisa a los workers de que hay correo nuevo; seguro desde cualquier hilo"""
+        loop, evento = self._loop, self._evento
+        if loop is None or evento is None:
+            return
+        try:
+            loop.call_soon_threadsafe(evento.set)
+        except RuntimeError:
+            pass
+
+    async def _worker(self, numero: int):
+        while True:
+            self._evento.clear()
+            try:
+                procesados = await self.procesar_lote()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Worker de correo {numero}: error procesando el outbox: {e}")
+                procesados = 0
+
+            if procesados:
+                continue
+            try:
+                await asyncio.wait_for(self._evento.wait(), self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+
+    async def procesar_lote(self) -> int:
+        """Reclama y entrega un lote; devuelve cuántos mensajes se intentaron"""
+        mensajes = await asyncio.to_thread(self._reclamar)
+        for mensaje in mensajes:
+            await self._entregar(mensaje)
+        return len(mensajes)
+
+    def _reclamar(self) -> list[MensajeReclamado]:
+        ahora = datetime.now()
+        reclamable = or_(
+            and_(EmailOutbox.status == EmailStatus.pending, EmailOutbox.next_attempt_at <= ahora),
+            and_(EmailOutbox.status == EmailStatus.sending, EmailOutbox.locked_until < ahora),
+        )
+        with self.session_factory() as db:
+            ids = db.execute(
+                select(EmailOutbox.id)
+                .where(reclamable)
+                .order_by(EmailOutbox.next_attempt_at)
+                .limit(self.tamano_lote)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not ids:
+                return []
+
+            # La condición se repite en el UPDATE para que dos procesos sin
+            # SKIP LOCKED (SQLite) no se queden con el mismo mensaje
+            filas = db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id.in_(ids), reclamable)
+                .values(status=EmailStatus.sending, locked_until=ahora + timedelta(seconds=EMAIL_LOCK_SECONDS))
+                .returning(
+                    EmailOutbox.id, EmailOutbox.channel, EmailOutbox.recipient, EmailOutbox.subject,
+                    EmailOutbox.body, EmailOutbox.attempts, EmailOutbox.created_at
+                )
+                .execution_options(synchronize_session=False)
+            ).all()
+            db.commit()
+        return [MensajeReclamado(*fila) for fila in filas]
+
+    async def _entregar(self, mensaje: MensajeReclamado):
+        enviar = self.enviadores[mensaje.channel]
+        try:
+            if asyncio.iscoroutinefunction(enviar):
+                await enviar(mensaje.recipient, mensaje.subject, mensaje.body)
+            else:
+                await asyncio.to_thread(enviar, mensaje.recipient, mensaje.subject, mensaje.body)
+        except Exception as e:
+            await asyncio.to_thread(self._registrar_fallo, mensaje, str(e))
+        else:
+            await asyncio.to_thread(self._registrar_envio, mensaje)
+
+    def _registrar_envio(self, mensaje: MensajeReclamado):
+        ahora = datetime.now()
+        with self.session_factory() as db:
+            db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id == mensaje.id)
+                .values(
+                    status=EmailStatus.sent, sent_at=ahora, locked_until=None,
+                    attempts=mensaje.attempts + 1, last_error=None, body=CUERPO_BORRADO
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        with self._lock:
+            self._enviados += 1
+            if mensaje.created_at is not None:
+                self._latencias.append((ahora - mensaje.created_at).total_seconds())
+        logger.info(f"Correo {mensaje.id} entregado a {mensaje.recipient}")
+
+    def _registrar_fallo(self, mensaje: MensajeReclamado, error: str):
+        intentos = mensaje.attempts + 1
+        valores = {"attempts": intentos, "locked_until": None, "last_error": error[:2000]}
+        if intentos >= self.max_intentos:
+            valores["status"] = EmailStatus.dead
+            valores["body"] = CUERPO_BORRADO
+        else:
+            valores["status"] = EmailStatus.pending
+            valores["next_attempt_at"] = datetime.now() + timedelta(seconds=calcular_backoff(intentos))
+
+        with self.session_factory() as db:
+            db.execute(
+                update(EmailOutbox)
+                .where(EmailOutbox.id == mensaje.id)
+                .values(**valores)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+        with self._lock:
+            if valores["status"] == EmailStatus.dead:
+                self._descartados += 1
+            else:
+                self._reintentos += 1
+        if valores["status"] == EmailStatus.dead:
+            logger.error(f"Correo {mensaje.id} a {mensaje.recipient} descartado tras {intentos} intentos: {error}")
+        else:
+            logger.warning(f"Fallo entregando el correo {mensaje.id} (intento {intentos}), se reintentará: {error}")
+
+    def _profundidad(self) -> dict:
+        with self.session_factory() as db:
+            filas = db.execute(
+                select(EmailOutbox.status, func.count(), func.min(EmailOutbox.created_at))
+                .where(EmailOutbox.status.in_((EmailStatus.pending, EmailStatus.sending, EmailStatus.dead)))
+                .group_by(EmailOutbox.status)
+            ).all()
+        profundidad = {estado.value: 0 for estado in (EmailStatus.pending, EmailStatus.sending, EmailStatus.dead)}
+        mas_antiguo = None
+        for estado, total, creado in filas:
+            profundidad[estado.value] = total
+            if estado != EmailStatus.dead and creado is not None:
+                mas_antiguo = creado if mas_antiguo is None else min(mas_antiguo, creado)
+        profundidad["antiguedad_max_s"] = (
+            round((datetime.now() - mas_antiguo).total_seconds(), 1) if mas_antiguo else 0.0
+        )
+        return profundidad
+
+    async def metricas(self) -> dict:
+        """Profundidad de la cola por estado y latencia de entrega (encolado -> enviado)"""
+        cola = await asyncio.to_thread(self._profundidad)
+        with self._lock:
+            latencias = sorted(self._latencias)
+            contadores = {
+                "enviados": self._enviados,
+                "reintentos": self._reintentos,
+                "descartados": self._descartados,
+            }
+        return {
+            "workers": len(self._tareas),
+            "cola": cola,
+            **contadores,
+            "latencia_entrega_s": {
+                "muestras": len(latencias),
+                "p50": _percentil(latencias, 0.50),
+                "p95": _percentil(latencias, 0.95),
+                "max": round(latencias[-1], 3) if latencias else 0.0,
+            },
+        }
+
+
+def _percentil(valores: list[float], q: float) -> float:
+    if not valores:
+        return 0.0
+    return round(valores[min(len(valores) - 1, int(q * len(valores)))], 3)
+
+
+outbox_dispatcher = OutboxDispatcher()
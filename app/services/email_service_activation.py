@@ -1,44 +1,149 @@
-from dotenv import load_dotenv
+from app.entorno import cargar_entorno
+from typing import TYPE_CHECKING, Iterable, Optional
+import threading
+import asyncio
 import logging
 import os
-import sib_api_v3_sdk
-from sib_api_v3_sdk.rest import ApiException
-import re
+
+if TYPE_CHECKING:
+    import sib_api_v3_sdk
 
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-load_dotenv()
+cargar_entorno()
 
-configuration = sib_api_v3_sdk.Configuration()
-configuration.api_key['api-key'] = os.getenv("BREVO_API_KEY")
+BREVO_API_KEY = os.getenv("BREVO_API_KEY")
+# Conexiones keep-alive que urllib3 mantiene abiertas contra la API; debería
+# cubrir los hilos que envían a la vez (workers del outbox + lotes)
+BREVO_POOL_SIZE = int(os.getenv("BREVO_POOL_SIZE", "8"))
 
+FRONTEND_URL = (os.getenv("FRONTEND_URL") or "").rstrip("/")
 EMAIL_SENDER = os.getenv("EMAIL_SENDER")
 EMAIL_SENDER_NAME = os.getenv("EMAIL_SENDER_NAME")
+# Versiones (destinatarios personalizados) por petición de envío en lote
+BREVO_BATCH_SIZE = int(os.getenv("BREVO_BATCH_SIZE", "500"))
+
+
+def _sdk():
+    """
+    sib_api_v3_sdk carga todos sus modelos al importarse (más de 100 ms): se
+    importa con el primer envío y no en el arranque del worker.
+    """
+    import sib_api_v3_sdk
+    return sib_api_v3_sdk
+
+
+def configuracion_brevo() -> "sib_api_v3_sdk.Configuration":
+    configuracion = _sdk().Configuration()
+    configuracion.api_key['api-key'] = BREVO_API_KEY
+    configuracion.connection_pool_maxsize = BREVO_POOL_SIZE
+    return configuracion
+
+
+def contenido_email_activacion(nombre: str, token: str) -> tuple[str, str]:
+    """Asunto y cuerpo HTML del correo con el enlace de activación"""
+    cuerpo = f"""
+    <h1>¡Bienvenido {nombre}!</h1>
+    <p>Haz clic en el siguiente enlace para activar tu cuenta:</p>
+    <a href="{FRONTEND_URL}/activar/?token={token}">Activar cuenta</a>
+    """
+    return f"{nombre}, activa tu cuenta en CodePyHub", cuerpo
+
+
+class BrevoClient:
+    """
+    Cliente de Brevo compartido por todo el proceso.
+
+    `ApiClient` se crea una sola vez y su `PoolManager` de urllib3 reutiliza las
+    conexiones HTTPS entre envíos; es seguro usarlo desde varios hilos a la vez.
+    Sin `configuration` se usa la de las variables de entorno, creada al
+    primer envío.
+    """
+
+    def __init__(
+        self,
+        configuration: Optional["sib_api_v3_sdk.Configuration"] = None,
+        tamano_lote: int = BREVO_BATCH_SIZE
+    ):
+        self.configuration = configuration
+        self.tamano_lote = tamano_lote
+        self._api: Optional["sib_api_v3_sdk.TransactionalEmailsApi"] = None
+        self._lock = threading.Lock()
 
+    @property
+    def api(self) -> "sib_api_v3_sdk.TransactionalEmailsApi":
+        if self._api is None:
+            with self._lock:
+                if self._api is None:
+                    sdk = _sdk()
+                    if self.configuration is None:
+                        self.configuration = configuracion_brevo()
+                    self._api = sdk.TransactionalEmailsApi(sdk.ApiClient(self.configuration))
+        return self._api
+
+    def _remitente(self) -> dict:
+        return {"email": EMAIL_SENDER, "name": EMAIL_SENDER_NAME}
+
+    def enviar(self, email: str, asunto: str, cuerpo: str):
+        sdk = _sdk()
+        email_obj = sdk.SendSmtpEmail(
+            to = [{"email": email}],
+            sender = self._remitente(),
+            subject = asunto,
+            html_content = cuerpo
+        )
+        try:
+            respuesta = self.api.send_transac_email(email_obj)
+            logger.info(f"Correo enviado correctamente a {email} ({respuesta.message_id}).")
+        except sdk.rest.ApiException as e:
+            logger.error(f"Error al enviar correo: {e}")
+            raise RuntimeError("No se pudo enviar el correo con Brevo.")
+
+    async def enviar_async(self, email: str, asunto: str, cuerpo: str):
+        await asyncio.to_thread(self.enviar, email, asunto, cuerpo)
+
+    def enviar_lote(self, asunto: str, cuerpo: str, destinatarios: Iterable[tuple[str, Optional[dict]]]) -> int:
+        """
+        Envía el mismo correo a muchos destinatarios agrupándolos en `message_versions`.
+
+        El cuerpo se personaliza con los `params` de cada destinatario
+        (`{{ params.nombre }}` en el HTML). Devuelve el número de peticiones hechas.
+        """
+        sdk = _sdk()
+        versiones = [
+            sdk.SendSmtpEmailMessageVersions(to=[{"email": email}], params=params or None)
+            for email, params in destinatarios
+        ]
+        peticiones = 0
+        for inicio in range(0, len(versiones), self.tamano_lote):
+            email_obj = sdk.SendSmtpEmail(
+                sender = self._remitente(),
+                subject = asunto,
+                html_content = cuerpo,
+                message_versions = versiones[inicio:inicio + self.tamano_lote]
+            )
+            try:
+                self.api.send_transac_email(email_obj)
+            except sdk.rest.ApiException as e:
+                logger.error(f"Error al enviar el lote {peticiones + 1}: {e}")
+                raise RuntimeError("No se pudo enviar el lote de correos con Brevo.")
+            peticiones += 1
+        logger.info(f"{len(versiones)} correos enviados en {peticiones} peticiones a Brevo.")
+        return peticiones
+
+    async def enviar_lote_async(self, asunto: str, cuerpo: str, destinatarios: Iterable[tuple[str, Optional[dict]]]) -> int:
+        return await asyncio.to_thread(self.enviar_lote, asunto, cuerpo, list(destinatarios))
+
+
+brevo_client = BrevoClient()
 
 
 def enviar_email_activacion(email: str, asunto: str, cuerpo: str):
-    api_instance = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuration))
-    
-    email_obj = sib_api_v3_sdk.SendSmtpEmail(
-        to=[{"email": email}],
-        sender = {"email": EMAIL_SENDER, "name": EMAIL_SENDER_NAME},
-        subject = asunto,
-        html_content = cuerpo
-    )
-
-    try:
-        enlaces = re.findall(r'href="([^"]+)"', cuerpo)
-        if enlaces:
-            logger.info(f"Enlace de activación: {enlaces[0]}")
-        else:
-            logger.warning("No se encontró enlace de activación en el cuerpo del email.")
-
-        api_instance.send_transac_email(email_obj)
-        logger.info("Correo enviado correctamente.")
-    except ApiException as e:
-        logger.error(f"Error al enviar correo: {e}")
-        raise RuntimeError("No se pudo enviar el correo con Brevo.")
\ No newline at end of file
+    brevo_client.enviar(email, asunto, cuerpo)
+
+
+async def enviar_email_activacion_async(email: str, asunto: str, cuerpo: str):
+    await brevo_client.enviar_async(email, asunto, cuerpo)
@@ -1,31 +1,67 @@
-import bcrypt
-import os
-from uuid import uuid4
+from sqlalchemy import select
+from sqlalchemy.orm import Session
 from app.db.models.models import Usuario
-from dotenv import load_dotenv
+from app.security.hashing import keyed_digest
+from app.entorno import cargar_entorno
 from datetime import datetime, timedelta
+import secrets
+import os
+
+
+cargar_entorno()
+
+EXPIRATION_HOURS = int(os.getenv("EXPIRATION_HOURS", "1"))
+
+PROPOSITO_ACTIVACION = "activacion"
+
+
+def crear_token(proposito: str = PROPOSITO_ACTIVACION, horas: int = EXPIRATION_HOURS):
+    """
+    Genera un token de un solo uso.
+
+    Devuelve el token para el enlace, el digest HMAC que se guarda en la base
+    (columna indexada) y la expiración.
+    """
+    token = secrets.token_urlsafe(32)
+    expiracion = datetime.now() + timedelta(hours=horas)
+    return token, keyed_digest(token, proposito), expiracion
 
 
-load_dotenv()
+def buscar_por_token(
+    db: Session,
+    token: str,
+    columna_token,
+    columna_expiracion,
+    proposito: str
+):
+    """
+    Resuelve la fila dueña de un token de un solo uso con una consulta por digest.
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-EXPIRATION_HOURS = int(os.getenv("EXPIRATION_HOURS"))
+    Sirve para cualquier par de columnas token/expiración (activación,
+    restablecimiento de contraseña, ...). Lanza ValueError si no existe o expiró.
+    Con una AsyncSession se llama a través de `en_sesion`.
+    """
+    if not token:
+        raise ValueError("Token no configurado")
 
+    modelo = columna_token.class_
+    fila = db.execute(
+        select(modelo).where(columna_token == keyed_digest(token, proposito))
+    ).scalars().first()
+    if not fila:
+        raise ValueError("Token inválido")
 
-def crear_token(email: str):
-    token = uuid4().hex + email
-    hashed_token = bcrypt.hashpw(token.encode(), bcrypt.gensalt())    
-    expiracion = datetime.now() + timedelta(hours=1)    
-    expiracion_str = expiracion.isoformat()    
-    return token, hashed_token.decode(), expiracion_str 
+    expiracion = getattr(fila, columna_expiracion.key)
+    if not expiracion or datetime.now() > expiracion:
+        raise ValueError("Token expirado")
+    return fila
 
 
-def verificar_token(token: str, usuario: Usuario):
-    if not usuario:
-        raise ValueError("Usuario no existe")    
-    if not usuario.email_verification_token:
-        raise ValueError("Token no configurado")    
-    if datetime.now() > usuario.email_verification_expiration:
-        raise ValueError("Token expirado")    
-    if not bcrypt.checkpw(token.encode(), usuario.email_verification_token.encode()):
-        raise ValueError("Token inválido")  
\ No newline at end of file
+def buscar_usuario_por_token_activacion(db: Session, token: str) -> Usuario:
+    return buscar_por_token(
+        db,
+        token,
+        Usuario.email_verification_token,
+        Usuario.email_verification_expiration,
+        PROPOSITO_ACTIVACION
+    )
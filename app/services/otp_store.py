@@ -0,0 +1,157 @@
+"""
+Almacén de códigos OTP con expiración.
+
+Un OTP vive 10 minutos y se usa una vez, así que no necesita la tabla `otps`:
+los backends de memoria y Redis guardan solo el HMAC del código con TTL y lo
+consumen con un get-and-delete atómico seguido de una comparación en tiempo
+constante. Un intento con el código equivocado también lo consume; el
+usuario pide otro volviendo a hacer login. La tabla queda como backend de
+respaldo (`db://`).
+"""
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func
+from app.entorno import cargar_entorno
+from app.db.config import settings
+from app.db.database import SessionLocal
+from app.db.models.models import OTP, Usuario
+from app.security.cache import TTLCache
+from app.security.hashing import keyed_digest
+import threading
+import secrets
+import asyncio
+import logging
+import hmac
+import os
+
+
+logger = logging.getLogger(__name__)
+
+
+cargar_entorno()
+
+OTP_EXPIRATION = int(os.getenv("OTP_EXPIRATION", "10"))
+# Con un solo worker basta la memoria del proceso; con varios, login y
+# verify_otp pueden caer en procesos distintos y hace falta un almacén común
+OTP_STORAGE_URI = os.getenv("OTP_STORAGE_URI", "memory://" if settings.WORKERS <= 1 else "db://")
+
+
+def generar_codigo() -> str:
+    return str(secrets.randbelow(900000) + 100000)
+
+
+def _clave(email: str) -> str:
+    return email.strip().lower()
+
+
+def _huella(email: str, codigo: str) -> str:
+    return keyed_digest(codigo, f"otp:{_clave(email)}")
+
+
+class OTPStore(ABC):
+    ttl = OTP_EXPIRATION * 60
+
+    async def emitir(self, email: str) -> str:
+        """Genera un código nuevo para `email` (sustituye al anterior) y lo devuelve"""
+        codigo = generar_codigo()
+        await self.guardar(email, codigo)
+        return codigo
+
+    @abstractmethod
+    async def guardar(self, email: str, codigo: str):
+        ...
+
+    @abstractmethod
+    async def consumir(self, email: str, codigo: str) -> bool:
+        ...
+
+
+class MemoryOTPStore(OTPStore):
+    def __init__(self, max_codigos: int = 100_000):
+        self._codigos = TTLCache(max_codigos, self.ttl)
+        self._lock = threading.Lock()
+
+    async def guardar(self, email: str, codigo: str):
+        self._codigos.set(_clave(email), _huella(email, codigo))
+
+    async def consumir(self, email: str, codigo: str) -> bool:
+        with self._lock:
+            guardada = self._codigos.get(_clave(email))
+            if guardada is not None:
+                self._codigos.invalidate(_clave(email))
+        return guardada is not None and hmac.compare_digest(guardada, _huella(email, codigo))
+
+
+class RedisOTPStore(OTPStore):
+    def __init__(self, cliente, prefijo: str = "otp"):
+        self.cliente = cliente
+        self.prefijo = prefijo
+
+    @classmethod
+    def desde_url(cls, url: str):
+        from redis.asyncio import Redis
+        return cls(Redis.from_url(url, decode_responses=True))
+
+    async def guardar(self, email: str, codigo: str):
+        await self.cliente.set(f"{self.prefijo}:{_clave(email)}", _huella(email, codigo), ex=self.ttl)
+
+    async def consumir(self, email: str, codigo: str) -> bool:
+        guardada = await self.cliente.getdel(f"{self.prefijo}:{_clave(email)}")
+        if isinstance(guardada, bytes):
+            guardada = guardada.decode()
+        return guardada is not None and hmac.compare_digest(guardada, _huella(email, codigo))
+
+
+class DatabaseOTPStore(OTPStore):
+    """Respaldo sobre la tabla `otps` con sesiones propias en un hilo"""
+
+    def __init__(self, session_factory = SessionLocal):
+        self.session_factory = session_factory
+
+    async def guardar(self, email: str, codigo: str):
+        await asyncio.to_thread(self._guardar, email, codigo)
+
+    async def consumir(self, email: str, codigo: str) -> bool:
+        return await asyncio.to_thread(self._consumir, email, codigo)
+
+    def _guardar(self, email: str, codigo: str):
+        with self.session_factory() as db:
+            user_id = db.scalar(select(Usuario.id).where(func.lower(Usuario.email) == _clave(email)))
+            if user_id is None:
+                raise ValueError("Usuario no encontrado")
+            db.execute(delete(OTP).where(OTP.user_id == user_id))
+            db.add(OTP(user_id=user_id, code=codigo, expiration=datetime.now() + timedelta(seconds=self.ttl)))
+            db.commit()
+
+    def _consumir(self, email: str, codigo: str) -> bool:
+        with self.session_factory() as db:
+            otp = db.execute(
+                select(OTP)
+                .join(Usuario, Usuario.id == OTP.user_id)
+                .where(func.lower(Usuario.email) == _clave(email))
+                .with_for_update(of=OTP)
+            ).scalars().first()
+            if otp is None:
+                return False
+            db.delete(otp)
+            db.commit()
+            return (
+                not otp.is_used
+                and otp.expiration > datetime.now()
+                and hmac.compare_digest(otp.code.encode(), codigo.encode())
+            )
+
+
+def crear_otp_store(uri: str) -> OTPStore:
+    if uri.startswith(("redis://", "rediss://", "unix://")):
+        return RedisOTPStore.desde_url(uri)
+    if uri.startswith("db://"):
+        return DatabaseOTPStore()
+    if uri.startswith("memory://"):
+        if settings.WORKERS > 1:
+            logger.warning("OTP_STORAGE_URI=memory:// con varios workers: verify_otp puede no ver el código")
+        return MemoryOTPStore()
+    raise ValueError(f"OTP_STORAGE_URI no soportado: {uri}")
+
+
+otp_store = crear_otp_store(OTP_STORAGE_URI)
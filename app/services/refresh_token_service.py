@@ -0,0 +1,106 @@
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime, timedelta
+from typing import Optional, Union
+from app.entorno import cargar_entorno
+from app.db.database import resolver
+from app.db.models.models import RefreshToken, Usuario
+from app.enums import AccountStatus
+from app.security.hashing import keyed_digest
+from app.security.exceptions import TokenValidationError
+import secrets
+import logging
+import os
+
+
+cargar_entorno()
+
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+
+PROPOSITO = "refresh"
+
+
+logger = logging.getLogger(__name__)
+
+
+async def emitir_refresh_token(
+    db: Union[Session, AsyncSession],
+    user_id: int,
+    family_id: Optional[str] = None
+) -> str:
+    """Crea un refresh token; solo se guarda su digest HMAC"""
+    token = secrets.token_urlsafe(32)
+    db.add(RefreshToken(
+        user_id = user_id,
+        token_digest = keyed_digest(token, PROPOSITO),
+        family_id = family_id or secrets.token_hex(16),
+        expires_at = datetime.now() + timedelta(days = REFRESH_TOKEN_EXPIRE_DAYS)
+    ))
+    await resolver(db.commit())
+    return token
+
+
+async def _revocar_familia(db: Union[Session, AsyncSession], family_id: str):
+    await resolver(db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at = datetime.now())
+    ))
+    await resolver(db.commit())
+
+
+def revocar_tokens_usuario(db: Session, user_id: int) -> int:
+    """
+    Revoca todos los refresh tokens vivos del usuario (cambio de contraseña).
+    No hace commit: va en la misma transacción que el cambio.
+    """
+    resultado = db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at = datetime.now())
+    )
+    return resultado.rowcount
+
+
+async def rotar_refresh_token(db: Union[Session, AsyncSession], token: str) -> tuple[Usuario, str]:
+    """
+    Consume un refresh token y emite el siguiente de la misma familia.
+
+    Presentar un token ya usado se considera robo: se revoca toda la familia.
+    """
+    resultado = await resolver(db.execute(
+        select(RefreshToken, Usuario)
+        .join(Usuario, RefreshToken.user_id == Usuario.id)
+        .where(RefreshToken.token_digest == keyed_digest(token, PROPOSITO))
+    ))
+    fila = resultado.first()
+    if not fila:
+        raise TokenValidationError("Refresh token inválido")
+
+    registro, usuario = fila
+    ahora = datetime.now()
+
+    if registro.revoked_at is not None or registro.expires_at <= ahora:
+        raise TokenValidationError("Refresh token expirado o revocado")
+
+    if registro.used_at is not None:
+        logger.warning(f"Reutilización de refresh token detectada para {usuario.email}; se revoca la sesión")
+        await _revocar_familia(db, registro.family_id)
+        raise TokenValidationError("Refresh token reutilizado")
+
+    if usuario.account_status != AccountStatus.active:
+        raise TokenValidationError("Cuenta inactiva")
+
+    # Marcado condicional: si otra petición lo consumió primero también es reutilización
+    marcado = await resolver(db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == registro.id, RefreshToken.used_at.is_(None))
+        .values(used_at = ahora)
+    ))
+    if marcado.rowcount != 1:
+        await _revocar_familia(db, registro.family_id)
+        raise TokenValidationError("Refresh token reutilizado")
+
+    nuevo_token = await emitir_refresh_token(db, usuario.id, registro.family_id)
+    return usuario, nuevo_token
@@ -0,0 +1,150 @@
+from email.message import Message
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+import asyncio
+import logging
+import time
+
+if TYPE_CHECKING:
+    import aiosmtplib
+
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def errores_conexion() -> tuple:
+    """Errores tras los que la conexión ya no sirve y merece la pena reconectar una vez"""
+    # aiosmtplib se importa con el primer envío, no al arrancar el worker
+    import aiosmtplib
+    return (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPTimeoutError, ConnectionError)
+
+
+class SMTPPool:
+    """
+    Conexiones SMTP autenticadas y reutilizables contra un servidor.
+
+    El semáforo limita los envíos simultáneos (y por tanto las conexiones)
+    contra el servidor; las conexiones libres se reutilizan en orden LIFO y se
+    cierran cuando llevan más de `idle` segundos sin uso. Si una conexión
+    reutilizada resulta estar caída se reintenta una vez con una nueva.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        usuario: Optional[str] = None,
+        password: Optional[str] = None,
+        use_tls: bool = True,
+        start_tls: bool = False,
+        tamano: int = 4,
+        idle: float = 60,
+        timeout: float = 10
+    ):
+        self.host = host
+        self.port = port
+        self.usuario = usuario
+        self.password = password
+        self.use_tls = use_tls
+        self.start_tls = start_tls
+        self.tamano = tamano
+        self.idle = idle
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._libres: list[tuple["aiosmtplib.SMTP", float]] = []
+        self._conexiones = 0
+        self._reutilizadas = 0
+        self._reconexiones = 0
+        self._enviados = 0
+
+    def _preparar(self):
+        # Las conexiones y el semáforo pertenecen al event loop que los creó
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            for cliente, _ in self._libres:
+                _cerrar_sin_esperar(cliente)
+            self._loop = loop
+            self._libres = []
+            self._semaforo = asyncio.Semaphore(self.tamano)
+
+    async def _conectar(self) -> "aiosmtplib.SMTP":
+        import aiosmtplib
+
+        cliente = aiosmtplib.SMTP(
+            hostname=self.host,
+            port=self.port,
+            use_tls=self.use_tls,
+            start_tls=self.start_tls,
+            timeout=self.timeout
+        )
+        await cliente.connect()
+        if self.usuario:
+            await cliente.login(self.usuario, self.password)
+        self._conexiones += 1
+        logger.info(f"Nueva conexión SMTP autenticada con {self.host}:{self.port}")
+        return cliente
+
+    async def _tomar(self) -> "aiosmtplib.SMTP":
+        ahora = time.monotonic()
+        while self._libres:
+            cliente, desde = self._libres.pop()
+            if cliente.is_connected and ahora - desde < self.idle:
+                self._reutilizadas += 1
+                return cliente
+            await _cerrar(cliente)
+        return await self._conectar()
+
+    async def enviar(self, mensaje: Message):
+        self._preparar()
+        async with self._semaforo:
+            for intento in (1, 2):
+                cliente = await self._tomar()
+                try:
+                    await cliente.send_message(mensaje)
+                except errores_conexion():
+                    _cerrar_sin_esperar(cliente)
+                    if intento == 2:
+                        raise
+                    self._reconexiones += 1
+                    logger.warning(f"Conexión SMTP con {self.host} caída, reconectando")
+                    continue
+                except Exception:
+                    await _cerrar(cliente)
+                    raise
+
+                self._libres.append((cliente, time.monotonic()))
+                self._enviados += 1
+                return
+
+    async def cerrar(self):
+        libres, self._libres = self._libres, []
+        for cliente, _ in libres:
+            await _cerrar(cliente)
+
+    def metricas(self) -> dict:
+        return {
+            "servidor": f"{self.host}:{self.port}",
+            "max_conexiones": self.tamano,
+            "libres": len(self._libres),
+            "conexiones_abiertas": self._conexiones,
+            "reutilizadas": self._reutilizadas,
+            "reconexiones": self._reconexiones,
+            "enviados": self._enviados,
+        }
+
+
+async def _cerrar(cliente: "aiosmtplib.SMTP"):
+    try:
+        if cliente.is_connected:
+            await cliente.quit()
+    except Exception:
+        _cerrar_sin_esperar(cliente)
+
+
+def _cerrar_sin_esperar(cliente: "aiosmtplib.SMTP"):
+    try:
+        cliente.close()
+    except Exception:
+        pass
@@ -0,0 +1,21 @@
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional, Union
+from app.db.database import resolver
+from app.db.models.models import Usuario
+
+
+def get_usuario_por_email(db: Session, email: str) -> Optional[Usuario]:
+    return db.execute(select(Usuario).where(Usuario.email == email)).scalars().first()
+
+
+async def get_usuario_por_email_async(db: AsyncSession, email: str) -> Optional[Usuario]:
+    resultado = await db.execute(select(Usuario).where(Usuario.email == email))
+    return resultado.scalars().first()
+
+
+async def buscar_usuario_por_email(db: Union[Session, AsyncSession], email: str) -> Optional[Usuario]:
+    """Búsqueda por email válida tanto para la sesión sync como para la async"""
+    resultado = await resolver(db.execute(select(Usuario).where(Usuario.email == email)))
+    return resultado.scalars().first()
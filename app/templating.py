@@ -0,0 +1,95 @@
+"""
+Entorno de plantillas compartido por todas las rutas.
+
+Un único `Jinja2Templates` (`obtener_templates()`) con caché de bytecode en
+disco: cada plantilla se compila una vez por worker y los workers siguientes
+(o el siguiente arranque) cargan el código ya compilado. `precompilar()` se
+lanza en segundo plano al arrancar para no pagar la compilación en la
+primera petición sin retrasar el arranque.
+
+Las páginas que no dependen de la petición (sin sesión, sin formulario con
+errores) se sirven con `pagina_estatica`, que renderiza una vez y reutiliza
+los bytes. Con `ENV=development` las plantillas se recargan al cambiar y no
+se guarda ningún render.
+"""
+from typing import TYPE_CHECKING
+from functools import lru_cache
+from fastapi.responses import HTMLResponse
+from app.entorno import cargar_entorno
+from app.estaticos import static_url
+import logging
+import time
+import os
+
+if TYPE_CHECKING:
+    from fastapi.templating import Jinja2Templates
+    from jinja2 import Environment
+
+
+logger = logging.getLogger(__name__)
+
+
+cargar_entorno()
+
+TEMPLATES_DIR = os.getenv("TEMPLATES_DIR", "frontend/templates")
+# Sin valor, Jinja usa un directorio privado del usuario en /tmp
+TEMPLATES_CACHE_DIR = os.getenv("TEMPLATES_CACHE_DIR") or None
+TEMPLATES_AUTO_RELOAD = os.getenv("ENV") == "development"
+
+
+@lru_cache(maxsize=None)
+def entorno() -> "Environment":
+    """
+    El entorno se crea con la primera plantilla que se pide: jinja2 no se
+    importa mientras el worker arranca.
+    """
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader, select_autoescape
+
+    if TEMPLATES_CACHE_DIR:
+        os.makedirs(TEMPLATES_CACHE_DIR, exist_ok=True)
+    env = Environment(
+        loader=FileSystemLoader(TEMPLATES_DIR),
+        autoescape=select_autoescape(["html", "htm", "xml"]),
+        bytecode_cache=FileSystemBytecodeCache(TEMPLATES_CACHE_DIR),
+        auto_reload=TEMPLATES_AUTO_RELOAD,
+        # Todas las plantillas caben en la caché: ninguna se compila dos veces
+        cache_size=-1
+    )
+    env.globals["static_url"] = static_url
+    return env
+
+
+@lru_cache(maxsize=None)
+def obtener_templates() -> "Jinja2Templates":
+    from fastapi.templating import Jinja2Templates
+
+    return Jinja2Templates(env=entorno())
+
+
+_paginas: dict[tuple, bytes] = {}
+
+
+def precompilar() -> int:
+    """Compila todas las plantillas en el entorno compartido; devuelve cuántas"""
+    inicio = time.perf_counter()
+    env = entorno()
+    nombres = env.list_templates(extensions=["html", "htm"])
+    for nombre in nombres:
+        env.get_template(nombre)
+    logger.info(f"{len(nombres)} plantillas precompiladas en {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    return len(nombres)
+
+
+def pagina_estatica(nombre: str, **contexto) -> HTMLResponse:
+    """
+    Respuesta con el HTML ya renderizado de `nombre`. Solo para plantillas
+    que no usan `request`: el render se hace sin él y se comparte entre
+    peticiones. Cada combinación de `contexto` se guarda por separado.
+    """
+    clave = (nombre, tuple(sorted(contexto.items())))
+    contenido = _paginas.get(clave)
+    if contenido is None:
+        contenido = entorno().get_template(nombre).render(contexto).encode("utf-8")
+        if not TEMPLATES_AUTO_RELOAD:
+            _paginas[clave] = contenido
+    return HTMLResponse(contenido)
@@ -1,12 +1,14 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Request
-from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from app.db.database import get_db
+from app.db.database import get_db_para, resolver
 from app.db.models.models import Usuario
 from app.users.schemas import UsuarioUpdate
 from app.security.schemas import UsuarioOut
-from app.security.jwt import get_current_verified_user
-from dotenv import load_dotenv
+from app.security.jwt import get_current_verified_user_para
+from app.security.principal_cache import Principal, invalidar_principal
+from app.serializacion import respuesta_modelo, usuario_out
+from app.templating import pagina_estatica
+from app.entorno import cargar_entorno
 import logging
 import os
 from fastapi.responses import HTMLResponse
@@ -18,10 +20,9 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-templates = Jinja2Templates(directory="frontend/templates")
 
 
-load_dotenv()
+cargar_entorno()
 
 PORT = os.getenv("PORT")
 
@@ -29,21 +30,27 @@ PORT = os.getenv("PORT")
 
 @router.get("/users/dashboard/", response_class=HTMLResponse)
 async def dashboard(request: Request):
-        return templates.TemplateResponse("/users/dashboard.html", {"request": request}) 
+        return pagina_estatica("users/dashboard.html")
     
 
 
 @router.post("/users/consulta_datos/", response_model=UsuarioOut)
-async def read_users_me(current_user: Usuario = Depends(get_current_verified_user)):
+async def read_users_me(
+    db: Session = Depends(get_db_para("read_users_me")),
+    current_user: Principal = Depends(get_current_verified_user_para("read_users_me"))
+):
     logger.info(f"Consulta de datos del usuario autenticado: {current_user.email}")
-    return current_user
+    usuario = await resolver(db.get(Usuario, current_user.id))
+    if not usuario:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
+    return respuesta_modelo(usuario_out, usuario)
 
 
 @router.put("/users/actualizar_datos/", response_model=UsuarioOut)
 async def update_user_profile(
     user_update: UsuarioUpdate,
-    db: Session = Depends(get_db),
-    current_user: Usuario = Depends(get_current_verified_user)
+    db: Session = Depends(get_db_para("update_user_profile")),
+    current_user: Principal = Depends(get_current_verified_user_para("update_user_profile"))
 ):
     update_data = user_update.model_dump(exclude_unset=True)  
     
@@ -54,9 +61,13 @@ async def update_user_profile(
             detail = "No se enviaron datos para actualizar el perfil"
         )
 
+    usuario = await resolver(db.get(Usuario, current_user.id))
+    if not usuario:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Usuario no encontrado")
+
     for key, value in update_data.items():
-        if hasattr(current_user, key): 
-            setattr(current_user, key, value)
+        if hasattr(usuario, key): 
+            setattr(usuario, key, value)
         else:
             logger.warning(f"Campo desconocido: {key}")  
             raise HTTPException(
@@ -64,11 +75,10 @@ async def update_user_profile(
                 detail = f"Campo no válido: {key}"
             )
 
-    db.commit()
-    db.refresh(current_user)
-
-    response_data = UsuarioOut.model_validate(current_user)
+    await resolver(db.commit())
+    await resolver(db.refresh(usuario))
+    invalidar_principal(usuario.email)
 
-    logger.info(f"Usuario {current_user.email} actualizó su perfil con los campos: {list(update_data.keys())}")
+    logger.info(f"Usuario {usuario.email} actualizó su perfil con los campos: {list(update_data.keys())}")
 
-    return response_data
\ No newline at end of file
+    return respuesta_modelo(usuario_out, usuario)
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+Correos/segundo contra un stand-in HTTP local de la API de Brevo.
+
+Compara el envío anterior (`ApiClient` nuevo por correo, sin reutilizar la
+conexión) con `BrevoClient` compartido (keep-alive) y con el envío en lote por
+`message_versions`. El servidor simula el coste de abrir conexión (TCP + TLS)
+con una espera al aceptarla y la latencia de la API con otra por petición.
+
+    python -m benchmarks.bench_brevo --correos 300 --concurrencia 8 --handshake-ms 30 --latencia-ms 5
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+import sib_api_v3_sdk
+import threading
+import socket
+import argparse
+import json
+import time
+import os
+
+os.environ.setdefault("EMAIL_SENDER", "erp@example.com")
+from app.services.email_service_activation import BrevoClient
+
+
+def servidor_brevo_local(handshake_ms: float, latencia_ms: float):
+    contadores = {"conexiones": 0, "peticiones": 0, "correos": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def handle(self):
+            with lock:
+                contadores["conexiones"] += 1
+            # Sin esto Nagle + ACK retardado añaden ~40 ms a cada respuesta keep-alive
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            time.sleep(handshake_ms / 1000)
+            super().handle()
+
+        def do_POST(self):
+            datos = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(latencia_ms / 1000)
+            with lock:
+                contadores["peticiones"] += 1
+                contadores["correos"] += len(datos.get("messageVersions") or [None])
+            cuerpo = b'{"messageId": "<local@stand-in>"}'
+            self.send_response(201)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(cuerpo)))
+            self.end_headers()
+            self.wfile.write(cuerpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor, contadores
+
+
+def _configuracion(puerto: int, concurrencia: int) -> sib_api_v3_sdk.Configuration:
+    configuracion = sib_api_v3_sdk.Configuration()
+    configuracion.host = f"http://127.0.0.1:{puerto}/v3"
+    configuracion.api_key["api-key"] = "local"
+    configuracion.connection_pool_maxsize = concurrencia
+    return configuracion
+
+
+def _cuerpo(n: int) -> str:
+    return f'<p>Hola, activa tu cuenta: <a href="http://localhost/activar/?token={n}">Activar</a></p>'
+
+
+def _medir(correos: int, concurrencia: int, enviar) -> float:
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(concurrencia) as pool:
+        list(pool.map(enviar, range(correos)))
+    return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--correos", type=int, default=300)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--handshake-ms", type=float, default=30, help="coste simulado de TCP + TLS por conexión")
+    parser.add_argument("--latencia-ms", type=float, default=5, help="latencia simulada de la API por petición")
+    args = parser.parse_args()
+
+    servidor, contadores = servidor_brevo_local(args.handshake_ms, args.latencia_ms)
+    configuracion = _configuracion(servidor.server_address[1], args.concurrencia)
+    resultados = []
+
+    def por_correo(n):
+        # Así enviaba antes enviar_email_activacion: un ApiClient (y pool HTTP) por correo
+        api = sib_api_v3_sdk.TransactionalEmailsApi(sib_api_v3_sdk.ApiClient(configuracion))
+        api.send_transac_email(sib_api_v3_sdk.SendSmtpEmail(
+            to=[{"email": f"u{n}@example.com"}], sender={"email": "erp@example.com"},
+            subject="Activa tu cuenta", html_content=_cuerpo(n)
+        ))
+
+    compartido = BrevoClient(configuracion)
+
+    def con_cliente_compartido(n):
+        compartido.enviar(f"u{n}@example.com", "Activa tu cuenta", _cuerpo(n))
+
+    for nombre, enviar in (("ApiClient por correo", por_correo), ("BrevoClient compartido", con_cliente_compartido)):
+        antes = dict(contadores)
+        duracion = _medir(args.correos, args.concurrencia, enviar)
+        resultados.append((nombre, args.correos / duracion, contadores["conexiones"] - antes["conexiones"], contadores["peticiones"] - antes["peticiones"]))
+
+    antes = dict(contadores)
+    lote = BrevoClient(configuracion, tamano_lote=100)
+    inicio = time.perf_counter()
+    lote.enviar_lote(
+        "Aviso", "<p>Hola {{ params.nombre }}</p>",
+        [(f"u{n}@example.com", {"nombre": f"u{n}"}) for n in range(args.correos)]
+    )
+    duracion = time.perf_counter() - inicio
+    resultados.append(("enviar_lote (100/petición)", args.correos / duracion, contadores["conexiones"] - antes["conexiones"], contadores["peticiones"] - antes["peticiones"]))
+    servidor.shutdown()
+
+    print(f"{'modo':<28}{'correos/s':>11}{'conexiones':>12}{'peticiones':>12}")
+    for nombre, por_segundo, conexiones, peticiones in resultados:
+        print(f"{nombre:<28}{por_segundo:>11.1f}{conexiones:>12}{peticiones:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Memoria y tiempo de exportar la base de usuarios completa.
+
+Genera usuarios sintéticos en una base propia (SQLite temporal por defecto o
+la que se pase con --url, que debe estar vacía) y compara la exportación en
+streaming de `app.admin.exportacion` con lo que hacían los admins antes:
+cargar `lista_usuarios` entero (objetos ORM + `UsersSchema`) y serializarlo.
+El pico de memoria se mide con tracemalloc. El modo anterior se ejecuta sobre
+las primeras --filas-anterior filas, porque con un millón no cabe en memoria
+en máquinas modestas.
+
+    python -m benchmarks.bench_export --filas 1000000 --filas-anterior 100000
+"""
+from datetime import date, datetime, timedelta
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import sessionmaker
+import tracemalloc
+import tempfile
+import argparse
+import random
+import time
+import os
+
+from app.db.database import Base
+from app.db.models.models import Usuario
+from app.admin.exportacion import exportar_usuarios
+from app.admin.filtros import CAMPOS_USUARIO, FiltroUsuarios, consulta_exportacion
+from app.admin.schemas import UsersSchema
+from app.enums import AccountStatus, Role
+
+
+def poblar(engine, filas: int, lote: int = 50_000):
+    inicio = datetime(2020, 1, 1)
+    estados, roles = list(AccountStatus), list(Role)
+    with engine.begin() as conn:
+        for desde in range(0, filas, lote):
+            conn.execute(insert(Usuario), [
+                {
+                    "email": f"usuario{n}@example.com",
+                    "password_hash": "x" * 60,
+                    "first_name": f"Nombre{n}",
+                    "last_name": "Apellido Sintético",
+                    "date_of_birth": date(1970, 1, 1) + timedelta(days=n % 15000),
+                    "shipping_city": "Madrid",
+                    "shipping_country": "España",
+                    "account_status": random.choice(estados),
+                    "role": random.choice(roles),
+                    "created_at": inicio + timedelta(seconds=n),
+                    "is_email_verified": n % 3 == 0,
+                }
+                for n in range(desde, min(desde + lote, filas))
+            ])
+
+
+def _medir(funcion) -> tuple[float, int, int]:
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    enviados = funcion()
+    duracion = time.perf_counter() - inicio
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duracion, pico, enviados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--filas-anterior", type=int, default=100_000, help="filas para el modo anterior (0 lo omite)")
+    parser.add_argument("--url", help="base de datos vacía donde generar los usuarios (por defecto SQLite temporal)")
+    args = parser.parse_args()
+
+    directorio = tempfile.TemporaryDirectory()
+    engine = create_engine(args.url or f"sqlite:///{os.path.join(directorio.name, 'export.db')}")
+    Base.metadata.create_all(engine)
+    fabrica = sessionmaker(bind=engine)
+
+    inicio = time.perf_counter()
+    poblar(engine, args.filas)
+    print(f"{args.filas} usuarios generados en {time.perf_counter() - inicio:.1f} s")
+
+    campos = list(CAMPOS_USUARIO)
+    resultados = []
+
+    for formato in ("csv", "ndjson"):
+        def streaming():
+            return sum(len(trozo) for trozo in exportar_usuarios(
+                fabrica(), consulta_exportacion(campos, FiltroUsuarios()), campos, formato
+            ))
+        resultados.append((f"streaming {formato}", args.filas, *_medir(streaming)))
+
+    if args.filas_anterior:
+        def anterior():
+            # lista_usuarios antes de la paginación: todo el ORM y todos los esquemas a la vez
+            with fabrica() as db:
+                usuarios = db.scalars(select(Usuario).order_by(Usuario.id).limit(args.filas_anterior)).all()
+                esquemas = [UsersSchema.model_validate(u) for u in usuarios]
+                return sum(len(e.model_dump_json()) for e in esquemas)
+        resultados.append(("lista_usuarios anterior", args.filas_anterior, *_medir(anterior)))
+
+    engine.dispose()
+    directorio.cleanup()
+
+    print(f"{'modo':<26}{'filas':>10}{'filas/s':>12}{'pico MiB':>11}{'MiB enviados':>14}")
+    for nombre, filas, duracion, pico, enviados in resultados:
+        print(f"{nombre:<26}{filas:>10}{filas / duracion:>12.0f}{pico / 2**20:>11.1f}{enviados / 2**20:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Coste por fila de serializar respuestas de usuarios a JSON.
+
+Compara, para 1, 100 y 10.000 usuarios:
+
+- Antes: `response_model=List[UsersSchema]` con `email: EmailStr` sobre objetos
+  ORM (`serialize_response` valida, vuelca a dicts y `JSONResponse` usa
+  json.dumps), como hacía `lista_usuarios` antes de paginar.
+- FastAPI por defecto con el esquema actual (email sin revalidar).
+- TypeAdapter precompilado: `respuesta_modelo` valida los mismos objetos ORM y
+  pydantic-core escribe los bytes.
+- Filas + orjson: lo que hace ahora `lista_usuarios`, dicts de columnas
+  serializados con `ORJSONResponse`.
+
+    python -m benchmarks.bench_json --repeticiones 20
+"""
+from datetime import date, datetime
+from typing import List
+from collections import namedtuple
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import EmailStr, TypeAdapter
+import argparse
+import asyncio
+import time
+
+from app.admin.filtros import CAMPOS_USUARIO
+from app.admin.schemas import UsersSchema
+from app.db.models.models import Usuario
+from app.enums import AccountStatus, Role
+from app.serializacion import respuesta_json, respuesta_modelo
+
+
+class UsersSchemaAnterior(UsersSchema):
+    email: EmailStr
+
+
+def usuarios_sinteticos(n: int) -> list[Usuario]:
+    ahora = datetime.now()
+    return [
+        Usuario(
+            id=i, email=f"usuario{i}@example.com", password_hash="x", first_name=f"Nombre{i}",
+            last_name="Apellido", date_of_birth=date(1990, 1, 1), phone_number="600000000",
+            shipping_address="Calle Mayor 1", shipping_city="Madrid", shipping_country="España",
+            shipping_zip_code="28001", account_status=AccountStatus.active, role=Role.CLIENT,
+            two_factor_enabled=False, is_email_verified=True, created_at=ahora, updated_at=ahora
+        )
+        for i in range(n)
+    ]
+
+
+def filas_sinteticas(n: int) -> list:
+    """Las mismas columnas como las devuelve un SELECT de columnas (Row, no ORM)"""
+    Fila = namedtuple("Fila", CAMPOS_USUARIO)
+    return [Fila(**{c: getattr(u, c) for c in CAMPOS_USUARIO}) for u in usuarios_sinteticos(n)]
+
+
+def _por_fila_us(funcion, filas: int, repeticiones: int) -> float:
+    funcion()
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones / filas * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeticiones", type=int, default=20)
+    args = parser.parse_args()
+
+    campo_anterior = create_model_field(name="Response", type_=List[UsersSchemaAnterior], mode="serialization")
+    campo = create_model_field(name="Response", type_=List[UsersSchema], mode="serialization")
+    adaptador = TypeAdapter(list[UsersSchema])
+    loop = asyncio.new_event_loop()
+
+    def fastapi_por_defecto(campo):
+        def serializar(usuarios):
+            contenido = loop.run_until_complete(
+                serialize_response(field=campo, response_content=usuarios, is_coroutine=True)
+            )
+            return JSONResponse(contenido).body
+        return serializar
+
+    def filas_orjson(filas):
+        items = [{c: getattr(fila, c) for c in CAMPOS_USUARIO} for fila in filas]
+        return respuesta_json({"items": items, "next_cursor": None, "limit": len(items)}).body
+
+    modos = (
+        ("antes (EmailStr)", fastapi_por_defecto(campo_anterior), usuarios_sinteticos),
+        ("FastAPI por defecto", fastapi_por_defecto(campo), usuarios_sinteticos),
+        ("TypeAdapter + dump_json", lambda usuarios: respuesta_modelo(adaptador, usuarios).body, usuarios_sinteticos),
+        ("filas + orjson", filas_orjson, filas_sinteticas),
+    )
+
+    print(f"{'modo':<26}" + "".join(f"{f'{n} usuarios':>16}" for n in (1, 100, 10_000)) + "   (µs por fila)")
+    for nombre, funcion, datos in modos:
+        tiempos = []
+        for n in (1, 100, 10_000):
+            entrada = datos(n)
+            repeticiones = max(1, args.repeticiones * 100 // n) if n < 100 else args.repeticiones
+            tiempos.append(_por_fila_us(lambda: funcion(entrada), n, repeticiones))
+        print(f"{nombre:<26}" + "".join(f"{t:>16.2f}" for t in tiempos))
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
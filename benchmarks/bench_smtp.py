@@ -0,0 +1,131 @@
+"""
+Mensajes/segundo enviando OTPs contra un servidor SMTP local de prueba.
+
+Compara el envío anterior (smtplib en un hilo, conexión + AUTH por mensaje)
+con `SMTPPool` (conexiones autenticadas reutilizadas). El servidor simula el
+coste del handshake TLS y del AUTH con una espera al aceptar la conexión.
+
+    python -m benchmarks.bench_smtp --mensajes 200 --concurrencia 8 --handshake-ms 40
+"""
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from app.services.smtp_pool import SMTPPool
+import threading
+import argparse
+import asyncio
+import smtplib
+import time
+
+
+class ServidorSMTPLocal:
+    """Servidor SMTP mínimo en su propio hilo; acepta cualquier AUTH PLAIN"""
+
+    def __init__(self, handshake_ms: float):
+        self.handshake = handshake_ms / 1000
+        self.recibidos = 0
+        self.conexiones = 0
+        self.puerto = None
+        self._loop = asyncio.new_event_loop()
+        self._listo = threading.Event()
+
+    async def _atender(self, reader, writer):
+        self.conexiones += 1
+        await asyncio.sleep(self.handshake)
+        writer.write(b"220 localhost ESMTP stand-in\r\n")
+        while linea := await reader.readline():
+            comando = linea[:4].upper()
+            if comando == b"EHLO":
+                writer.write(b"250-localhost\r\n250-AUTH PLAIN\r\n250 8BITMIME\r\n")
+            elif comando == b"AUTH":
+                writer.write(b"235 2.7.0 Authentication successful\r\n")
+            elif comando == b"DATA":
+                writer.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+                while (await reader.readline()) not in (b".\r\n", b""):
+                    pass
+                self.recibidos += 1
+                writer.write(b"250 2.0.0 OK\r\n")
+            elif comando == b"QUIT":
+                writer.write(b"221 2.0.0 Bye\r\n")
+                await writer.drain()
+                break
+            else:
+                writer.write(b"250 OK\r\n")
+            await writer.drain()
+        writer.close()
+
+    def _ejecutar(self):
+        asyncio.set_event_loop(self._loop)
+        servidor = self._loop.run_until_complete(asyncio.start_server(self._atender, "127.0.0.1", 0))
+        self.puerto = servidor.sockets[0].getsockname()[1]
+        self._listo.set()
+        self._loop.run_forever()
+
+    def __enter__(self):
+        threading.Thread(target=self._ejecutar, daemon=True).start()
+        self._listo.wait()
+        return self
+
+    def __exit__(self, *exc):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+def _mensaje(n: int) -> MIMEMultipart:
+    mensaje = MIMEMultipart()
+    mensaje["From"] = "erp@example.com"
+    mensaje["To"] = f"usuario{n}@example.com"
+    mensaje["Subject"] = "Tu código de verificación"
+    mensaje.attach(MIMEText(f"<p>Tu código OTP es: <strong>{n:06d}</strong></p>", "html"))
+    return mensaje
+
+
+def _enviar_smtplib(puerto: int, n: int):
+    # Igual que el envío anterior, pero sin TLS porque el servidor local no lo ofrece
+    with smtplib.SMTP("127.0.0.1", puerto, timeout=10) as server:
+        server.login("erp", "secreto")
+        server.sendmail("erp@example.com", f"usuario{n}@example.com", _mensaje(n).as_string())
+
+
+async def _en_paralelo(mensajes: int, concurrencia: int, enviar) -> float:
+    semaforo = asyncio.Semaphore(concurrencia)
+
+    async def uno(n):
+        async with semaforo:
+            await enviar(n)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(uno(n) for n in range(mensajes)))
+    return time.perf_counter() - inicio
+
+
+async def medir_antes(puerto: int, mensajes: int, concurrencia: int) -> float:
+    return await _en_paralelo(mensajes, concurrencia, lambda n: asyncio.to_thread(_enviar_smtplib, puerto, n))
+
+
+async def medir_despues(puerto: int, mensajes: int, concurrencia: int) -> tuple[float, dict]:
+    pool = SMTPPool("127.0.0.1", puerto, "erp", "secreto", use_tls=False, tamano=concurrencia)
+    duracion = await _en_paralelo(mensajes, concurrencia, lambda n: pool.enviar(_mensaje(n)))
+    metricas = pool.metricas()
+    await pool.cerrar()
+    return duracion, metricas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--mensajes", type=int, default=200)
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--handshake-ms", type=float, default=40, help="coste simulado de TLS + AUTH por conexión")
+    args = parser.parse_args()
+
+    with ServidorSMTPLocal(args.handshake_ms) as servidor:
+        antes = asyncio.run(medir_antes(servidor.puerto, args.mensajes, args.concurrencia))
+        conexiones_antes = servidor.conexiones
+        despues, metricas = asyncio.run(medir_despues(servidor.puerto, args.mensajes, args.concurrencia))
+
+    print(f"{'modo':<22}{'msg/s':>10}{'conexiones':>12}")
+    print(f"{'smtplib por mensaje':<22}{args.mensajes / antes:>10.1f}{conexiones_antes:>12}")
+    print(f"{'SMTPPool':<22}{args.mensajes / despues:>10.1f}{metricas['conexiones_abiertas']:>12}")
+    print(f"mejora: x{antes / despues:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,37 @@
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse 
-from fastapi.templating import Jinja2Templates
-from fastapi.openapi.utils import get_openapi
-from contextlib import asynccontextmanager
-from app.db.database import Base, engine, check_tables_exist
-from app.security import auth
-from app.security.limiter import create_limiter
-from app.users import routes as users
-from app.admin import routes as admin
-import uvicorn
-import logging
-import os
-import asyncio
+from app.arranque import perfil_arranque
+perfil_arranque.instalar()
+
+# Si una importación falla, `__import__` vuelve a ser el original igualmente
+try:
+    from fastapi import FastAPI, Request
+    from fastapi.responses import HTMLResponse, ORJSONResponse
+    from fastapi.openapi.utils import get_openapi
+    from contextlib import asynccontextmanager
+    from app.db.database import Base, engine, async_engine, check_tables_exist, motores_db
+    from app.db.esquema import marcar_revision, revisiones_base, revisiones_codigo
+    from app.db.pool_metrics import log_pools_periodicamente
+    from app.db.query_counter import SQLCounterMiddleware
+    from app.db.sweeper import SWEEPER_ENABLED, sweeper
+    from app.estaticos import (
+        STATIC_DIR, STATIC_ROOT, STATIC_URL, ArchivoEnMemoria, StaticFilesCacheados, manifiesto
+    )
+    from app.templating import pagina_estatica, precompilar
+    from app.db.config import settings
+    from app.security import auth
+    from app.security.limiter import create_limiter
+    from app.security.hashing import hashing_executor
+    from app.services.email_outbox import outbox_dispatcher
+    from app.services.email_otp import smtp_pool
+    from app.security.lockout import auditoria_login
+    from app.users import routes as users
+    from app.admin import routes as admin
+    from app.admin.importacion import importador_usuarios
+    import uvicorn
+    import logging
+    import os
+    import asyncio
+finally:
+    perfil_arranque.fin_importaciones()
 
 
 logging.basicConfig(level=logging.INFO)
@@ -23,23 +42,45 @@ logger = logging.getLogger(__name__)
 async def lifespan(app: FastAPI):
     """Maneja el ciclo de vida de la aplicación"""
     logger.info("Inicializando aplicación...")
-    await initialize_database()
+    with perfil_arranque.fase("base de datos"):
+        await initialize_database()
+    # Las plantillas se compilan mientras el worker ya atiende peticiones
+    tareas = [asyncio.create_task(asyncio.to_thread(precompilar))]
+    if settings.DB_POOL_LOG_INTERVAL > 0:
+        tareas.append(asyncio.create_task(log_pools_periodicamente(motores_db, settings.DB_POOL_LOG_INTERVAL)))
+    with perfil_arranque.fase("tareas de fondo"):
+        await outbox_dispatcher.start()
+        await auditoria_login.start()
+        await asyncio.to_thread(importador_usuarios.recuperar_interrumpidas)
+        if SWEEPER_ENABLED:
+            await sweeper.start()
+    perfil_arranque.informe()
     yield
     logger.info("Cerrando aplicación...")
+    for tarea in tareas:
+        tarea.cancel()
+    await sweeper.stop()
+    await importador_usuarios.detener()
+    await outbox_dispatcher.stop()
+    await smtp_pool.cerrar()
+    await auditoria_login.stop()
+    await asyncio.to_thread(hashing_executor.shutdown)
+    await async_engine.dispose()
 
 
-app = FastAPI(lifespan=lifespan)
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 
 create_limiter(app)
+app.add_middleware(SQLCounterMiddleware)
 
 app.include_router(auth.router, tags=["Auth"])
 app.include_router(users.router, tags=["Users"])
 app.include_router(admin.router, tags=["Admin"])
 
 
-templates = Jinja2Templates(directory="frontend/templates")
-app.mount("/static/", StaticFiles(directory="frontend/static/"), name="static")
+app.mount(STATIC_URL, StaticFilesCacheados(directory=STATIC_ROOT, manifiesto=manifiesto), name="static")
+favicon = ArchivoEnMemoria(os.path.join(STATIC_DIR, "favicon.ico"))
 
 
 security_schemes = {
@@ -68,11 +109,25 @@ app.openapi = custom_openapi
 
 
 async def initialize_database():
-    """Inicialización asíncrona de la base de datos"""
+    """
+    Inicialización asíncrona de la base de datos. Si `alembic_version` está
+    en la cabeza de las migraciones no hace falta inspeccionar nada; solo una
+    base que nunca pasó por alembic cae en la comprobación de tablas.
+    """
     try:
-        if not await asyncio.to_thread(check_tables_exist):
+        esperadas = revisiones_codigo()
+        actuales = await asyncio.to_thread(revisiones_base, engine)
+        if actuales == esperadas:
+            logger.info(f"Esquema al día en la revisión {', '.join(sorted(actuales))}")
+        elif actuales:
+            logger.warning(
+                f"La base está en la revisión {', '.join(sorted(actuales))} y el código espera "
+                f"{', '.join(sorted(esperadas))}: falta ejecutar `alembic upgrade head`"
+            )
+        elif not await asyncio.to_thread(check_tables_exist):
             logger.info("Creando tablas...")
             await asyncio.to_thread(Base.metadata.create_all, bind=engine)
+            await asyncio.to_thread(marcar_revision, engine, esperadas)
             logger.info("Tablas creadas exitosamente")
         else:
             logger.info("Las tablas ya existen en la base de datos")
@@ -84,13 +139,15 @@ async def initialize_database():
 
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request):
-    return templates.TemplateResponse("home/index.html", {"request": request})
+    return pagina_estatica("home/index.html")
+
 
 
+@app.get("/favicon.ico", include_in_schema=False)
+@app.get("/favicon.ico/", include_in_schema=False)
+async def get_favicon(request: Request):
+    return favicon.responder(request)
 
-@app.get("/favicon.ico/")
-async def get_favicon():
-    return FileResponse("frontend/static/favicon.ico")
     
 
 if __name__ == "__main__":    
@@ -1,6 +1,7 @@
 import asyncio
 import logging
 from app.db.database import Base, engine
+from app.db.esquema import borrar_revision
 from app.db.models.models import Usuario, OTP, FailedLoginAttempt
 
 
@@ -11,6 +12,7 @@ async def reset_database():
     try:
         logger.info("Borrando todas las tablas...")
         await asyncio.to_thread(Base.metadata.drop_all, bind=engine)
+        await asyncio.to_thread(borrar_revision, engine)
         logger.info("Tablas borradas.")
         
     except Exception as e:
@@ -1,6 +1,7 @@
 import pytest
 from sqlalchemy import create_engine, inspect
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from app.db.database import Base
 from app.db.config import settings
 from app.db.models.models import Usuario
@@ -33,6 +34,20 @@ def setup_database():
     engine.dispose()
 
 
+@pytest.fixture
+def motor_memoria():
+    """Base SQLite en memoria propia del test, fuera de la transacción de `db_session`"""
+    motor = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(motor)
+    yield motor
+    motor.dispose()
+
+
+@pytest.fixture
+def fabrica_memoria(motor_memoria):
+    return sessionmaker(bind=motor_memoria)
+
+
 @pytest.fixture(scope="function")
 def db_session():
     """Sesión de base de datos con transacción aislada"""
@@ -0,0 +1,28 @@
+import builtins
+import sys
+from app.arranque import PerfilArranque
+
+
+def test_perfil_mide_importaciones_y_fases(tmp_path, monkeypatch):
+    (tmp_path / "modulo_lento_prueba.py").write_text("import time\ntime.sleep(0.02)\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    original = builtins.__import__
+
+    perfil = PerfilArranque(activo=True, top=5)
+    perfil.instalar()
+    try:
+        import modulo_lento_prueba  # noqa: F401
+    finally:
+        perfil.fin_importaciones()
+        sys.modules.pop("modulo_lento_prueba", None)
+    with perfil.fase("base de datos"):
+        pass
+
+    assert builtins.__import__ is original
+    medida = next(i for i in perfil.importaciones if i.modulo == "modulo_lento_prueba")
+    assert medida.segundos >= 0.02
+    assert [nombre for nombre, _ in perfil.fases] == ["importaciones", "base de datos"]
+
+    texto = perfil.informe()
+    assert "fase base de datos" in texto
+    assert perfil.informe() is None
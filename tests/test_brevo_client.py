@@ -0,0 +1,22 @@
+from benchmarks.bench_brevo import servidor_brevo_local, _configuracion
+from app.services.email_service_activation import BrevoClient
+
+
+def test_cliente_compartido_reutiliza_la_conexion_y_agrupa_lotes():
+    servidor, contadores = servidor_brevo_local(handshake_ms=0, latencia_ms=0)
+    try:
+        cliente = BrevoClient(_configuracion(servidor.server_address[1], 1), tamano_lote=100)
+        for n in range(3):
+            cliente.enviar(f"u{n}@example.com", "Asunto", "<p>Hola</p>")
+        assert contadores["conexiones"] == 1
+
+        peticiones = cliente.enviar_lote(
+            "Aviso", "<p>Hola {{ params.nombre }}</p>",
+            [(f"u{n}@example.com", {"nombre": str(n)}) for n in range(250)]
+        )
+    finally:
+        servidor.shutdown()
+
+    assert peticiones == 3
+    assert contadores["correos"] == 3 + 250
+    assert contadores["conexiones"] == 1
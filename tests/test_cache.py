@@ -0,0 +1,58 @@
+import time
+from app.enums import AccountStatus, Role
+from app.security.cache import TTLCache
+from app.security.principal_cache import Principal, principal_cache, invalidar_principal
+
+
+def test_lru_descarta_la_entrada_menos_usada():
+    cache = TTLCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2
+    assert stats["misses"] == 1
+
+
+def test_entradas_expiran_por_ttl():
+    cache = TTLCache(max_size=10, ttl=60)
+    cache.set("token", "claims", ttl=0.01)
+    time.sleep(0.02)
+
+    assert cache.get("token") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidacion_de_principal():
+    principal = Principal(
+        id=1,
+        email="cache@example.com",
+        role=Role.CLIENT,
+        account_status=AccountStatus.active,
+        two_factor_enabled=False
+    )
+    principal_cache.set(principal.email, principal)
+    assert principal_cache.get(principal.email) == principal
+
+    invalidar_principal(principal.email)
+    assert principal_cache.get(principal.email) is None
+
+
+def test_token_verificado_se_decodifica_una_sola_vez(mocker):
+    from app.security import jwt as jwt_module
+
+    token = jwt_module.create_access_token(email="token@example.com", role=Role.CLIENT, otp_verified=True)
+    jwt_module.token_cache.clear()
+    decode = mocker.spy(jwt_module.jwt, "decode")
+
+    primera = jwt_module.verify_access_token(token)
+    segunda = jwt_module.verify_access_token(token)
+
+    assert primera == segunda
+    assert primera["sub"] == "token@example.com"
+    assert decode.call_count == 1
@@ -0,0 +1,82 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app.db.models.models import EmailOutbox
+from app.enums import EmailChannel, EmailStatus
+from app.services.email_outbox import OutboxDispatcher, encolar_email
+
+
+@pytest.fixture
+def fabrica(fabrica_memoria):
+    return fabrica_memoria
+
+
+def _encolar(fabrica, canal=EmailChannel.brevo):
+    with fabrica() as db:
+        mensaje = encolar_email(db, canal, "outbox@example.com", "Asunto", "<p>Hola</p>")
+        db.commit()
+        return mensaje.id
+
+
+def _vencer_reintentos(fabrica):
+    with fabrica() as db:
+        db.execute(update(EmailOutbox).values(next_attempt_at=datetime.now() - timedelta(seconds=1)))
+        db.commit()
+
+
+def test_entrega_y_metricas(fabrica):
+    enviados = []
+    dispatcher = OutboxDispatcher(
+        session_factory=fabrica,
+        enviadores={EmailChannel.brevo: lambda *args: enviados.append(args)}
+    )
+    mensaje_id = _encolar(fabrica)
+
+    assert asyncio.run(dispatcher.procesar_lote()) == 1
+    assert asyncio.run(dispatcher.procesar_lote()) == 0
+    assert enviados == [("outbox@example.com", "Asunto", "<p>Hola</p>")]
+
+    with fabrica() as db:
+        mensaje = db.get(EmailOutbox, mensaje_id)
+        assert mensaje.status == EmailStatus.sent
+        assert mensaje.sent_at is not None
+        assert mensaje.body == ""
+
+    metricas = asyncio.run(dispatcher.metricas())
+    assert metricas["cola"]["pending"] == 0
+    assert metricas["enviados"] == 1
+    assert metricas["latencia_entrega_s"]["muestras"] == 1
+
+
+def test_reintento_con_backoff_y_dead_letter(fabrica):
+    def falla(*args):
+        raise RuntimeError("proveedor caído")
+
+    dispatcher = OutboxDispatcher(
+        session_factory=fabrica, max_intentos=2, enviadores={EmailChannel.smtp: falla}
+    )
+    mensaje_id = _encolar(fabrica, EmailChannel.smtp)
+
+    asyncio.run(dispatcher.procesar_lote())
+    with fabrica() as db:
+        mensaje = db.get(EmailOutbox, mensaje_id)
+        assert mensaje.status == EmailStatus.pending
+        assert mensaje.attempts == 1
+        assert mensaje.next_attempt_at > datetime.now()
+        assert "proveedor caído" in mensaje.last_error
+
+    # Sin vencer el backoff no se vuelve a intentar
+    assert asyncio.run(dispatcher.procesar_lote()) == 0
+
+    _vencer_reintentos(fabrica)
+    asyncio.run(dispatcher.procesar_lote())
+    with fabrica() as db:
+        mensaje = db.get(EmailOutbox, mensaje_id)
+        assert mensaje.status == EmailStatus.dead
+        assert mensaje.body == ""
+
+    metricas = asyncio.run(dispatcher.metricas())
+    assert metricas["cola"]["dead"] == 1
+    assert metricas["reintentos"] == 1
+    assert metricas["descartados"] == 1
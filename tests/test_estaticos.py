@@ -0,0 +1,77 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+import gzip
+import json
+from app.estaticos import CABECERA_INMUTABLE, ArchivoEnMemoria, StaticFilesCacheados, construir
+
+
+CSS = b".carousel-item img {\n  object-fit: contain;\n}\n" * 20
+
+
+def _app(tmp_path):
+    origen = tmp_path / "static"
+    (origen / "css").mkdir(parents=True)
+    (origen / "css" / "styles.css").write_bytes(CSS)
+    (origen / "favicon.ico").write_bytes(b"\x00" * 2000)
+    destino = tmp_path / "build"
+    manifiesto = construir(str(origen), str(destino))
+
+    app = FastAPI()
+    app.mount("/static/", StaticFilesCacheados(directory=str(destino), manifiesto=manifiesto), name="static")
+    favicon = ArchivoEnMemoria(str(origen / "favicon.ico"))
+
+    @app.get("/favicon.ico")
+    async def get_favicon(request: Request):
+        return favicon.responder(request)
+
+    return TestClient(app), manifiesto, destino
+
+
+def test_build_versiona_y_comprime(tmp_path):
+    _, manifiesto, destino = _app(tmp_path)
+
+    versionada = manifiesto["css/styles.css"]
+    assert versionada.startswith("css/styles.") and versionada.endswith(".css") and versionada != "css/styles.css"
+    assert json.loads((destino / "manifest.json").read_text()) == manifiesto
+    assert (destino / versionada).read_bytes() == CSS
+    assert gzip.decompress((destino / f"{versionada}.gz").read_bytes()) == CSS
+
+
+def test_versionado_inmutable_y_variante_gzip(tmp_path):
+    cliente, manifiesto, _ = _app(tmp_path)
+    url = f"/static/{manifiesto['css/styles.css']}"
+
+    respuesta = cliente.get(url, headers={"Accept-Encoding": "gzip"})
+    assert respuesta.status_code == 200
+    assert respuesta.headers["cache-control"] == CABECERA_INMUTABLE
+    assert respuesta.headers["content-encoding"] == "gzip"
+    assert respuesta.headers["content-type"].startswith("text/css")
+    assert respuesta.headers["vary"] == "Accept-Encoding"
+    assert respuesta.content == CSS
+
+    sin_gzip = cliente.get(url, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in sin_gzip.headers
+    assert sin_gzip.headers["etag"] != respuesta.headers["etag"]
+
+    revalidada = cliente.get(url, headers={"Accept-Encoding": "gzip", "If-None-Match": respuesta.headers["etag"]})
+    assert revalidada.status_code == 304
+
+
+def test_sin_huella_se_revalida(tmp_path):
+    cliente, _, _ = _app(tmp_path)
+
+    respuesta = cliente.get("/static/css/styles.css")
+    assert "immutable" not in respuesta.headers["cache-control"]
+    assert "must-revalidate" in respuesta.headers["cache-control"]
+    assert cliente.get("/static/css/styles.css", headers={"If-None-Match": respuesta.headers["etag"]}).status_code == 304
+
+
+def test_favicon_desde_memoria(tmp_path):
+    cliente, _, _ = _app(tmp_path)
+
+    respuesta = cliente.get("/favicon.ico")
+    assert respuesta.status_code == 200
+    assert respuesta.headers["content-encoding"] == "gzip"
+    assert "max-age=" in respuesta.headers["cache-control"]
+    assert respuesta.content == b"\x00" * 2000
+    assert cliente.get("/favicon.ico", headers={"If-None-Match": respuesta.headers["etag"]}).status_code == 304
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from app.security.hashing import HashingExecutor, hash_password, verify_password
+from app.security.exceptions import HashingSaturatedError
+
+
+def test_hash_y_verificacion_en_pool():
+    executor = HashingExecutor(workers=1, queue_size=2, retry_after=1)
+
+    async def flujo():
+        hashed = await executor.hash_password("Clave#Segura1")
+        return hashed, await executor.verify_password("Clave#Segura1", hashed)
+
+    try:
+        hashed, valido = asyncio.run(flujo())
+    finally:
+        executor.shutdown()
+
+    assert valido
+    assert verify_password("Clave#Segura1", hashed)
+    metricas = executor.metricas()
+    assert metricas["completadas"] == 2
+    assert metricas["en_curso"] == 0
+
+
+def test_pool_saturado_responde_503_con_retry_after():
+    executor = HashingExecutor(workers=1, queue_size=0, retry_after=3)
+
+    async def flujo():
+        primera = asyncio.create_task(executor.verify_password("x", hash_password("x")))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(HashingSaturatedError) as exc:
+                await executor.hash_password("otra")
+        finally:
+            await primera
+        return exc.value
+
+    try:
+        error = asyncio.run(flujo())
+    finally:
+        executor.shutdown()
+
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "3"
+    assert executor.metricas()["rechazadas"] == 1
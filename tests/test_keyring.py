@@ -0,0 +1,72 @@
+import os
+import pytest
+from jose import jwt
+from app.security.keyring import KeyRing, generar_clave, es_algoritmo_asimetrico
+
+
+def test_algoritmos_asimetricos():
+    assert es_algoritmo_asimetrico("RS256")
+    assert es_algoritmo_asimetrico("ES256")
+    assert not es_algoritmo_asimetrico("HS256")
+
+
+def test_firma_con_clave_activa_y_verifica_por_kid(tmp_path):
+    directorio = str(tmp_path)
+    generar_clave(directorio, "2025-01", "ES256")
+    anillo = KeyRing(directorio, "ES256", intervalo_recarga=0)
+
+    activa = anillo.clave_activa()
+    token = jwt.encode({"sub": "kid@example.com"}, activa.privada, algorithm="ES256", headers={"kid": activa.kid})
+
+    kid = jwt.get_unverified_header(token)["kid"]
+    clave = anillo.clave(kid)
+    assert jwt.decode(token, clave.publica, algorithms=["ES256"])["sub"] == "kid@example.com"
+    assert anillo.clave("desconocido") is None
+
+
+def test_rotacion_publica_antes_de_activar(tmp_path):
+    directorio = str(tmp_path)
+    generar_clave(directorio, "2025-01", "ES256")
+    with open(os.path.join(directorio, "activo"), "w") as f:
+        f.write("2025-01")
+    anillo = KeyRing(directorio, "ES256", intervalo_recarga=0)
+    recargas = []
+    anillo.al_recargar(lambda: recargas.append(True))
+    _, etag_inicial = anillo.jwks()
+
+    generar_clave(directorio, "2025-02", "ES256")
+    cuerpo, etag = anillo.jwks()
+
+    assert b'"kid":"2025-02"' in cuerpo
+    assert etag != etag_inicial
+    assert anillo.clave_activa().kid == "2025-01"
+    assert recargas == [True]
+
+    with open(os.path.join(directorio, "activo"), "w") as f:
+        f.write("2025-02")
+    os.utime(directorio)
+    anillo.recargar_si_cambio(forzar=True)
+    assert anillo.clave_activa().kid == "2025-02"
+
+
+def test_kid_activo_sin_clave_privada_falla(tmp_path):
+    with pytest.raises(RuntimeError):
+        KeyRing(str(tmp_path), "RS256", kid_activo="inexistente")
+
+
+def test_kids_desconocidos_no_fuerzan_una_revision_por_peticion(tmp_path, monkeypatch):
+    directorio = str(tmp_path)
+    generar_clave(directorio, "2025-01", "ES256")
+    anillo = KeyRing(directorio, "ES256", intervalo_recarga=120, intervalo_forzado=60)
+    revisiones = []
+    original = anillo._estado_directorio
+    monkeypatch.setattr(anillo, "_estado_directorio", lambda: revisiones.append(True) or original())
+
+    for i in range(50):
+        assert anillo.clave(f"falso-{i}") is None
+    assert revisiones == []
+
+    anillo._ultima_revision -= 60
+    assert anillo.clave("falso") is None
+    assert anillo.clave("otro-falso") is None
+    assert len(revisiones) == 1
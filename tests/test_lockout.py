@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from fakeredis import FakeAsyncRedis
+from sqlalchemy import select, func
+from app.db.batch_writer import EscritorPorLotes
+from app.db.models.models import LoginAttemptAudit
+from app.security.lockout import LockoutTracker, MemoryLockoutStore, RedisLockoutStore
+
+
+@pytest.fixture(params=["memoria", "redis"])
+def store(request):
+    if request.param == "memoria":
+        return MemoryLockoutStore()
+    return RedisLockoutStore(FakeAsyncRedis())
+
+
+def test_bloquea_por_email_e_ip_y_caduca_por_ttl(store):
+    tracker = LockoutTracker(store, maximo=3, ventana=60, bloqueo=60)
+
+    async def escenario():
+        resultados = [await tracker.registrar_fallo("a@example.com", "1.1.1.1") for _ in range(3)]
+        assert resultados == [False, False, True]
+        assert await tracker.bloqueado("A@example.com", "1.1.1.1") > 0
+        # Otra IP no hereda el bloqueo mientras no se llegue al límite del email
+        assert await tracker.bloqueado("a@example.com", "2.2.2.2") == 0
+
+    asyncio.run(escenario())
+
+
+def test_cambiar_de_ip_no_evita_el_limite_del_email(store):
+    tracker = LockoutTracker(store, maximo=3, maximo_email=4, ventana=60, bloqueo=60)
+
+    async def escenario():
+        resultados = [await tracker.registrar_fallo("d@example.com", f"10.0.0.{n}") for n in range(4)]
+        assert resultados == [False, False, False, True]
+        assert await tracker.bloqueado("d@example.com", "10.0.0.99") > 0
+
+    asyncio.run(escenario())
+
+
+def test_exito_reinicia_el_contador(store):
+    tracker = LockoutTracker(store, maximo=2, ventana=60, bloqueo=60)
+
+    async def escenario():
+        assert not await tracker.registrar_fallo("b@example.com", "ip")
+        await tracker.registrar_exito("b@example.com", "ip")
+        assert not await tracker.registrar_fallo("b@example.com", "ip")
+
+    asyncio.run(escenario())
+
+
+def test_auditoria_se_escribe_en_lotes(fabrica_memoria):
+    auditoria = EscritorPorLotes(LoginAttemptAudit, session_factory=fabrica_memoria, tamano_lote=2)
+    tracker = LockoutTracker(MemoryLockoutStore(), maximo=5, auditoria=auditoria)
+
+    async def escenario():
+        for _ in range(3):
+            await tracker.registrar_fallo("c@example.com", "ip")
+        await tracker.registrar_exito("c@example.com", "ip")
+        return await auditoria.vaciar()
+
+    assert asyncio.run(escenario()) == 4
+    with fabrica_memoria() as db:
+        assert db.scalar(select(func.count()).select_from(LoginAttemptAudit)) == 4
+        assert db.scalar(select(func.count()).where(LoginAttemptAudit.success)) == 1
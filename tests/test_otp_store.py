@@ -0,0 +1,57 @@
+import asyncio
+from datetime import date
+import pytest
+from fakeredis import FakeAsyncRedis
+from app.db.models.models import Usuario
+from app.services.otp_store import DatabaseOTPStore, MemoryOTPStore, RedisOTPStore
+
+
+@pytest.fixture
+def fabrica(fabrica_memoria):
+    with fabrica_memoria() as db:
+        db.add(Usuario(
+            email="otp@example.com", password_hash="x", first_name="Otp",
+            last_name="User", date_of_birth=date(2000, 1, 1)
+        ))
+        db.commit()
+    return fabrica_memoria
+
+
+@pytest.fixture(params=["memoria", "redis", "db"])
+def store(request, fabrica):
+    if request.param == "memoria":
+        return MemoryOTPStore()
+    if request.param == "redis":
+        return RedisOTPStore(FakeAsyncRedis(decode_responses=True))
+    return DatabaseOTPStore(session_factory=fabrica)
+
+
+def test_codigo_de_un_solo_uso(store):
+    async def escenario():
+        codigo = await store.emitir("otp@example.com")
+        assert await store.consumir("OTP@example.com", codigo)
+        assert not await store.consumir("otp@example.com", codigo)
+
+    asyncio.run(escenario())
+
+
+def test_codigo_incorrecto_consume_el_otp(store):
+    async def escenario():
+        codigo = await store.emitir("otp@example.com")
+        incorrecto = "000000" if codigo != "000000" else "111111"
+        assert not await store.consumir("otp@example.com", incorrecto)
+        assert not await store.consumir("otp@example.com", codigo)
+
+    asyncio.run(escenario())
+
+
+def test_nuevo_codigo_sustituye_al_anterior(store):
+    async def escenario():
+        anterior = await store.emitir("otp@example.com")
+        nuevo = await store.emitir("otp@example.com")
+        if anterior != nuevo:
+            assert not await store.consumir("otp@example.com", anterior)
+            nuevo = await store.emitir("otp@example.com")
+        assert await store.consumir("otp@example.com", nuevo)
+
+    asyncio.run(escenario())
@@ -0,0 +1,64 @@
+import os
+import uuid
+import pytest
+import fakeredis
+import redis
+from limits import parse
+from limits.storage import MemoryStorage, RedisStorage, storage_from_string
+from limits.strategies import STRATEGIES
+from app.security.rate_limit import SharedMemoryStorage
+
+
+@pytest.fixture
+def shm():
+    storage = storage_from_string(f"shm://erp-test-{uuid.uuid4().hex}", slots=256)
+    yield storage
+    storage.reset()
+    os.unlink(storage.ruta)
+
+
+@pytest.fixture
+def redis_local():
+    pool = redis.ConnectionPool(server=fakeredis.FakeServer(), connection_class=fakeredis.FakeRedisConnection)
+    return RedisStorage("redis://localhost:6379", connection_pool=pool)
+
+
+def test_shm_se_registra_como_esquema(shm):
+    assert isinstance(shm, SharedMemoryStorage)
+
+
+@pytest.mark.parametrize("estrategia", ["fixed-window", "sliding-window-counter", "token-bucket"])
+def test_estrategias_en_memoria_compartida(shm, estrategia):
+    limite = parse("3/minute")
+    limitador = STRATEGIES[estrategia](shm)
+
+    assert [limitador.hit(limite, "1.2.3.4") for _ in range(4)] == [True, True, True, False]
+    assert limitador.hit(limite, "5.6.7.8")
+    assert limitador.get_window_stats(limite, "1.2.3.4").remaining == 0
+
+
+def test_memoria_compartida_entre_instancias(shm):
+    # Dos workers abren el mismo segmento y ven los mismos contadores
+    otro_worker = SharedMemoryStorage(f"shm://{shm.ruta.rsplit('/', 1)[-1]}", slots=256)
+    limite = parse("2/minute")
+    assert STRATEGIES["sliding-window-counter"](shm).hit(limite, "ip")
+    assert STRATEGIES["sliding-window-counter"](otro_worker).hit(limite, "ip")
+    assert not STRATEGIES["sliding-window-counter"](shm).hit(limite, "ip")
+
+
+@pytest.mark.parametrize("estrategia", ["sliding-window-counter", "token-bucket"])
+def test_estrategias_en_redis(redis_local, estrategia):
+    limite = parse("2/second")
+    limitador = STRATEGIES[estrategia](redis_local)
+
+    assert [limitador.hit(limite, "ip") for _ in range(3)] == [True, True, False]
+    assert not limitador.test(limite, "ip")
+
+
+def test_token_bucket_en_memory_storage():
+    limitador = STRATEGIES["token-bucket"](MemoryStorage())
+    limite = parse("1/minute")
+    assert limitador.hit(limite, "ip")
+    assert not limitador.hit(limite, "ip")
+    limitador.clear(limite, "ip")
+    assert limitador.hit(limite, "ip")
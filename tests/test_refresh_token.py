@@ -0,0 +1,99 @@
+import asyncio
+import pytest
+from datetime import date, timedelta
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+from app.db.database import get_db
+from app.db.models.models import Usuario, RefreshToken
+from app.enums import AccountStatus, Role
+from app.security.exceptions import TokenValidationError
+from app.security.jwt import create_access_token
+from app.services.refresh_token_service import emitir_refresh_token, revocar_tokens_usuario, rotar_refresh_token
+from main import app
+
+
+@pytest.fixture
+def session(fabrica_memoria):
+    db = fabrica_memoria()
+    usuario = Usuario(
+        email="refresh@example.com",
+        password_hash="x",
+        first_name="Refresh",
+        last_name="User",
+        date_of_birth=date(2000, 1, 1),
+        account_status=AccountStatus.active
+    )
+    db.add(usuario)
+    db.commit()
+    yield db
+    db.close()
+
+
+def _usuario(db):
+    return db.execute(select(Usuario)).scalars().one()
+
+
+def test_rotacion_emite_un_token_nuevo(session):
+    token = asyncio.run(emitir_refresh_token(session, _usuario(session).id))
+    usuario, nuevo = asyncio.run(rotar_refresh_token(session, token))
+
+    assert usuario.email == "refresh@example.com"
+    assert nuevo != token
+    digests = session.execute(select(RefreshToken.token_digest)).scalars().all()
+    assert token not in digests and nuevo not in digests
+
+
+def test_reutilizacion_revoca_la_familia(session):
+    token = asyncio.run(emitir_refresh_token(session, _usuario(session).id))
+    _, nuevo = asyncio.run(rotar_refresh_token(session, token))
+
+    with pytest.raises(TokenValidationError):
+        asyncio.run(rotar_refresh_token(session, token))
+
+    with pytest.raises(TokenValidationError):
+        asyncio.run(rotar_refresh_token(session, nuevo))
+    assert all(r.revoked_at for r in session.execute(select(RefreshToken)).scalars())
+
+
+def test_token_desconocido(session):
+    with pytest.raises(TokenValidationError):
+        asyncio.run(rotar_refresh_token(session, "no-existe"))
+
+
+def test_cambio_de_password_revoca_las_sesiones(session):
+    user_id = _usuario(session).id
+    tokens = [asyncio.run(emitir_refresh_token(session, user_id)) for _ in range(2)]
+
+    assert revocar_tokens_usuario(session, user_id) == 2
+    session.commit()
+    for token in tokens:
+        with pytest.raises(TokenValidationError):
+            asyncio.run(rotar_refresh_token(session, token))
+
+
+def test_reset_password_revoca_los_refresh_tokens(session):
+    token = asyncio.run(emitir_refresh_token(session, _usuario(session).id))
+    fabrica = sessionmaker(bind=session.get_bind())
+
+    def override_get_db():
+        with fabrica() as db:
+            yield db
+
+    reset = create_access_token(
+        email="refresh@example.com", role=Role.CLIENT, expires_delta=timedelta(minutes=10),
+        extra_data={"token_type": "password_reset"}
+    )
+    app.dependency_overrides[get_db] = override_get_db
+    try:
+        respuesta = TestClient(app).post("/reset-password/", data={
+            "token": reset, "new_password": "Nueva123!", "confirm_password": "Nueva123!"
+        }, follow_redirects=False)
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+    assert respuesta.status_code == 303
+    session.expire_all()
+    assert _usuario(session).password_hash.startswith("$2b$")
+    with pytest.raises(TokenValidationError):
+        asyncio.run(rotar_refresh_token(session, token))
@@ -0,0 +1,26 @@
+from datetime import date, datetime
+import json
+from app.db.models.models import Usuario
+from app.enums import AccountStatus, Role
+from app.serializacion import respuesta_json, respuesta_modelo, usuario_out
+
+
+def test_respuesta_modelo_desde_orm():
+    usuario = Usuario(
+        id=7, email="ana@example.com", password_hash="x", first_name="Ana", last_name="Pérez",
+        date_of_birth=date(1990, 5, 1), account_status=AccountStatus.active, role=Role.CLIENT,
+        two_factor_enabled=False, is_email_verified=True, created_at=datetime(2026, 1, 2, 3, 4, 5)
+    )
+    respuesta = respuesta_modelo(usuario_out, usuario)
+
+    assert respuesta.media_type == "application/json"
+    cuerpo = json.loads(respuesta.body)
+    assert cuerpo["email"] == "ana@example.com"
+    assert cuerpo["role"] == "CLIENTE" and cuerpo["account_status"] == "active"
+    assert cuerpo["date_of_birth"] == "1990-05-01" and cuerpo["created_at"] == "2026-01-02T03:04:05"
+    assert "password_hash" not in cuerpo
+
+
+def test_respuesta_json_con_tipos_simples():
+    respuesta = respuesta_json({"role": Role.ADMIN, "desde": date(2026, 1, 1), "n": 1})
+    assert json.loads(respuesta.body) == {"role": "ADMIN", "desde": "2026-01-01", "n": 1}
@@ -0,0 +1,36 @@
+import asyncio
+from benchmarks.bench_smtp import ServidorSMTPLocal, _mensaje
+from app.services.smtp_pool import SMTPPool
+
+
+def test_reutiliza_conexiones_autenticadas():
+    with ServidorSMTPLocal(handshake_ms=0) as servidor:
+        pool = SMTPPool("127.0.0.1", servidor.puerto, "erp", "secreto", use_tls=False, tamano=2)
+
+        async def enviar():
+            for n in range(5):
+                await pool.enviar(_mensaje(n))
+            await pool.cerrar()
+
+        asyncio.run(enviar())
+
+    metricas = pool.metricas()
+    assert metricas["enviados"] == 5
+    assert metricas["conexiones_abiertas"] == 1
+    assert metricas["reutilizadas"] == 4
+
+
+def test_reconecta_si_la_conexion_libre_se_cayo():
+    with ServidorSMTPLocal(handshake_ms=0) as servidor:
+        pool = SMTPPool("127.0.0.1", servidor.puerto, "erp", "secreto", use_tls=False)
+
+        async def enviar():
+            await pool.enviar(_mensaje(1))
+            pool._libres[0][0].close()
+            await pool.enviar(_mensaje(2))
+            await pool.cerrar()
+
+        asyncio.run(enviar())
+        assert servidor.recibidos == 2
+
+    assert pool.metricas()["conexiones_abiertas"] == 2
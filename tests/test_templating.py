@@ -0,0 +1,17 @@
+from app.templating import entorno, pagina_estatica, precompilar
+
+
+def test_precompilar_carga_todas_las_plantillas():
+    assert precompilar() == len(entorno().list_templates(extensions=["html", "htm"]))
+
+
+def test_pagina_estatica_reutiliza_el_render(monkeypatch):
+    primera = pagina_estatica("home/index.html")
+    assert primera.media_type == "text/html"
+    assert b"Bienvenido a CodePyHub" in primera.body
+
+    def sin_render(*args, **kwargs):
+        raise AssertionError("la página debía salir de la caché")
+
+    monkeypatch.setattr(entorno(), "get_template", sin_render)
+    assert pagina_estatica("home/index.html").body == primera.body
@@ -0,0 +1,43 @@
+import pytest
+from datetime import date, datetime, timedelta
+from app.db.models.models import Usuario
+from app.services.hash_activacion_email import crear_token, buscar_usuario_por_token_activacion
+
+
+@pytest.fixture
+def session(fabrica_memoria):
+    with fabrica_memoria() as db:
+        yield db
+
+
+def _crear_usuario(db, email, digest, expiracion):
+    db.add(Usuario(
+        email=email,
+        password_hash="x",
+        first_name="Token",
+        last_name="User",
+        date_of_birth=date(2000, 1, 1),
+        email_verification_token=digest,
+        email_verification_expiration=expiracion
+    ))
+    db.commit()
+
+
+def test_token_resuelve_el_usuario_por_digest(session):
+    token, digest, expiracion = crear_token()
+    _crear_usuario(session, "activar@example.com", digest, expiracion)
+
+    assert token != digest
+    usuario = buscar_usuario_por_token_activacion(session, token)
+    assert usuario.email == "activar@example.com"
+
+    with pytest.raises(ValueError):
+        buscar_usuario_por_token_activacion(session, token + "x")
+
+
+def test_token_expirado(session):
+    token, digest, _ = crear_token()
+    _crear_usuario(session, "expirado@example.com", digest, datetime.now() - timedelta(minutes=1))
+
+    with pytest.raises(ValueError, match="expirado"):
+        buscar_usuario_por_token_activacion(session, token)
@@ -0,0 +1,80 @@
+import asyncio
+import pytest
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from app.db.config import settings
+from app.db.database import Base, en_sesion
+from app.db.models.models import Usuario
+from app.services.hash_activacion_email import crear_token, buscar_usuario_por_token_activacion
+from app.services.usuario_service import get_usuario_por_email_async
+
+
+@pytest.fixture
+def async_session_factory():
+    """Base en memoria con aiosqlite, aislada de la transacción del conftest"""
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+
+    async def crear_tablas():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    asyncio.run(crear_tablas())
+    yield async_sessionmaker(bind=engine, expire_on_commit=False)
+    asyncio.run(engine.dispose())
+
+
+def test_url_async_de_pruebas():
+    assert "+aiosqlite" in settings.ASYNC_DATABASE_URL or "+asyncpg" in settings.ASYNC_DATABASE_URL
+
+
+def test_conexion_async_bd(async_session_factory):
+    """Verifica la conexión con el driver async de pruebas"""
+    async def consultar():
+        async with async_session_factory() as db:
+            resultado = await db.execute(text("SELECT 1"))
+            return resultado.scalar()
+
+    assert asyncio.run(consultar()) == 1
+
+
+def test_busqueda_usuario_async(async_session_factory):
+    """Guarda un usuario y lo busca por email con AsyncSession"""
+    async def flujo():
+        async with async_session_factory() as db:
+            db.add(Usuario(
+                email="async@example.com",
+                password_hash="x",
+                first_name="Async",
+                last_name="User",
+                date_of_birth=date(2000, 1, 1)
+            ))
+            await db.commit()
+
+            usuario = await get_usuario_por_email_async(db, "async@example.com")
+            return usuario.first_name, usuario.last_name
+
+    assert asyncio.run(flujo()) == ("Async", "User")
+
+
+def test_en_sesion_con_async_session(async_session_factory):
+    """Las funciones escritas para Session corren sobre AsyncSession con run_sync"""
+    token, digest, expiracion = crear_token()
+
+    async def flujo():
+        async with async_session_factory() as db:
+            db.add(Usuario(
+                email="token@example.com",
+                password_hash="x",
+                first_name="Token",
+                last_name="Async",
+                date_of_birth=date(2000, 1, 1),
+                email_verification_token=digest,
+                email_verification_expiration=expiracion
+            ))
+            await db.commit()
+            usuario = await en_sesion(db, buscar_usuario_por_token_activacion, token)
+            return usuario.email
+
+    assert asyncio.run(flujo()) == "token@example.com"
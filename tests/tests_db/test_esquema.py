@@ -0,0 +1,18 @@
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from app.db.esquema import borrar_revision, marcar_revision, revisiones_base, revisiones_codigo
+
+
+def test_cabeza_igual_que_alembic():
+    assert revisiones_codigo() == set(ScriptDirectory.from_config(Config("alembic.ini")).get_heads())
+
+
+def test_marcar_y_leer_revision(motor_memoria):
+    assert revisiones_base(motor_memoria) is None
+
+    cabeza = revisiones_codigo()
+    marcar_revision(motor_memoria, cabeza)
+    assert revisiones_base(motor_memoria) == cabeza
+
+    borrar_revision(motor_memoria)
+    assert revisiones_base(motor_memoria) is None
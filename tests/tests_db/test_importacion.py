@@ -0,0 +1,111 @@
+from datetime import date, datetime, timedelta
+import asyncio
+import stat
+import csv
+import io
+import os
+import pytest
+from sqlalchemy import select
+from app.admin.importacion import ArchivoDemasiadoGrande, ImportadorUsuarios
+from app.db.query_counter import contar_sentencias
+from app.db.models.models import EmailOutbox, Usuario, UsuarioImportacion
+from app.enums import AccountStatus, ImportStatus
+
+
+FILAS = [
+    ["email", "password", "first_name", "last_name", "date_of_birth", "shipping_city"],
+    ["ana@example.com", "Segura123!", "Ana", "Pérez", "1990-05-01", "Madrid"],
+    ["debil@example.com", "corta", "Débil", "Clave", "", ""],
+    ["bruno@example.com", "Segura123!", "Bruno", "Gil", "", ""],
+    ["ana@example.com", "Segura123!", "Ana", "Otra", "", ""],
+    ["existe@example.com", "Segura123!", "Ya", "Existe", "", ""],
+    ["carla@example.com", "Segura123!", "Carla", "Ruiz", "", "Sevilla"],
+]
+
+
+def test_importacion_por_lotes(tmp_path, fabrica_memoria):
+    fabrica = fabrica_memoria
+    with fabrica() as db:
+        db.add(Usuario(
+            email="existe@example.com", password_hash="x", first_name="Ya",
+            last_name="Existe", date_of_birth=date(2000, 1, 1)
+        ))
+        db.commit()
+
+    importador = ImportadorUsuarios(session_factory=fabrica, tamano_lote=2, directorio=str(tmp_path))
+    importacion_id = importador.crear("clientes.csv", "admin@example.com")
+    with open(importador.ruta_archivo(importacion_id), "w", newline="", encoding="utf-8") as archivo:
+        csv.writer(archivo).writerows(FILAS)
+
+    asyncio.run(importador.importar(importacion_id))
+
+    with fabrica() as db:
+        importacion = db.get(UsuarioImportacion, importacion_id)
+        assert importacion.status == ImportStatus.finished
+        assert (importacion.total_rows, importacion.created, importacion.duplicates, importacion.invalid) == (6, 3, 2, 1)
+
+        nuevos = db.scalars(select(Usuario).where(Usuario.email != "existe@example.com")).all()
+        assert sorted(u.email for u in nuevos) == ["ana@example.com", "bruno@example.com", "carla@example.com"]
+        assert all(u.account_status == AccountStatus.pending and u.email_verification_token for u in nuevos)
+        assert all(u.password_hash.startswith("$2b$") for u in nuevos)
+        assert sorted(db.scalars(select(EmailOutbox.recipient))) == sorted(u.email for u in nuevos)
+
+    with open(importacion.error_file, newline="", encoding="utf-8") as archivo:
+        errores = list(csv.reader(archivo))[1:]
+    assert [(fila, email) for fila, email, _ in errores] == [
+        ("3", "debil@example.com"), ("5", "ana@example.com"), ("6", "existe@example.com")
+    ]
+    assert not (tmp_path / f"{importacion_id}.csv").exists()
+
+
+def test_importacion_sin_columnas_obligatorias(tmp_path, fabrica_memoria):
+    fabrica = fabrica_memoria
+    importador = ImportadorUsuarios(session_factory=fabrica, directorio=str(tmp_path))
+    importacion_id = importador.crear("mal.csv", None)
+    (tmp_path / f"{importacion_id}.csv").write_text("email,first_name\nx@example.com,X\n")
+
+    asyncio.run(importador.importar(importacion_id))
+
+    with fabrica() as db:
+        importacion = db.get(UsuarioImportacion, importacion_id)
+        assert importacion.status == ImportStatus.failed
+        assert "password" in importacion.last_error
+
+
+def test_archivo_demasiado_grande_y_reinicio(tmp_path, fabrica_memoria):
+    fabrica = fabrica_memoria
+    importador = ImportadorUsuarios(session_factory=fabrica, directorio=str(tmp_path / "importaciones"))
+
+    grande = importador.crear("grande.csv", None)
+    with pytest.raises(ArchivoDemasiadoGrande):
+        importador.guardar_archivo(grande, io.BytesIO(b"x" * 100), maximo=10)
+    assert not os.path.exists(importador.ruta_archivo(grande))
+    assert stat.S_IMODE(os.stat(importador.directorio).st_mode) == 0o700
+
+    interrumpida = importador.crear("clientes.csv", None)
+    importador.guardar_archivo(interrumpida, io.BytesIO(b"email,password\n"))
+    assert stat.S_IMODE(os.stat(importador.ruta_archivo(interrumpida)).st_mode) == 0o600
+    assert importador.recuperar_interrumpidas(antes_de=datetime.now() + timedelta(seconds=1)) == 1
+    assert not os.path.exists(importador.ruta_archivo(interrumpida))
+
+    with fabrica() as db:
+        assert db.get(UsuarioImportacion, grande).status == ImportStatus.failed
+        importacion = db.get(UsuarioImportacion, interrumpida)
+        assert importacion.status == ImportStatus.failed and "reinicio" in importacion.last_error
+
+
+def test_la_tarea_no_hereda_el_contador_de_la_peticion(tmp_path, fabrica_memoria):
+    fabrica = fabrica_memoria
+    importador = ImportadorUsuarios(session_factory=fabrica, directorio=str(tmp_path))
+    importacion_id = importador.crear("clientes.csv", None)
+    with open(importador.ruta_archivo(importacion_id), "w", newline="", encoding="utf-8") as archivo:
+        csv.writer(archivo).writerows(FILAS[:3])
+
+    async def peticion():
+        with contar_sentencias() as estadisticas:
+            await importador.lanzar(importacion_id)
+        return estadisticas
+
+    assert asyncio.run(peticion()).sentencias == 0
+    with fabrica() as db:
+        assert db.get(UsuarioImportacion, importacion_id).created == 1
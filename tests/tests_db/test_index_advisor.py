@@ -0,0 +1,19 @@
+from sqlalchemy import create_engine, text
+from app.db.database import Base
+from app.db.index_advisor import revisar
+
+
+def test_consultas_calientes_usan_indices(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'indices.db'}")
+    Base.metadata.create_all(engine)
+
+    diagnosticos = revisar(engine)
+    assert [d.consulta for d in diagnosticos if not d.correcto] == []
+
+    # Conexiones nuevas: sqlite3 reutiliza las sentencias EXPLAIN ya preparadas
+    engine.dispose()
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_otps_user_id"))
+    sin_indice = {d.consulta: d.recorridos for d in revisar(engine) if not d.correcto}
+    assert sin_indice["OTP en base: sustituir"] == ["otps"]
+    engine.dispose()
@@ -0,0 +1,155 @@
+import json
+from datetime import date, datetime, timedelta
+import pytest
+from fastapi.testclient import TestClient
+from app.db.database import get_db
+from app.db.models.models import Usuario
+from app.enums import AccountStatus, Role
+from app.security.dependencies import require_admin
+from app.security.principal_cache import Principal, principal_cache
+from app.db.query_counter import assert_max_queries
+import app.admin.masivo as masivo
+from main import app
+
+
+@pytest.fixture
+def cliente(fabrica_memoria):
+    fabrica = fabrica_memoria
+    inicio = datetime(2026, 1, 1)
+    with fabrica() as db:
+        for i in range(25):
+            db.add(Usuario(
+                email=f"usuario{i}@example.com", password_hash="x", first_name=f"N{i}",
+                last_name="Apellido", date_of_birth=date(2000, 1, 1),
+                account_status=AccountStatus.active if i % 2 else AccountStatus.pending,
+                role=Role.ADMIN if i % 5 == 0 else Role.CLIENT,
+                # Pares con el mismo created_at para que el desempate por id cuente
+                created_at=inicio + timedelta(days=i // 2)
+            ))
+        db.commit()
+
+    def override_get_db():
+        with fabrica() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = override_get_db
+    # El admin de los tests no está entre los usuarios: ningún cambio masivo lo excluye
+    app.dependency_overrides[require_admin] = lambda: Principal(0, "admin@example.com", Role.ADMIN, AccountStatus.active, False)
+    yield TestClient(app)
+    app.dependency_overrides.pop(get_db, None)
+    app.dependency_overrides.pop(require_admin, None)
+
+
+def _recorrer(cliente, **params):
+    vistos, cursor = [], None
+    while True:
+        pagina = cliente.get("/admin/lista_usuarios", params={**params, **({"cursor": cursor} if cursor else {})}).json()
+        vistos += pagina["items"]
+        cursor = pagina["next_cursor"]
+        if not cursor:
+            return vistos
+
+
+def test_recorre_todas_las_paginas_sin_repetir(cliente):
+    vistos = _recorrer(cliente, limit=7, fields="id,email")
+    assert len(vistos) == 25
+    assert len({u["id"] for u in vistos}) == 25
+    assert set(vistos[0]) == {"id", "email"}
+    assert vistos[0]["email"] == "usuario24@example.com"
+
+
+def test_filtros(cliente):
+    activos = _recorrer(cliente, limit=4, account_status="active", fields="account_status")
+    assert len(activos) == 12 and {u["account_status"] for u in activos} == {"active"}
+
+    admins = _recorrer(cliente, role="ADMIN", created_desde="2026-01-03T00:00:00")
+    assert sorted(u["email"] for u in admins) == [f"usuario{i}@example.com" for i in (10, 15, 20, 5)]
+
+
+def test_limites_y_errores(cliente):
+    assert cliente.get("/admin/lista_usuarios", params={"limit": 100000}).status_code == 422
+    assert cliente.get("/admin/lista_usuarios", params={"fields": "password_hash"}).status_code == 400
+    assert cliente.get("/admin/lista_usuarios", params={"cursor": "basura"}).status_code == 400
+
+
+def test_exportacion_csv_con_filtros(cliente):
+    respuesta = cliente.get("/admin/exportar_usuarios", params={"role": "ADMIN", "fields": "id,email,role"})
+    assert respuesta.headers["content-type"].startswith("text/csv")
+    lineas = respuesta.text.splitlines()
+    assert lineas[0] == "id,email,role"
+    assert lineas[1:] == [f"{i + 1},usuario{i}@example.com,ADMIN" for i in (0, 5, 10, 15, 20)]
+
+
+def test_exportacion_ndjson(cliente):
+    respuesta = cliente.get("/admin/exportar_usuarios", params={"formato": "ndjson", "account_status": "pending"})
+    filas = [json.loads(linea) for linea in respuesta.text.splitlines()]
+    assert len(filas) == 13
+    assert filas[0]["email"] == "usuario0@example.com" and filas[0]["date_of_birth"] == "2000-01-01"
+    assert "password_hash" not in filas[0]
+
+
+def test_estado_masivo_por_emails(cliente):
+    principal_cache.set("usuario0@example.com", "cacheado")
+    with assert_max_queries(2):
+        respuesta = cliente.post("/admin/elegir_estado_masivo", json={
+            "emails": ["usuario0@example.com", "usuario1@example.com", "nadie@example.com"],
+            "new_status": "active"
+        })
+
+    assert respuesta.json() == {
+        "updated": 1, "unchanged": 1, "not_found": 1,
+        "results": {
+            "usuario0@example.com": "updated",
+            "usuario1@example.com": "unchanged",
+            "nadie@example.com": "not_found"
+        }
+    }
+    assert principal_cache.get("usuario0@example.com") is None
+    activos = _recorrer(cliente, account_status="active", fields="email")
+    assert len(activos) == 13
+
+
+def test_rol_masivo_por_filtro(cliente):
+    respuesta = cliente.post("/admin/elegir_rol_masivo", json={
+        "filtro": {"created_hasta": "2026-01-03T00:00:00"},
+        "role": "GESTOR_VENTAS"
+    }).json()
+    assert respuesta["updated"] == 4 and respuesta["unchanged"] == 0
+    assert sorted(respuesta["updated_emails"]) == [f"usuario{i}@example.com" for i in range(4)]
+
+    repetida = cliente.post("/admin/elegir_rol_masivo", json={
+        "filtro": {"created_hasta": "2026-01-03T00:00:00"},
+        "role": "GESTOR_VENTAS"
+    }).json()
+    assert repetida["updated"] == 0 and repetida["unchanged"] == 4
+
+
+def test_masivo_exige_una_seleccion(cliente):
+    assert cliente.post("/admin/elegir_estado_masivo", json={"new_status": "banned"}).status_code == 422
+    assert cliente.post("/admin/elegir_estado_masivo", json={
+        "emails": ["usuario0@example.com"], "filtro": {}, "new_status": "banned"
+    }).status_code == 422
+    assert cliente.post("/admin/elegir_estado_masivo", json={"filtro": {}, "new_status": "banned"}).status_code == 422
+    assert cliente.post("/admin/elegir_rol_masivo", json={
+        "filtro": {"role": None, "account_status": None}, "role": "CLIENTE"
+    }).status_code == 422
+
+
+def test_masivo_excluye_al_admin_que_lo_lanza(cliente):
+    app.dependency_overrides[require_admin] = lambda: Principal(1, "usuario0@example.com", Role.ADMIN, AccountStatus.active, False)
+    por_filtro = cliente.post("/admin/elegir_rol_masivo", json={"filtro": {"role": "ADMIN"}, "role": "CLIENTE"}).json()
+    assert sorted(por_filtro["updated_emails"]) == [f"usuario{i}@example.com" for i in (10, 15, 20, 5)]
+
+    por_emails = cliente.post("/admin/elegir_estado_masivo", json={
+        "emails": ["usuario0@example.com", "usuario2@example.com"], "new_status": "banned"
+    }).json()
+    assert por_emails["results"] == {"usuario0@example.com": "unchanged", "usuario2@example.com": "updated"}
+    admins = _recorrer(cliente, role="ADMIN", fields="email,account_status")
+    assert admins == [{"email": "usuario0@example.com", "account_status": "pending"}]
+
+
+def test_masivo_por_filtro_respeta_el_maximo(cliente, monkeypatch):
+    monkeypatch.setattr(masivo, "ADMIN_BULK_MAX", 5)
+    respuesta = cliente.post("/admin/elegir_estado_masivo", json={"filtro": {"account_status": "pending"}, "new_status": "banned"})
+    assert respuesta.status_code == 400
+    assert _recorrer(cliente, account_status="banned") == []
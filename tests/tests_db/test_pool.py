@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import QueuePool
+from app.db import config as db_config
+from app.db.pool_metrics import PoolTelemetry, pool_instrumentado, resumen_pools
+
+
+def test_pool_se_reparte_entre_workers():
+    config = db_config.TestSettingsConfig(DATABASE_URL="sqlite://", WORKERS=4, DB_POOL_SIZE=20, DB_MAX_OVERFLOW=8)
+    opciones = config.pool_options("postgresql://u:p@db/erp")
+    assert opciones["pool_size"] == 5
+    assert opciones["max_overflow"] == 2
+
+    mitad = config.pool_options("postgresql://u:p@db/erp", fraccion=0.5)
+    assert mitad["pool_size"] == 2
+    assert config.pool_options("sqlite:///erp.db") == {"pool_pre_ping": True}
+
+
+def test_telemetria_registra_esperas_y_timeouts(tmp_path):
+    telemetria = PoolTelemetry("sync")
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=pool_instrumentado(QueuePool, telemetria),
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    conexion = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    estado = resumen_pools({"sync": (engine.pool, telemetria)})["sync"]
+    conexion.close()
+    engine.dispose()
+
+    assert estado["checked_out"] == 1
+    assert estado["timeouts"] == 1
+    assert sum(estado["histograma_espera"].values()) == 2
@@ -0,0 +1,42 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from app.db.query_counter import SQLCounterMiddleware, assert_max_queries, contar_sentencias
+from main import app
+
+
+motor = create_engine("sqlite://")
+
+
+def test_cuenta_sentencias_y_detecta_repetidas():
+    with contar_sentencias() as estadisticas, motor.connect() as conn:
+        conn.execute(text("SELECT :x"), {"x": 1})
+        conn.execute(text("SELECT :x"), {"x": 1})
+        conn.execute(text("SELECT :x"), {"x": 2})
+
+    assert estadisticas.sentencias == 3
+    assert estadisticas.repetidas == [("SELECT ?", 2)]
+
+
+def test_cabeceras_en_modo_debug():
+    mini = FastAPI()
+    mini.add_middleware(SQLCounterMiddleware, cabeceras=True)
+
+    @mini.get("/")
+    def raiz():
+        with motor.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 1"))
+        return {}
+
+    respuesta = TestClient(mini).get("/")
+    assert respuesta.headers["x-sql-queries"] == "2"
+    assert respuesta.headers["x-sql-repeated"] == "1"
+
+
+def test_presupuesto_de_login_fallido():
+    with assert_max_queries(1) as capturadas:
+        respuesta = TestClient(app).post("/login/", data={"username": "nadie@example.com", "password": "x"})
+
+    assert respuesta.status_code == 401
+    assert capturadas and capturadas[0][1].sentencias == 1
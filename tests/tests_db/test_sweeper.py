@@ -0,0 +1,71 @@
+from datetime import date, datetime, timedelta
+import asyncio
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from app.db.models.models import OTP, EmailOutbox, LoginAttemptAudit, RefreshToken, Usuario
+from app.db.sweeper import ExpirySweeper
+from app.enums import AccountStatus, EmailChannel, EmailStatus
+
+
+def _usuario(email: str, creado: datetime, **extra) -> Usuario:
+    return Usuario(
+        email=email, password_hash="x", first_name="N", last_name="A",
+        date_of_birth=date(2000, 1, 1), created_at=creado, **extra
+    )
+
+
+def test_limpieza_por_lotes(motor_memoria):
+    ahora = datetime.now()
+    hace_un_mes = ahora - timedelta(days=30)
+
+    with Session(motor_memoria) as db:
+        activo = _usuario("activo@example.com", hace_un_mes, account_status=AccountStatus.active, is_email_verified=True)
+        abandonado = _usuario(
+            "abandonado@example.com", hace_un_mes, account_status=AccountStatus.pending,
+            is_email_verified=False, email_verification_expiration=hace_un_mes + timedelta(hours=1)
+        )
+        reciente = _usuario(
+            "reciente@example.com", ahora, account_status=AccountStatus.pending,
+            is_email_verified=False, email_verification_expiration=ahora + timedelta(hours=1)
+        )
+        db.add_all([activo, abandonado, reciente])
+        db.flush()
+        for i in range(7):
+            db.add(OTP(user_id=activo.id, code=f"{i:06d}", expiration=ahora - timedelta(minutes=1)))
+        db.add(OTP(user_id=activo.id, code="999999", expiration=ahora + timedelta(minutes=5)))
+        db.add(OTP(user_id=abandonado.id, code="111111", expiration=ahora + timedelta(minutes=5)))
+        db.add(RefreshToken(
+            user_id=abandonado.id, token_digest="d", family_id="f", expires_at=ahora + timedelta(days=1)
+        ))
+        db.add_all([
+            LoginAttemptAudit(email="a@example.com", success=False, locked=False, created_at=ahora - timedelta(days=200)),
+            LoginAttemptAudit(email="a@example.com", success=True, locked=False, created_at=ahora),
+        ])
+        db.add_all([
+            EmailOutbox(
+                channel=EmailChannel.smtp, recipient="a@example.com", subject="OTP", body="",
+                status=estado, attempts=1, next_attempt_at=creado, created_at=creado
+            )
+            for estado, creado in (
+                (EmailStatus.sent, hace_un_mes), (EmailStatus.dead, hace_un_mes),
+                (EmailStatus.pending, hace_un_mes), (EmailStatus.sent, ahora)
+            )
+        ])
+        db.commit()
+
+    sweeper = ExpirySweeper(engine=motor_memoria, tamano_lote=3, pausa=0)
+    resultado = asyncio.run(sweeper.ejecutar())
+
+    assert resultado["borradas"] == {
+        "otps_caducados": 7, "otps_usados": 0, "intentos_login": 0,
+        "auditoria_login": 1, "outbox_terminados": 2, "usuarios_pendientes": 1
+    }
+    with Session(motor_memoria) as db:
+        assert sorted(db.scalars(select(Usuario.email))) == ["activo@example.com", "reciente@example.com"]
+        assert db.scalars(select(OTP.code)).all() == ["999999"]
+        assert db.scalar(select(func.count()).select_from(RefreshToken)) == 0
+        assert db.scalar(select(func.count()).select_from(LoginAttemptAudit)) == 1
+        assert db.scalar(select(func.count()).select_from(EmailOutbox)) == 2
+
+    assert asyncio.run(sweeper.ejecutar())["borradas"]["otps_caducados"] == 0
+    assert sweeper.metricas()["borradas_total"]["otps_caducados"] == 7
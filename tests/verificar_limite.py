@@ -8,7 +8,7 @@ def client():
     yield client
 
 def test_verify_otp_rate_limiting(client, mocker):
-    mocker.patch("app.services.otp_service.OTPService.verify_otp", return_value=False)
+    mocker.patch("app.services.otp_store.otp_store.consumir", return_value=False)
 
     for _ in range(5):  
         response = client.post("/verify_otp/", json={